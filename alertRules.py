@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import threading
+from collections import deque, OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+if getattr(sys, 'frozen', False):
+    # 已打包状态：获取可执行文件所在路径
+    app_path = os.path.dirname(sys.executable)
+else:
+    # 未打包状态：获取当前Python文件所在路径
+    app_path = os.path.dirname(os.path.abspath(__file__))
+
+# 告警日志（只追加，每行一条JSON）
+ALERT_LOG_PATH = os.path.join(app_path, "alerts.log")
+
+# 默认规则：config.json 中的 alert_rules 可覆盖
+DEFAULT_RULES = [
+    {"type": "slot_fail", "count": 3, "window_minutes": 10},
+    {"type": "item_sn_fail", "count": 5, "window_minutes": 60},
+    {"type": "sn_consecutive_fail", "count": 2},
+]
+
+# 行元组中各字段的位置（与 test_records 插入顺序一致）
+ROW_SLOT, ROW_SN, ROW_TIME, ROW_ITEM, ROW_RESULT = 0, 1, 2, 3, 7
+
+
+def parse_event_time(test_time) -> datetime:
+    """把入库的测试时间（YYYY-MM-DD HH:MM:SS）转为datetime，失败则用当前时间"""
+    try:
+        return datetime.strptime(str(test_time), '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return datetime.now()
+
+
+class Alert(object):
+    """一条告警记录"""
+    def __init__(self, rule: str, key: str, event_time: datetime, message: str):
+        self.rule = rule
+        self.key = key
+        self.event_time = event_time
+        self.message = message
+        self.create_time = datetime.now()
+
+    def to_dict(self) -> dict:
+        return {
+            "create_time": self.create_time.strftime('%Y-%m-%d %H:%M:%S'),
+            "event_time": self.event_time.strftime('%Y-%m-%d %H:%M:%S'),
+            "rule": self.rule,
+            "key": self.key,
+            "message": self.message,
+        }
+
+
+class _KeyedState(OrderedDict):
+    """按key保存规则状态的LRU字典，key数量超过上限时淘汰最久未更新的key"""
+    def __init__(self, max_keys: int):
+        super().__init__()
+        self.max_keys = max_keys
+
+    def get_state(self, key, factory):
+        state = self.get(key)
+        if state is None:
+            state = factory()
+            self[key] = state
+            if len(self) > self.max_keys:
+                self.popitem(last=False)
+        else:
+            self.move_to_end(key)
+        return state
+
+
+class SlotFailRule(object):
+    """同一通道号在 window 内 fail 次数 ≥ count"""
+    name = "slot_fail"
+
+    def __init__(self, count: int = 3, window_minutes: float = 10, max_keys: int = 10000):
+        self.count = int(count)
+        self.window = timedelta(minutes=window_minutes)
+        # 每个通道只保留最近 count 次fail的时间（环形缓冲）
+        self.states = _KeyedState(max_keys)
+
+    def evaluate(self, slot_id, sn, event_time, unit_failed, fail_items) -> List[Alert]:
+        if not unit_failed:
+            return []
+        ring = self.states.get_state(slot_id, lambda: deque(maxlen=self.count))
+        ring.append(event_time)
+        # 批量导入时文件不一定按时间顺序提交，用最大/最小值判断窗口
+        if len(ring) == self.count and max(ring) - min(ring) <= self.window:
+            ring.clear()  # 触发后重新计数，避免连续刷屏
+            minutes = int(self.window.total_seconds() // 60)
+            return [Alert(self.name, str(slot_id), event_time,
+                          f"通道 {slot_id} 在 {minutes} 分钟内 fail {self.count} 次（最近SN：{sn}）")]
+        return []
+
+
+class ItemSnFailRule(object):
+    """同一测试项在 window 内于 ≥ count 个不同SN上 fail"""
+    name = "item_sn_fail"
+
+    def __init__(self, count: int = 5, window_minutes: float = 60, max_keys: int = 10000):
+        self.count = int(count)
+        self.window = timedelta(minutes=window_minutes)
+        # 每个测试项只保留最近 count 个不同SN的最后fail时间
+        self.states = _KeyedState(max_keys)
+
+    def evaluate(self, slot_id, sn, event_time, unit_failed, fail_items) -> List[Alert]:
+        alerts = []
+        for item in fail_items:
+            recent = self.states.get_state(item, OrderedDict)
+            recent[sn] = event_time
+            recent.move_to_end(sn)
+            if len(recent) > self.count:
+                recent.popitem(last=False)
+            if len(recent) == self.count and max(recent.values()) - min(recent.values()) <= self.window:
+                recent.clear()
+                minutes = int(self.window.total_seconds() // 60)
+                alerts.append(Alert(self.name, item, event_time,
+                                    f"测试项 {item} 在 {minutes} 分钟内于 {self.count} 个SN上 fail"))
+        return alerts
+
+
+class SnConsecutiveFailRule(object):
+    """同一SN连续 ≥ count 次测试 fail"""
+    name = "sn_consecutive_fail"
+
+    def __init__(self, count: int = 2, max_keys: int = 100000):
+        self.count = int(count)
+        # 每个SN只保留当前连续fail次数
+        self.states = _KeyedState(max_keys)
+
+    def evaluate(self, slot_id, sn, event_time, unit_failed, fail_items) -> List[Alert]:
+        streak = self.states.get_state(sn, lambda: [0])
+        streak[0] = streak[0] + 1 if unit_failed else 0
+        if streak[0] >= self.count:
+            streak[0] = 0
+            return [Alert(self.name, str(sn), event_time,
+                          f"SN {sn} 连续 fail {self.count} 次（最近通道：{slot_id}）")]
+        return []
+
+
+RULE_TYPES = {
+    SlotFailRule.name: SlotFailRule,
+    ItemSnFailRule.name: ItemSnFailRule,
+    SnConsecutiveFailRule.name: SnConsecutiveFailRule,
+}
+
+
+def load_rules(config_path: Optional[str] = None) -> list:
+    """从config.json读取 alert_rules（缺省时使用 DEFAULT_RULES）并实例化规则"""
+    rule_configs = DEFAULT_RULES
+    if config_path and os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                rule_configs = json.load(f).get("alert_rules", DEFAULT_RULES)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 读取告警规则失败，使用默认规则：{e}")
+    rules = []
+    for rule_config in rule_configs:
+        params = dict(rule_config)
+        rule_cls = RULE_TYPES.get(params.pop("type", ""))
+        if rule_cls is None:
+            print(f"⚠️ 未知的告警规则：{rule_config}")
+            continue
+        rules.append(rule_cls(**params))
+    return rules
+
+
+class AlertEngine(object):
+    """
+    滑动窗口告警引擎：每个records.csv入库提交后增量评估，不回查数据库
+    每条规则按key只保存固定大小的状态（环形缓冲/计数），评估代价与历史数据量无关
+    """
+    def __init__(self, rules: Optional[list] = None, log_path: Optional[str] = ALERT_LOG_PATH,
+                 max_recent: int = 200):
+        self.rules = rules if rules is not None else load_rules()
+        self.log_path = log_path
+        self.recent_alerts = deque(maxlen=max_recent)  # 最近的告警（供UI展示）
+        self.listeners: List[Callable[[Alert], None]] = []
+        self._lock = threading.Lock()  # 监控线程和批量导入可能同时提交
+
+    def add_listener(self, callback: Callable[[Alert], None]):
+        """注册告警回调（如通知UI），回调在提交入库的线程中执行"""
+        self.listeners.append(callback)
+
+    def reset(self):
+        """清空所有规则的滑动窗口状态和最近告警（开始新的监控会话时调用，告警日志保留）"""
+        with self._lock:
+            for rule in self.rules:
+                rule.states.clear()
+            self.recent_alerts.clear()
+
+    def on_unit_committed(self, data_tuples: list) -> List[Alert]:
+        """
+        评估一个已入库的records.csv
+        :param data_tuples: 与 test_records 插入顺序一致的行元组列表（同一文件）
+        :return: 本次触发的告警
+        """
+        if not data_tuples:
+            return []
+        first = data_tuples[0]
+        slot_id, sn = first[ROW_SLOT], first[ROW_SN]
+        event_time = parse_event_time(first[ROW_TIME])
+        fail_items = {row[ROW_ITEM] for row in data_tuples if row[ROW_RESULT] == 'FAIL'}
+        unit_failed = bool(fail_items)
+
+        with self._lock:
+            alerts = []
+            for rule in self.rules:
+                alerts.extend(rule.evaluate(slot_id, sn, event_time, unit_failed, fail_items))
+            if alerts:
+                self.recent_alerts.extend(alerts)
+                self._append_log(alerts)
+
+        for alert in alerts:
+            print(f"🚨 告警[{alert.rule}]：{alert.message}")
+            for callback in self.listeners:
+                try:
+                    callback(alert)
+                except Exception as e:
+                    print(f"❌ 告警回调执行失败：{str(e)}")
+        return alerts
+
+    def _append_log(self, alerts: List[Alert]):
+        """追加写入告警日志（只追加，不修改历史内容）"""
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                for alert in alerts:
+                    f.write(json.dumps(alert.to_dict(), ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"❌ 写入告警日志失败：{self.log_path}，错误：{str(e)}")
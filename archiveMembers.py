@@ -0,0 +1,153 @@
+"""
+压缩包（.zip / .tar.gz / .tgz / .tar）中的 records.csv：不解压到磁盘，直接读取成员内容解析入库
+成员路径为 "压缩包路径!/成员路径"（如 /logs/unit.zip!/unit/system/records.csv），入库的 file_path 也是这个路径
+- 成员的MD5按成员内容计算（与解压后的 records.csv 相同），按压缩包的修改时间/大小缓存，重复入库检查时不再读取
+- tar.gz 只能顺序解压：同一个压缩包的成员用 iter_records_members 一次顺序读取
+"""
+import os
+import hashlib
+import posixpath
+import tarfile
+import zipfile
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+MEMBER_SEPARATOR = "!/"
+ARCHIVE_SUFFIXES = (".zip", ".tar.gz", ".tgz", ".tar")
+RECORDS_NAME = "records.csv"
+
+_cache_lock = threading.Lock()
+_md5_cache = OrderedDict()  # (成员路径, 压缩包修改时间, 大小) -> MD5
+_members_cache = OrderedDict()  # (压缩包路径, 修改时间, 大小) -> records.csv 成员名列表
+_CACHE_SIZE = 65536
+
+
+def is_archive(path) -> bool:
+    """是否为支持的压缩包（按文件名后缀判断）"""
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def normalize_member(name: str) -> str:
+    """成员名的规范形式：去掉 ./ 和重复的 /（tar -C dir . 打包的成员名以 ./ 开头）"""
+    return posixpath.normpath(name).lstrip("/")
+
+
+def member_path(archive_path, member: str) -> str:
+    """压缩包成员的路径（入库时的 file_path，成员名为规范形式）"""
+    return f"{archive_path}{MEMBER_SEPARATOR}{normalize_member(member)}"
+
+
+def split_member_path(path) -> Optional[Tuple[str, str]]:
+    """
+    拆分压缩包成员路径
+    :return: (压缩包路径, 成员名)；不是压缩包成员时返回None
+    """
+    archive_path, separator, member = str(path).partition(MEMBER_SEPARATOR)
+    if not separator or not member or not is_archive(archive_path):
+        return None
+    return archive_path, member
+
+
+def _stat_key(archive_path: str) -> Tuple[int, int]:
+    stat = os.stat(archive_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _cache_get(cache: OrderedDict, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache: OrderedDict, key, value):
+    with _cache_lock:
+        cache[key] = value
+        if len(cache) > _CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def _is_records_member(name: str) -> bool:
+    return name.rsplit("/", 1)[-1] == RECORDS_NAME
+
+
+def list_records_members(archive_path) -> List[str]:
+    """压缩包中所有 records.csv 的成员路径（按压缩包修改时间/大小缓存，tar.gz 只有第一次需要解压）"""
+    archive_path = str(archive_path)
+    key = (archive_path,) + _stat_key(archive_path)
+    names = _cache_get(_members_cache, key)
+    if names is None:
+        if archive_path.lower().endswith(".zip"):
+            with zipfile.ZipFile(archive_path) as archive:
+                names = [info.filename for info in archive.infolist()
+                         if not info.is_dir() and _is_records_member(info.filename)]
+        else:
+            with tarfile.open(archive_path, mode="r:*") as archive:
+                names = [info.name for info in archive if info.isfile() and _is_records_member(info.name)]
+        _cache_put(_members_cache, key, names)
+    return [member_path(archive_path, name) for name in names]
+
+
+def iter_records_members(archive_path, paths: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, bytes]]:
+    """
+    顺序读取压缩包中的 records.csv（不写磁盘），同时缓存每个成员的MD5
+    :param paths: 只读取这些成员路径（member_path 的格式），为None时读取所有 records.csv
+    :return: 逐个生成 (成员路径, 成员内容)
+    """
+    archive_path = str(archive_path)
+    wanted = None if paths is None else set(paths)
+    if archive_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                path = member_path(archive_path, info.filename)
+                if info.is_dir() or not _is_records_member(info.filename) or (wanted is not None and path not in wanted):
+                    continue
+                data = archive.read(info)
+                member_md5(path, data)
+                yield path, data
+    else:
+        # 流式读取（r|*）：tar.gz 只解压一遍
+        with tarfile.open(archive_path, mode="r|*") as archive:
+            for info in archive:
+                path = member_path(archive_path, info.name)
+                if not info.isfile() or not _is_records_member(info.name) or (wanted is not None and path not in wanted):
+                    continue
+                data = archive.extractfile(info).read()
+                member_md5(path, data)
+                yield path, data
+
+
+def read_member(path) -> bytes:
+    """读取单个压缩包成员的内容（tar.gz 需要从头解压到该成员，多个成员请用 iter_records_members）"""
+    archive_path, member = split_member_path(path)
+    member = normalize_member(member)
+    if archive_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if normalize_member(info.filename) == member:
+                    return archive.read(info)
+        raise KeyError(f"压缩包中没有该成员：{member}")
+    with tarfile.open(archive_path, mode="r:*") as archive:
+        for info in archive:
+            if normalize_member(info.name) == member:
+                extracted = archive.extractfile(info)
+                if extracted is None:
+                    raise KeyError(f"不是普通文件：{member}")
+                return extracted.read()
+    raise KeyError(f"压缩包中没有该成员：{member}")
+
+
+def member_md5(path, data: Optional[bytes] = None) -> str:
+    """
+    压缩包成员内容的MD5
+    :param data: 已读取的成员内容（为None且没有缓存时读取压缩包）
+    """
+    path = str(path)
+    key = (path,) + _stat_key(split_member_path(path)[0])
+    md5 = _cache_get(_md5_cache, key)
+    if md5 is None:
+        md5 = hashlib.md5(read_member(path) if data is None else data).hexdigest()
+        _cache_put(_md5_cache, key, md5)
+    return md5
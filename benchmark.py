@@ -0,0 +1,778 @@
+"""
+性能基准脚本（不依赖真实产线数据，使用生成的records.csv/行数据）
+
+用法：
+    python benchmark.py alerts [--units 20000]
+    python benchmark.py capability [--items 1000 --rows 1000000]
+    python benchmark.py unprocessed [--candidates 1000000 --processed 500000]
+    python benchmark.py retention [--rows 1000000 --expired 0.5]
+    python benchmark.py partition [--units 5000 --days 30]
+    python benchmark.py archive [--items 1000 --rows 1000000]
+    python benchmark.py export [--rows 1000000 --chunk-size 50000]
+    python benchmark.py parser [--files 500 --items 2000 --engines pandas,pyarrow,python]
+    python benchmark.py startup [--runs 3 --top 15]
+    python benchmark.py timestamps [--rows 300000 --unique 20000]
+    python benchmark.py rows [--files 200 --items 2000]
+    python benchmark.py failonly [--files 300 --items 2000 --fail-rate 0.05]
+    python benchmark.py archives [--files 300 --items 2000 --archives 10]
+"""
+import os
+import sys
+import csv
+import time
+import re
+import io
+import random
+import sqlite3
+import argparse
+import contextlib
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# records.csv 的列（与产线 Atlas 日志一致）
+RECORDS_COLUMNS = ['attributeName', 'attributeValue', "testName", "subTestName", "subSubTestName",
+                   "upperLimit", "measurementValue", "lowerLimit", "measurementUnits",
+                   'startTime', "stopTime", 'status']
+
+
+def make_records_csv(path, sn, slot_id, start_time: datetime, n_items=200, fail_items=(), seed=None):
+    """
+    生成一个模拟的records.csv
+    :param fail_items: 需要fail的测试项序号
+    """
+    rnd = random.Random(seed)
+    start_str = start_time.strftime('%Y-%m-%d %H:%M:%S.%f')
+    stop_str = (start_time + timedelta(seconds=30)).strftime('%Y-%m-%d %H:%M:%S.%f')
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(RECORDS_COLUMNS)
+        writer.writerow(['PrimaryIdentity', sn, '', '', '', '', '', '', '', start_str, stop_str, ''])
+        writer.writerow(['', '', 'Station', 'Info', 'ID', '', slot_id, '', '', start_str, stop_str, 'PASS'])
+        for i in range(n_items):
+            failed = i in fail_items
+            value = rnd.uniform(0.5, 1.5) if not failed else rnd.uniform(2.5, 3.0)
+            writer.writerow(['', '', 'Connectivity', 'ShortTest', f'ITEM_{i}', '2', f'{value:.4f}', '0', 'V',
+                             start_str, stop_str, 'FAIL' if failed else 'PASS'])
+
+
+def make_unit_tuples(sn, slot_id, test_time: str, n_items=200, fail_items=()):
+    """生成一个文件入库时的行元组（字段顺序与 test_records 插入顺序一致）"""
+    return [
+        (slot_id, sn, test_time, f'ITEM_{i}', '1.0', '2', '0',
+         'FAIL' if i in fail_items else 'PASS', f'/tmp/{sn}/records.csv', 'md5')
+        for i in range(n_items)
+    ]
+
+
+def _report(name, total_seconds, count, unit="文件"):
+    per_item_us = total_seconds / max(count, 1) * 1e6
+    print(f"{name:<40} 共 {count} 个{unit}，总耗时 {total_seconds:.3f}s，平均 {per_item_us:.1f} µs/{unit}")
+
+
+def bench_alerts(args):
+    """告警规则引擎：每个文件入库后的评估耗时"""
+    from alertRules import AlertEngine, load_rules
+
+    rnd = random.Random(0)
+    base = datetime(2025, 6, 18, 8, 0, 0)
+    units = []
+    for i in range(args.units):
+        sn = f"SN{rnd.randrange(args.units // 2):08d}"
+        slot_id = str(rnd.randrange(1, 33))
+        fail_items = {rnd.randrange(200)} if rnd.random() < 0.1 else set()
+        test_time = (base + timedelta(seconds=i * 5)).strftime('%Y-%m-%d %H:%M:%S')
+        units.append(make_unit_tuples(sn, slot_id, test_time, fail_items=fail_items))
+
+    log_path = os.path.join(tempfile.mkdtemp(), "alerts.log")
+    engine = AlertEngine(load_rules(), log_path=log_path)
+    start = time.perf_counter()
+    alert_count = 0
+    for data_tuples in units:
+        alert_count += len(engine.on_unit_committed(data_tuples))
+    _report("告警评估（200测试项/文件）", time.perf_counter() - start, len(units))
+    print(f"触发告警 {alert_count} 条，日志：{log_path}")
+
+
+def make_test_db(db_path, n_items=1000, n_rows=1000000, days=7, seed=0):
+    """生成一个模拟的测试数据库（直接写入 test_records，不经过CSV解析）"""
+    from dataSQL import TestData
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    test_data = TestData(db_path)
+    rnd = random.Random(seed)
+    base = datetime(2025, 6, 18, 0, 0, 0)
+    step_seconds = days * 86400 / max(n_rows, 1)
+    session_id = test_data.get_current_session()
+    conn = sqlite3.connect(db_path)
+    batch = []
+    for i in range(n_rows):
+        item = i % n_items
+        test_time = base + timedelta(seconds=int(i * step_seconds))
+        value = rnd.gauss(1.0 + item * 0.0001, 0.1)
+        result = 'FAIL' if value > 1.3 else 'PASS'
+        batch.append((str(i % 32), f"SN{i // n_items:08d}", f"{test_time:%Y-%m-%d %H:%M:%S}",
+                      f"ITEM_{item}", f"{value:.5f}", "1.3", "0.7", result,
+                      f"/tmp/{i // n_items}/records.csv", f"md5_{i // n_items}", session_id))
+        if len(batch) >= 100000:
+            conn.executemany('''
+                INSERT INTO test_records (slot_id, sn, test_time, test_item, test_value, test_usl, test_lsl, test_result, file_path, file_md5, session_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+            batch = []
+    if batch:
+        conn.executemany('''
+            INSERT INTO test_records (slot_id, sn, test_time, test_item, test_value, test_usl, test_lsl, test_result, file_path, file_md5, session_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', batch)
+    conn.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'generation'")
+    conn.commit()
+    conn.close()
+    return test_data
+
+
+def bench_capability(args):
+    """Cpk/Ppk：全部测试项按天计算的耗时，以及缓存命中后的耗时"""
+    from capability import CapabilityEngine
+
+    db_path = os.path.join(tempfile.mkdtemp(), "capability.db")
+    start = time.perf_counter()
+    test_data = make_test_db(db_path, n_items=args.items, n_rows=args.rows)
+    print(f"生成测试数据库 {args.rows} 行，耗时 {time.perf_counter() - start:.1f}s")
+
+    engine = CapabilityEngine(test_data)
+    start = time.perf_counter()
+    result = engine.compute(window="day")
+    _report("Cpk/Ppk 首次计算（按天）", time.perf_counter() - start, args.rows, unit="行")
+    start = time.perf_counter()
+    engine.compute(window="day")
+    _report("Cpk/Ppk 缓存命中", time.perf_counter() - start, 1, unit="次")
+    print(result.head())
+
+
+def bench_unprocessed(args):
+    """未处理文件检查：临时表反连接 vs 旧的 IN (?, ?, ...) 查询"""
+    from dataSQL import TestData
+
+    db_path = os.path.join(tempfile.mkdtemp(), "unprocessed.db")
+    test_data = TestData(db_path)
+    session_id = test_data.get_current_session()
+    conn = sqlite3.connect(db_path)
+    conn.executemany('''
+        INSERT INTO test_records (slot_id, sn, test_time, test_item, test_value, test_usl, test_lsl, test_result, file_path, file_md5, session_id)
+        VALUES ('1', 'SN', '2025-06-18 08:00:00', 'ITEM', '1', '2', '0', 'PASS', ?, 'md5', ?)
+    ''', ((f"/archive/unit_{i}/records.csv", session_id) for i in range(0, args.candidates, max(args.candidates // args.processed, 1))))
+    conn.commit()
+    candidates = [f"/archive/unit_{i}/records.csv" for i in range(args.candidates)]
+
+    start = time.perf_counter()
+    unprocessed_count = sum(1 for _ in test_data.iter_unprocessed_files(candidates))
+    _report("临时表反连接（流式）", time.perf_counter() - start, len(candidates))
+    print(f"未处理文件 {unprocessed_count} 个")
+
+    # 旧实现：一次性 IN 查询，超过SQLite绑定参数上限时直接失败
+    start = time.perf_counter()
+    try:
+        placeholders = ', '.join('?' for _ in candidates)
+        processed = {row[0] for row in conn.execute(
+            f"SELECT file_path FROM test_records WHERE file_path IN ({placeholders})", candidates)}
+        unprocessed_count = sum(1 for fp in candidates if fp not in processed)
+        _report("旧实现 IN (?, ?, ...)", time.perf_counter() - start, len(candidates))
+    except sqlite3.Error as e:
+        print(f"旧实现 IN (?, ?, ...)                    失败：{e}")
+    conn.close()
+
+
+def bench_retention(args):
+    """过期数据清理：分批删除 + 按天汇总 + incremental_vacuum 的耗时与回收空间"""
+    from retention import RetentionPruner
+
+    db_path = os.path.join(tempfile.mkdtemp(), "retention.db")
+    test_data = make_test_db(db_path, n_items=args.items, n_rows=args.rows)
+    conn = sqlite3.connect(db_path)
+    # 前 expired 比例的行改为60天前入库
+    conn.execute("UPDATE test_records SET create_time = datetime('now', '-60 days') WHERE id <= ?",
+                 (int(args.rows * args.expired),))
+    conn.commit()
+    conn.close()
+    size_before = os.path.getsize(db_path)
+
+    pruner = RetentionPruner(test_data, raw_days=30, batch_size=args.batch_size, batch_pause=0)
+    report = pruner.run_once()
+    _report("过期数据清理（删除+汇总+回收）", report["seconds"], report["rows"], unit="行")
+    print(f"汇总行数 {report['rollups']}，回收 {report['bytes'] / 1024 / 1024:.1f} MB，"
+          f"文件 {size_before / 1024 / 1024:.1f} MB → {os.path.getsize(db_path) / 1024 / 1024:.1f} MB")
+    start = time.perf_counter()
+    report = pruner.run_once()
+    _report("无过期数据时的检查", time.perf_counter() - start, 1, unit="次")
+
+
+def bench_partition(args):
+    """按天分区存储 vs 单文件：入库、单日窗口查询、删除过期数据的耗时"""
+    from dataSQL import TestData
+    from partitionedData import PartitionedTestData
+
+    rnd = random.Random(0)
+    base = datetime(2025, 6, 1, 0, 0, 0)
+    step = args.days * 86400 / max(args.units, 1)
+    units = []
+    for i in range(args.units):
+        t = base + timedelta(seconds=int(i * step))
+        fail_items = {rnd.randrange(200)} if rnd.random() < 0.1 else set()
+        units.append([row[:8] + (f"/archive/unit_{i}/records.csv", f"md5_{i}") for row in
+                      make_unit_tuples(f"SN{i:08d}", str(i % 32), f"{t:%Y-%m-%d %H:%M:%S}",
+                                       fail_items=fail_items)])
+    day = base + timedelta(days=args.days // 2)
+    window = (f"{day:%Y-%m-%d} 00:00:00", f"{day:%Y-%m-%d} 23:59:59")
+    expired_rows = sum(len(data_tuples) for data_tuples in units if data_tuples[0][2] < f"{day:%Y-%m-%d}")
+
+    tmp_dir = tempfile.mkdtemp()
+    for name, test_data in (("单文件", TestData(os.path.join(tmp_dir, "single.db"))),
+                            ("按天分区", PartitionedTestData(os.path.join(tmp_dir, "partitioned.db")))):
+        start = time.perf_counter()
+        for i in range(0, len(units), 500):
+            test_data._commit_units(units[i:i + 500])
+        _report(f"{name} 入库", time.perf_counter() - start, len(units))
+
+        start = time.perf_counter()
+        df = test_data.query_test_data(start_time=window[0], end_time=window[1])
+        _report(f"{name} 单日窗口查询（{len(df)} 行）", time.perf_counter() - start, 1, unit="次")
+
+        start = time.perf_counter()
+        if isinstance(test_data, PartitionedTestData):
+            test_data.drop_partitions_before(day.date())
+        else:
+            # 单文件按入库顺序删除（与 RetentionPruner 一样按 id），空闲页留待复用
+            conn = sqlite3.connect(test_data.DB_PATH)
+            conn.execute("DELETE FROM test_records WHERE id <= ?", (expired_rows,))
+            conn.commit()
+            conn.close()
+        _report(f"{name} 删除 {day:%Y-%m-%d} 之前的数据", time.perf_counter() - start, 1, unit="次")
+
+
+def bench_archive(args):
+    """Parquet 归档：归档耗时、文件大小，以及单测试项/单日查询 SQLite 与归档的耗时"""
+    from parquetArchive import ParquetArchive, ARCHIVE_COLUMNS
+
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "archive.db")
+    test_data = make_test_db(db_path, n_items=args.items, n_rows=args.rows)
+    archive = ParquetArchive(os.path.join(tmp_dir, "archive"))
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    cursor = conn.execute(f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM test_records ORDER BY id")
+    chunk_no = 0
+    while True:
+        rows = cursor.fetchmany(200000)
+        if not rows:
+            break
+        archive.write_rows(rows, name=f"bench-{chunk_no}")
+        chunk_no += 1
+    conn.close()
+    _report("归档到 Parquet（zstd）", time.perf_counter() - start, args.rows, unit="行")
+    print(f"SQLite {os.path.getsize(db_path) / 1024 / 1024:.1f} MB → Parquet {archive.size() / 1024 / 1024:.1f} MB")
+
+    window = ("2025-06-20 00:00:00", "2025-06-20 23:59:59")
+    start = time.perf_counter()
+    df = test_data.query_test_data(test_item="ITEM_1", start_time=window[0], end_time=window[1])
+    _report(f"SQLite 单测试项单日查询（{len(df)} 行）", time.perf_counter() - start, 1, unit="次")
+    start = time.perf_counter()
+    df = archive.query(test_item="ITEM_1", start_time=window[0], end_time=window[1])
+    _report(f"Parquet 单测试项单日查询（{len(df)} 行）", time.perf_counter() - start, 1, unit="次")
+
+
+def bench_export(args):
+    """fail数据流式导出：CSV/Parquet 的耗时和 Python 内存峰值（对比 get_fail_data 一次性加载）"""
+    import tracemalloc
+    from exportData import export_fail_data
+
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "export.db")
+    test_data = make_test_db(db_path, n_items=1000, n_rows=args.rows)
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE test_records SET test_result = 'FAIL'")  # 全部作为fail数据导出
+    conn.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'generation'")
+    conn.commit()
+    conn.close()
+
+    for fmt in ("csv", "parquet"):
+        path = os.path.join(tmp_dir, f"fail.{fmt}")
+        tracemalloc.start()
+        report = export_fail_data(test_data, path, chunk_size=args.chunk_size)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        _report(f"流式导出 {fmt}", report["seconds"], report["rows"], unit="行")
+        print(f"内存峰值 {peak / 1024 / 1024:.1f} MB，文件 {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = test_data.get_fail_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    _report("get_fail_data 一次性加载", time.perf_counter() - start, len(df), unit="行")
+    print(f"内存峰值 {peak / 1024 / 1024:.1f} MB")
+
+
+def bench_parser(args):
+    """
+    records.csv 解析引擎：pandas（C 引擎）/ pyarrow / python 每个文件的解析+生成行元组耗时、内存峰值，并核对结果一致
+    每个引擎在单独的子进程中运行，进程内存峰值（RSS）包含 Arrow 内存池等 tracemalloc 统计不到的内存
+    """
+    import json
+
+    if args.worker:
+        return _parser_worker(args)
+    tmp_dir = tempfile.mkdtemp()
+    base = datetime(2025, 6, 18, 8, 0, 0)
+    for i in range(args.files):
+        make_records_csv(os.path.join(tmp_dir, f"records_{i}.csv"), f"SN{i:06d}", str(i % 8),
+                         base + timedelta(minutes=i), n_items=args.items, fail_items={i % args.items}, seed=i)
+
+    digests = {}
+    for engine in args.engines.split(","):
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "parser", "--worker", engine,
+                                 "--dir", tmp_dir], capture_output=True, text=True)
+        lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+        if not lines:
+            print(f"❌ {engine} 解析失败：\n{result.stderr[-2000:]}")
+            continue
+        report = json.loads(lines[-1])
+        digests[engine] = report["digest"]
+        _report(f"{engine} 只解析（parse_file）", report["parse_seconds"], report["files"])
+        _report(f"{engine} 解析+生成行元组", report["seconds"], report["files"])
+        print(f"单个文件（{args.items + 2} 行）Python 内存峰值 {report['traced_peak'] / 1024:.0f} KB，"
+              f"进程内存峰值增加 {report['rss_growth'] / 1024 / 1024:.1f} MB")
+    same = len(set(digests.values())) == 1
+    print(f"{'/'.join(digests)} 的行元组{'一致' if same else '不一致'}")
+
+
+def _parser_worker(args):
+    """子进程：用指定的引擎解析 --dir 下所有 records.csv，输出一行JSON"""
+    import json
+    import hashlib
+    import resource
+    import tracemalloc
+    from dataSQL import TestData
+
+    def max_rss():
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024  # macOS 单位为字节，Linux 为KB
+
+    paths = sorted(Path(args.dir).glob("records_*.csv"))
+    test_data = TestData(os.path.join(args.dir, f"parser_{args.worker}.db"))
+    test_data.parser_engine = args.worker
+    test_data.slot_id_test_name = "ID"
+
+    def to_tuples(parsed, path):
+        if test_data.parser_engine == "python":
+            return test_data.parsed_records_tuples(parsed, path, "md5", as_text=True)
+        return test_data.dataframe_tuples(parsed, path, "md5", as_text=True)
+
+    to_tuples(*test_data.parse_file(paths[0]))  # 预热（导入 pandas/pyarrow 等）
+    rss_before = max_rss()
+    digest = hashlib.md5()
+    start = time.perf_counter()
+    for path in paths:
+        digest.update(repr(to_tuples(*test_data.parse_file(path))).encode('utf-8'))
+    seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for path in paths:
+        test_data.parse_file(path)
+    parse_seconds = time.perf_counter() - start
+
+    traced_peak = 0
+    for path in paths[:20]:
+        tracemalloc.start()
+        to_tuples(*test_data.parse_file(path))
+        traced_peak = max(traced_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    print(json.dumps({"files": len(paths), "seconds": seconds, "parse_seconds": parse_seconds, "digest": digest.hexdigest(),
+                      "traced_peak": traced_peak, "rss_growth": max_rss() - rss_before}))
+
+
+# 子进程中启动界面：窗口显示、延迟初始化完成时分别输出时间（墙钟时间，与父进程启动子进程的时间相减）
+STARTUP_SCRIPT = """
+import sys, time
+sys.path.insert(0, {app_path!r})
+import only_fail
+from PyQt6.QtWidgets import QApplication
+only_fail.file_path = {db_path!r}
+app = QApplication(sys.argv)
+window = only_fail.failInfoWindow()
+window.show()
+print("shown", time.time(), flush=True)
+while not window.init_finished:
+    app.processEvents()
+    time.sleep(0.001)
+print("ready", time.time(), flush=True)
+window.close()
+"""
+
+
+def bench_startup(args):
+    app_path = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, HOME=tmp)  # 监控目录建在临时目录下
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+        # 1. 导入耗时：python -X importtime，按累计耗时列出最慢的模块
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import only_fail"],
+                                cwd=app_path, env=env, capture_output=True, text=True)
+        modules = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            modules.append((int(cumulative), name.rstrip()))
+        modules.sort(reverse=True)
+        print(f"导入 only_fail 累计 {modules[0][0] / 1000 if modules else 0:.0f} ms，最慢的模块：")
+        for cumulative, name in modules[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+        for name in ("pandas", "numpy", "pyarrow", "mistune", "scipy"):
+            loaded = any(module.strip() == name for _, module in modules)
+            print(f"  {name}: {'启动时导入' if loaded else '未导入（延迟到使用时）'}")
+
+        # 2. 冷启动：进程启动 -> 窗口显示 -> 延迟初始化完成（数据库/SOP/监控/fail表格）
+        script = STARTUP_SCRIPT.format(app_path=app_path, db_path=os.path.join(tmp, "test_data.db"))
+        for run in range(args.runs):
+            start = time.time()
+            result = subprocess.run([sys.executable, "-c", script], cwd=app_path, env=env,
+                                    capture_output=True, text=True)
+            marks = dict(line.split() for line in result.stdout.splitlines()
+                         if line.startswith(("shown", "ready")))
+            if "ready" not in marks:
+                print(f"❌ 启动失败：\n{result.stderr[-2000:]}")
+                return
+            print(f"第 {run + 1} 次：窗口显示 {(float(marks['shown']) - start) * 1000:.0f} ms，"
+                  f"初始化完成 {(float(marks['ready']) - start) * 1000:.0f} ms")
+
+
+def bench_failonly(args):
+    """入库方式：all（保存所有行）vs fail_only（只保存FAIL行+产品汇总，可选PASS压缩归档）的入库耗时、数据库大小，并核对fail数据一致"""
+    from dataSQL import TestData
+    from recordMode import PassArchive
+
+    tmp_dir = tempfile.mkdtemp()
+    rnd = random.Random(0)
+    base = datetime(2025, 6, 18, 8, 0, 0)
+    paths = []
+    for i in range(args.files):
+        path = os.path.join(tmp_dir, "data", f"unit_{i}", "records.csv")
+        os.makedirs(os.path.dirname(path))
+        fail_items = {rnd.randrange(args.items)} if rnd.random() < args.fail_rate else set()
+        make_records_csv(path, f"SN{i:06d}", str(i % 8), base + timedelta(minutes=i), n_items=args.items,
+                         fail_items=fail_items, seed=i)
+        paths.append(Path(path))
+
+    fail_frames = []
+    for name, mode, archive in (("all", "all", False), ("fail_only", "fail_only", False),
+                                ("fail_only+PASS归档", "fail_only", True)):
+        db_path = os.path.join(tmp_dir, f"{mode}{'_archive' if archive else ''}.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            test_data = TestData(db_path)
+        test_data.record_mode = mode
+        test_data.commit_listeners = []  # 只比较入库本身（测试项统计等回调在两种方式下相同）
+        if archive:
+            test_data.pass_archive = PassArchive(os.path.join(tmp_dir, "pass_archive"))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for path in paths:
+                test_data.insert_test_data(*test_data.parse_file(path))
+        _report(f"{name} 入库（{args.items + 2} 行/文件，不含回调）", time.perf_counter() - start, len(paths))
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT COUNT(*) FROM test_records").fetchone()[0]
+        units = conn.execute("SELECT COUNT(*), SUM(test_result = 'FAIL') FROM unit_summaries").fetchone()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+        size = os.path.getsize(db_path)
+        archive_size = test_data.pass_archive.size() if archive else 0
+        print(f"  test_records {rows} 行，unit_summaries {units[0]} 个产品（{units[1]} 个fail），"
+              f"数据库 {size / 1024 / 1024:.1f} MB" + (f"，PASS归档 {archive_size / 1024 / 1024:.1f} MB" if archive else ""))
+        fail_frames.append(test_data.get_fail_data())
+        processed = sum(test_data.is_file_processed(path) for path in paths)
+        print(f"  重复入库检查：{processed}/{len(paths)} 个文件判断为已入库")
+        test_data.close()
+    same = all(frame.equals(fail_frames[0]) for frame in fail_frames[1:])
+    print(f"get_fail_data 结果{'一致' if same else '不一致'}（{len(fail_frames[0])} 行）")
+
+
+def bench_archives(args):
+    """压缩包（.zip/.tar.gz）中的records.csv直接入库 vs 解压后的records.csv：查找+入库耗时，并核对入库数据一致"""
+    import shutil
+    import tarfile
+    import zipfile
+    from dataSQL import TestData
+    from monitoringCSV import find_records_files, ingest_files
+
+    tmp_dir = tempfile.mkdtemp()
+    base = datetime(2025, 6, 18, 8, 0, 0)
+    loose_dir = os.path.join(tmp_dir, "loose")
+    for i in range(args.files):
+        path = os.path.join(loose_dir, f"box_{i % args.archives}", f"unit_{i}", "system", "records.csv")
+        os.makedirs(os.path.dirname(path))
+        make_records_csv(path, f"SN{i:06d}", str(i % 8), base + timedelta(minutes=i), n_items=args.items,
+                         fail_items={i % args.items} if i % 10 == 0 else (), seed=i)
+    # 每个 box_N 文件夹压缩为一个压缩包
+    for kind in ("zip", "tar.gz"):
+        os.makedirs(os.path.join(tmp_dir, kind))
+        for box in sorted(os.listdir(loose_dir)):
+            archive_path = os.path.join(tmp_dir, kind, f"{box}.{kind}")
+            if kind == "zip":
+                with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+                    for dir_path, _, names in os.walk(os.path.join(loose_dir, box)):
+                        for name in names:
+                            full_path = os.path.join(dir_path, name)
+                            archive.write(full_path, os.path.relpath(full_path, loose_dir))
+            else:
+                with tarfile.open(archive_path, "w:gz") as archive:
+                    archive.add(os.path.join(loose_dir, box), arcname=box)
+
+    query = ("SELECT slot_id, sn, test_time, test_item, test_value, test_usl, test_lsl, test_result, file_md5 "
+             "FROM test_records ORDER BY file_md5, id")
+    results = []
+    for name, root_dir in (("解压后的records.csv", loose_dir), ("zip", os.path.join(tmp_dir, "zip")),
+                           ("tar.gz", os.path.join(tmp_dir, "tar.gz"))):
+        db_path = os.path.join(tmp_dir, f"{name.replace('.', '_')}.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            test_data = TestData(db_path)
+        test_data.commit_listeners = []  # 只比较查找+解析+入库
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, names in os.walk(root_dir) for f in names)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            files = find_records_files(root_dir)
+            stats = ingest_files(test_data, files)
+        _report(f"{name} 查找+入库（{size / 1024 / 1024:.1f} MB）", time.perf_counter() - start, len(files))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            again = ingest_files(test_data, find_records_files(root_dir))
+        _report(f"  再次补录（全部已入库）", time.perf_counter() - start, len(files))
+        print(f"  入库 {stats['processed']}/{len(files)} 个文件，再次补录入库 {again['processed']} 个")
+        conn = sqlite3.connect(db_path)
+        results.append(conn.execute(query).fetchall())
+        conn.close()
+        test_data.close()
+    same = all(rows == results[0] for rows in results[1:])
+    print(f"入库数据{'一致' if same else '不一致'}（{len(results[0])} 行）")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _legacy_dataframe_tuples(test_data, df, file_path, file_md5):
+    """优化前的 handleDF + iterrows（整列布尔筛选、apply、fillna 复制整个 DataFrame，作为对比基准）"""
+    import pandas as pd
+    from dataSQL import convert_time_format
+
+    sn_row = df[df['attributeName'] == 'PrimaryIdentity']
+    device_sn = sn_row['attributeValue'].iloc[0] if not sn_row.empty else "未知SN"
+    if device_sn is None or device_sn == "":
+        device_sn = "未知SN"
+    time_row = df[df['startTime'].notna() & (df['startTime'] != "")]
+    test_time_str = time_row['startTime'].iloc[0] if not time_row.empty else "2025-01-01 00:00:00"
+    slot_row = df[df['subSubTestName'] == test_data.slot_id_test_name]
+    slot_id = slot_row['measurementValue'].iloc[0] if not slot_row.empty else "未知通道号"
+    if slot_id is None or slot_id == "":
+        slot_id = "未知通道号"
+    test_time = convert_time_format(test_time_str, station=slot_id)
+    df['status'] = df['status'].fillna('PASS')
+    df['status'] = df['status'].apply(lambda x: 'FAIL' if str(x).upper() in ['FAIL', 'ERROR'] else 'PASS')
+    df = df.fillna("")
+    return [(slot_id, device_sn, test_time, test_data.get_test_name(row), test_data.get_test_value(row),
+             row['upperLimit'], row['lowerLimit'], row['status'], file_path, file_md5)
+            for _, row in df.iterrows()]
+
+
+def bench_rows(args):
+    """pandas 解析结果生成入库行元组：优化前 handleDF + iterrows vs dataframe_tuples（不含读文件），并核对结果一致"""
+    from dataSQL import TestData
+
+    tmp_dir = tempfile.mkdtemp()
+    test_data = TestData(os.path.join(tmp_dir, "rows.db"))
+    test_data.slot_id_test_name = "ID"
+    base = datetime(2025, 6, 18, 8, 0, 0)
+    frames = []
+    for i in range(args.files):
+        path = os.path.join(tmp_dir, f"records_{i}.csv")
+        make_records_csv(path, f"SN{i:06d}", str(i % 8), base + timedelta(minutes=i), n_items=args.items,
+                         fail_items={i % args.items}, seed=i)
+        frames.append(test_data.parse_file(Path(path)))
+
+    copies = [df.copy() for df, _ in frames]  # 优化前的实现会修改 DataFrame
+    start = time.perf_counter()
+    expected = [_legacy_dataframe_tuples(test_data, df, path, "md5") for df, (_, path) in zip(copies, frames)]
+    _report(f"优化前 handleDF + iterrows（{args.items + 2} 行/文件）", time.perf_counter() - start, len(frames))
+
+    start = time.perf_counter()
+    headers = [test_data.handleDF(df) for df, _ in frames]
+    _report("handleDF（只提取 SN/时间/通道号）", time.perf_counter() - start, len(frames))
+
+    start = time.perf_counter()
+    result = [test_data.dataframe_tuples(df, path, "md5") for df, path in frames]
+    _report("dataframe_tuples", time.perf_counter() - start, len(frames))
+    same = result == expected and all(header == (rows[0][1], rows[0][2], rows[0][0])
+                                      for header, rows in zip(headers, expected))
+    print(f"行元组与优化前{'一致' if same else '不一致'}")
+
+
+def _legacy_convert_time_format(time_str: str) -> str:
+    """优化前的 convert_time_format（只保留字符串输入的 A/B/C 格式，作为对比基准）"""
+    c_pattern = r'^\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}(\.\d+)?$'
+    if re.match(c_pattern, time_str):
+        dt = datetime.strptime(time_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
+        return dt.strftime('%Y-%-m-%-d %H:%M:%S')
+    english_months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    if any(month in time_str for month in english_months):
+        time_str = re.sub(r'\.\d+\s*', ' ', time_str).strip()
+        dt = datetime.strptime(time_str, '%b %d %Y %I:%M:%S %p')
+        return dt.strftime('%Y-%-m-%-d %H:%M:%S')
+    month_map = {f"{i}月": str(i) for i in range(1, 13)}
+    for cn_month, num in month_map.items():
+        time_str = time_str.replace(cn_month, num)
+    time_str = time_str.replace('上午', 'AM').replace('下午', 'PM')
+    time_str = re.sub(r'\.\d+\s*', ' ', time_str).strip()
+    dt = datetime.strptime(time_str, '%m %d %Y %I:%M:%S %p')
+    return dt.strftime('%Y-%-m-%-d %H:%M:%S')
+
+
+def make_timestamps(n_rows, n_unique, seed=0):
+    """
+    生成三个站点（A/B/C 格式各一个）的测试时间字符串
+    :param n_unique: 不同时间的个数（逐行分析时同一个开始时间会重复出现）
+    :return: {站点: 时间字符串列表}
+    """
+    rnd = random.Random(seed)
+    base = datetime(2025, 6, 18, 0, 0, 0)
+    times = [base + timedelta(seconds=rnd.randrange(30 * 86400), microseconds=rnd.randrange(10000) * 100)
+             for _ in range(max(n_unique, 1))]
+
+    def format_a(t):
+        return f"{t:%b} {t.day} {t.year} {t.hour % 12 or 12}:{t:%M:%S}.{t.microsecond // 100:04d} {t:%p}"
+
+    def format_b(t):
+        return (f"{t.month}月 {t.day} {t.year} {t.hour % 12 or 12}:{t:%M:%S}.{t.microsecond // 100:04d} "
+                f"{'上午' if t.hour < 12 else '下午'}")
+
+    def format_c(t):
+        return t.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+    stations = {}
+    for station, fmt in (("1", format_a), ("2", format_b), ("3", format_c)):
+        stations[station] = [fmt(times[rnd.randrange(len(times))]) for _ in range(n_rows // 3)]
+    return stations
+
+
+def bench_timestamps(args):
+    """测试时间格式统一：优化前逐个转换 vs TimestampNormalizer（逐个/整列），并校验结果一致"""
+    import pandas as pd
+    from timestampNormalizer import TimestampNormalizer
+
+    stations = make_timestamps(args.rows, args.unique)
+    total = sum(len(values) for values in stations.values())
+
+    start = time.perf_counter()
+    expected = {station: [_legacy_convert_time_format(v) for v in values] for station, values in stations.items()}
+    _report("优化前 convert_time_format（逐个）", time.perf_counter() - start, total, "行")
+
+    normalizer = TimestampNormalizer(cache_size=0)  # 不缓存转换结果：只有预编译正则+站点格式缓存
+    start = time.perf_counter()
+    uncached = {station: [normalizer.normalize(v, station) for v in values] for station, values in stations.items()}
+    _report("TimestampNormalizer.normalize（无结果缓存）", time.perf_counter() - start, total, "行")
+
+    normalizer = TimestampNormalizer()
+    start = time.perf_counter()
+    cached = {station: [normalizer.normalize(v, station) for v in values] for station, values in stations.items()}
+    _report(f"TimestampNormalizer.normalize（{args.unique} 个不同时间）", time.perf_counter() - start, total, "行")
+
+    series = {station: pd.Series(values) for station, values in stations.items()}
+    normalizer = TimestampNormalizer()
+    start = time.perf_counter()
+    vectorized = {station: normalizer.normalize_series(values, station).tolist() for station, values in series.items()}
+    _report("TimestampNormalizer.normalize_series（整列）", time.perf_counter() - start, total, "行")
+
+    for name, result in (("无结果缓存", uncached), ("逐个", cached), ("整列", vectorized)):
+        print(f"{name}结果与优化前{'一致' if result == expected else '不一致'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="monitoring_fail 性能基准")
+    sub = parser.add_subparsers(dest="name", required=True)
+
+    p = sub.add_parser("alerts", help="告警规则引擎评估耗时")
+    p.add_argument("--units", type=int, default=20000)
+    p.set_defaults(func=bench_alerts)
+
+    p = sub.add_parser("capability", help="Cpk/Ppk 计算耗时")
+    p.add_argument("--items", type=int, default=1000)
+    p.add_argument("--rows", type=int, default=1000000)
+    p.set_defaults(func=bench_capability)
+
+    p = sub.add_parser("unprocessed", help="未处理文件检查耗时")
+    p.add_argument("--candidates", type=int, default=1000000)
+    p.add_argument("--processed", type=int, default=500000)
+    p.set_defaults(func=bench_unprocessed)
+
+    p = sub.add_parser("retention", help="过期数据清理耗时与回收空间")
+    p.add_argument("--items", type=int, default=1000)
+    p.add_argument("--rows", type=int, default=1000000)
+    p.add_argument("--expired", type=float, default=0.5)
+    p.add_argument("--batch-size", type=int, default=2000)
+    p.set_defaults(func=bench_retention)
+
+    p = sub.add_parser("partition", help="按天分区存储与单文件的入库/查询/删除耗时")
+    p.add_argument("--units", type=int, default=5000)
+    p.add_argument("--days", type=int, default=30)
+    p.set_defaults(func=bench_partition)
+
+    p = sub.add_parser("archive", help="Parquet 归档大小与查询耗时")
+    p.add_argument("--items", type=int, default=1000)
+    p.add_argument("--rows", type=int, default=1000000)
+    p.set_defaults(func=bench_archive)
+
+    p = sub.add_parser("export", help="fail数据流式导出耗时与内存峰值")
+    p.add_argument("--rows", type=int, default=1000000)
+    p.add_argument("--chunk-size", type=int, default=50000)
+    p.set_defaults(func=bench_export)
+
+    p = sub.add_parser("parser", help="records.csv 解析引擎（pandas/pyarrow/python）的耗时与内存峰值")
+    p.add_argument("--files", type=int, default=500)
+    p.add_argument("--items", type=int, default=2000)
+    p.add_argument("--engines", default="pandas,pyarrow,python")
+    p.add_argument("--worker", help=argparse.SUPPRESS)  # 子进程：只运行这个引擎
+    p.add_argument("--dir", help=argparse.SUPPRESS)
+    p.set_defaults(func=bench_parser)
+
+    p = sub.add_parser("startup", help="界面冷启动耗时与导入耗时（-X importtime）")
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--top", type=int, default=15)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("timestamps", help="测试时间格式统一（逐个/整列）的吞吐量")
+    p.add_argument("--rows", type=int, default=300000)
+    p.add_argument("--unique", type=int, default=20000)
+    p.set_defaults(func=bench_timestamps)
+
+    p = sub.add_parser("rows", help="pandas 解析结果生成入库行元组（handleDF）的耗时")
+    p.add_argument("--files", type=int, default=200)
+    p.add_argument("--items", type=int, default=2000)
+    p.set_defaults(func=bench_rows)
+
+    p = sub.add_parser("failonly", help="fail_only 入库方式的入库耗时与数据库大小")
+    p.add_argument("--files", type=int, default=300)
+    p.add_argument("--items", type=int, default=2000)
+    p.add_argument("--fail-rate", type=float, default=0.05)
+    p.set_defaults(func=bench_failonly)
+
+    p = sub.add_parser("archives", help="压缩包中的records.csv直接入库与解压后入库的耗时对比")
+    p.add_argument("--files", type=int, default=300)
+    p.add_argument("--items", type=int, default=2000)
+    p.add_argument("--archives", type=int, default=10)
+    p.set_defaults(func=bench_archives)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,219 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from dataSQL import to_sortable_time
+
+# 分组键的编码方式：item_id * ITEM_STRIDE + window_id * SUBGROUP_STRIDE + subgroup
+SUBGROUP_STRIDE = 32  # 子组为小时（0~23）
+ITEM_STRIDE = 1 << 40  # window 数量上限远大于实际天数
+
+RESULT_COLUMNS = ['test_item', 'window', 'n', 'mean', 'std_within', 'std_overall', 'usl', 'lsl',
+                  'cp', 'cpk', 'pp', 'ppk']
+
+
+def _window_key(day_str: str, window: str) -> str:
+    """测试日期（如 2025-06-18）转为统计窗口名称：day → 2025-06-18，week → 该周周一的日期"""
+    try:
+        day = datetime.strptime(day_str, '%Y-%m-%d')
+    except ValueError:
+        return day_str
+    if window == "week":
+        day -= timedelta(days=day.weekday())
+    return day.strftime('%Y-%m-%d')
+
+
+def _to_float(value) -> float:
+    """文本上下限转为数字，非数字（如'未知上限'）返回NaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class _GroupStats(object):
+    """按 (测试项, 窗口, 子组) 累积的 n/均值/M2，分块计算后用并行公式（Chan）合并"""
+    def __init__(self):
+        self.keys = []
+        self.counts = []
+        self.means = []
+        self.m2s = []
+
+    def add_chunk(self, keys: np.ndarray, values: np.ndarray):
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse).astype(np.float64)
+        means = np.bincount(inverse, weights=values) / counts
+        m2s = np.bincount(inverse, weights=(values - means[inverse]) ** 2)
+        self.keys.append(unique_keys)
+        self.counts.append(counts)
+        self.means.append(means)
+        self.m2s.append(m2s)
+
+    def reduce(self):
+        """合并所有分块，返回 (keys, n, mean, M2)"""
+        if not self.keys:
+            empty = np.array([], dtype=np.float64)
+            return np.array([], dtype=np.int64), empty, empty, empty
+        return combine_stats(np.concatenate(self.keys), np.concatenate(self.counts),
+                             np.concatenate(self.means), np.concatenate(self.m2s))
+
+
+def combine_stats(keys, counts, means, m2s):
+    """把相同key的多组 (n, 均值, M2) 合并为一组（向量化的Chan并行方差公式）"""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    total = np.bincount(inverse, weights=counts)
+    mean = np.bincount(inverse, weights=counts * means) / total
+    m2 = np.bincount(inverse, weights=m2s + counts * (means - mean[inverse]) ** 2)
+    return unique_keys, total, mean, m2
+
+
+class CapabilityEngine(object):
+    """
+    按测试项、按时间窗口（天/周）批量计算 Cp/Cpk/Pp/Ppk
+    - Pp/Ppk：窗口内全部数据的标准差（整体变异）
+    - Cp/Cpk：窗口内按小时分子组的合并组内标准差（短期变异）
+    结果按 (时间范围, 窗口, 数据版本号) 缓存，数据没有新入库时重复查看不再计算
+    """
+    def __init__(self, test_data, chunk_size: int = 200000, cache_size: int = 32):
+        self.test_data = test_data
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compute(self, start_time_str: str = "", end_time_str: str = "", window: str = "day",
+                session_id=None) -> pd.DataFrame:
+        """
+        计算时间范围内所有测试项每个窗口的过程能力指数
+        :param start_time_str: 开始时间（YYYY-MM-DD HH:MM:SS），为空不限制
+        :param end_time_str: 结束时间（YYYY-MM-DD HH:MM:SS），为空不限制
+        :param window: 统计窗口 day/week
+        :param session_id: 监控会话id，为None时使用当前会话
+        :return: 每个 (测试项, 窗口) 一行的DataFrame
+        """
+        if window not in ("day", "week"):
+            raise ValueError(f"不支持的统计窗口：{window}（可选 day/week）")
+        if session_id is None:
+            session_id = self.test_data.get_current_session()
+        cache_key = (start_time_str, end_time_str, window, session_id, self.test_data.get_generation())
+        with self._lock:
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                return self._cache[cache_key].copy()
+
+        result = self._compute(start_time_str, end_time_str, window, session_id)
+        with self._lock:
+            self._cache[cache_key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result.copy()
+
+    def _compute(self, start_time_str, end_time_str, window, session_id) -> pd.DataFrame:
+        conditions = ["session_id = ?"]
+        params = [session_id]
+        if start_time_str != "":
+            conditions.append("test_time >= ?")
+            params.append(to_sortable_time(start_time_str))
+        if end_time_str != "":
+            conditions.append("test_time <= ?")
+            params.append(to_sortable_time(end_time_str))
+
+        item_ids = {}  # 测试项 -> 编号
+        window_ids = {}  # 窗口名称 -> 编号
+        group_stats = _GroupStats()
+
+        conn = sqlite3.connect(self.test_data.DB_PATH)
+        try:
+            limits = {}  # 测试项编号 -> (上限, 下限)
+            # 分区存储时逐个分区读取（按时间升序，上下限最终取最新分区中的值）
+            for table, _, _ in self.test_data.record_sources(conn, start_time_str, end_time_str):
+                # 日期和小时在SQLite中截取（测试时间为 YYYY-MM-DD + 空格 + HH:MM:SS），避免逐行处理字符串
+                cursor = conn.execute(f'''
+                    SELECT test_item,
+                           substr(test_time, 1, instr(test_time, ' ') - 1),
+                           CAST(substr(test_time, instr(test_time, ' ') + 1, 2) AS INTEGER),
+                           test_value
+                    FROM {table} WHERE {' AND '.join(conditions)}
+                ''', params)
+                while True:
+                    rows = cursor.fetchmany(self.chunk_size)
+                    if not rows:
+                        break
+                    items, days, hours, values = zip(*rows)
+                    values = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(np.float64)
+                    valid = np.isfinite(values)
+                    if not valid.any():
+                        continue
+
+                    # 1. 测试项、窗口编码（每块只对去重后的值查字典）
+                    item_codes, item_uniques = pd.factorize(pd.Series(items, dtype=object))
+                    item_map = np.array([item_ids.setdefault(item, len(item_ids)) for item in item_uniques], dtype=np.int64)
+                    day_codes, day_uniques = pd.factorize(pd.Series(days, dtype=object))
+                    window_map = np.array([window_ids.setdefault(_window_key(day, window), len(window_ids))
+                                           for day in day_uniques], dtype=np.int64)
+                    hour = np.array(hours, dtype=np.int64) % 24
+
+                    keys = item_map[item_codes] * ITEM_STRIDE + window_map[day_codes] * SUBGROUP_STRIDE + hour
+                    group_stats.add_chunk(keys[valid], values[valid])
+
+                # 2. 上下限取每个测试项最近一条记录的值
+                for test_item, usl, lsl in conn.execute(f'''
+                    SELECT test_item, test_usl, test_lsl FROM {table}
+                    WHERE id IN (SELECT MAX(id) FROM {table} WHERE session_id = ? GROUP BY test_item)
+                ''', (session_id,)):
+                    if test_item in item_ids:
+                        limits[item_ids[test_item]] = (_to_float(usl), _to_float(lsl))
+        finally:
+            conn.close()
+
+        return self._build_result(group_stats, item_ids, window_ids, limits)
+
+    def _build_result(self, group_stats, item_ids, window_ids, limits) -> pd.DataFrame:
+        keys, counts, means, m2s = group_stats.reduce()
+        if len(keys) == 0:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+
+        # 子组 -> (测试项, 窗口)：整体统计用Chan公式合并，组内方差用合并方差
+        window_keys = keys // SUBGROUP_STRIDE
+        group_keys, n, mean, m2 = combine_stats(window_keys, counts, means, m2s)
+        _, inverse = np.unique(window_keys, return_inverse=True)
+        within_dof = np.bincount(inverse, weights=np.maximum(counts - 1, 0))
+        within_m2 = np.bincount(inverse, weights=np.where(counts > 1, m2s, 0.0))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std_overall = np.sqrt(m2 / (n - 1))
+            std_within = np.sqrt(within_m2 / within_dof)
+            item_codes = group_keys // (ITEM_STRIDE // SUBGROUP_STRIDE)
+            window_codes = group_keys % (ITEM_STRIDE // SUBGROUP_STRIDE)
+            limit_array = np.array([limits.get(code, (np.nan, np.nan)) for code in range(len(item_ids))],
+                                   dtype=np.float64).reshape(-1, 2)
+            usl = limit_array[item_codes, 0]
+            lsl = limit_array[item_codes, 1]
+            # 单边规格时，Cpk/Ppk 取存在的一侧
+            cp = (usl - lsl) / (6 * std_within)
+            pp = (usl - lsl) / (6 * std_overall)
+            cpk = np.fmin((usl - mean) / (3 * std_within), (mean - lsl) / (3 * std_within))
+            ppk = np.fmin((usl - mean) / (3 * std_overall), (mean - lsl) / (3 * std_overall))
+
+        item_names = np.array(list(item_ids.keys()), dtype=object)
+        window_names = np.array(list(window_ids.keys()), dtype=object)
+        result = pd.DataFrame({
+            'test_item': item_names[item_codes],
+            'window': window_names[window_codes],
+            'n': n.astype(np.int64),
+            'mean': mean,
+            'std_within': std_within,
+            'std_overall': std_overall,
+            'usl': usl,
+            'lsl': lsl,
+            'cp': cp,
+            'cpk': cpk,
+            'pp': pp,
+            'ppk': ppk,
+        })
+        result = result.replace([np.inf, -np.inf], np.nan)
+        return result.sort_values(['test_item', 'window'], ignore_index=True)
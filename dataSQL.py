@@ -1,11 +1,21 @@
+from __future__ import annotations  # 类型注解不在定义时求值（pandas 延迟导入）
 import sqlite3
-import re,json,sys,os
+import io,json,sys,os
 from pathlib import Path
 from typing import Tuple  # 优化类型提示
-import pandas as pd
+from lazyImport import lazy_import
 from typing import Optional
 from datetime import datetime
 import hashlib
+import threading
+from collections import OrderedDict
+from itemStats import ItemStatsTracker
+from recordsParser import NA_VALUES, REQUIRED_COLUMNS, ParsedRecords, parse_records_csv
+from timestampNormalizer import TimestampNormalizer
+from archiveMembers import member_md5, read_member, split_member_path
+
+pd = lazy_import("pandas")  # 第一次查询/解析时才导入，界面启动不等待 pandas
+np = lazy_import("numpy")
 
 if getattr(sys, 'frozen', False):
     # 已打包状态：获取可执行文件所在路径
@@ -17,15 +27,20 @@ else:
 # 配置文件路径
 CONFIG_PATH = os.path.join(os.path.join(app_path,"config"), 'config.json')
 
+# 测试时间格式统一（按站点缓存检测到的格式，按字符串缓存转换结果）
+TIME_NORMALIZER = TimestampNormalizer()
+
 def calculate_file_md5(file_path: str, chunk_size: int = 4096) -> str:
     """
     计算文件的MD5值（用于文件内容唯一性校验）
-    :param file_path: 文件路径
+    :param file_path: 文件路径（压缩包成员为 "压缩包路径!/成员路径"，按成员内容计算）
     :param chunk_size: 读取文件的块大小（默认4KB，避免大文件占用过多内存）
     :return: 文件的MD5十六进制字符串
     """
     md5_hash = hashlib.md5()
     try:
+        if split_member_path(file_path) is not None:
+            return member_md5(file_path)
         with open(file_path, "rb") as f:
             # 分块读取文件（适配大文件）
             while chunk := f.read(chunk_size):
@@ -35,7 +50,7 @@ def calculate_file_md5(file_path: str, chunk_size: int = 4096) -> str:
         print(f"❌ 计算文件MD5失败：{file_path}，错误：{str(e)}")
         return ""
 
-def convert_time_format(time_input):
+def convert_time_format(time_input, station=None):
     """
     将 A/B/C 三种时间格式统一转换为 C 格式 (2025-6-18 16:24:34)
     
@@ -44,95 +59,126 @@ def convert_time_format(time_input):
     A 格式: Jun 18 2025 4:24:34.3390 PM（英文月份+12小时制+毫秒）
     B 格式: 6月 18 2025 4:24:34.3390 上午（中文月份+12小时制+毫秒）
     C 格式: 2025-06-18 16:36:40.449000（标准格式+毫秒）
+    上午/下午 与 AM/PM 在 A/B 格式中都可以使用；整列转换用 TIME_NORMALIZER.normalize_series
     
     参数:
         time_input: 输入的时间（字符串/Timestamp/datetime 对象）
+        station: 站点（通道号），同一站点检测到的格式会被缓存
         
     返回:
-        str: 转换后的 C 格式时间字符串（无毫秒）
+        str: 转换后的 C 格式时间字符串（无毫秒），无法解析时返回原始字符串
     """
+    return TIME_NORMALIZER.normalize(time_input, station)
+
+
+# test_records.test_time 存为补0的 YYYY-MM-DD HH:MM:SS（字符串顺序即时间顺序，键集分页/时间筛选直接比较字符串）
+# 旧数据库的 C 格式时间在 init_db 中统一转换，完成后 PRAGMA user_version 记为 SORTABLE_TIME_VERSION
+SORTABLE_TIME_VERSION = 1
+SORTABLE_TIME_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'
+
+# get_fail_data_page 每行元组的字段顺序
+FAIL_PAGE_COLUMNS = ('id', 'slot_id', 'sn', 'test_time', 'test_item', 'test_value', 'test_usl', 'test_lsl',
+                     'test_result', 'file_path')
+
+
+def compute_fail_signature(fail_items) -> str:
+    """
+    计算fail签名：同一组fail测试项（与顺序无关）得到相同的签名
+    :param fail_items: 单个产品（单个records.csv）所有fail的测试项
+    :return: 16位十六进制签名，无fail项时返回空字符串
+    """
+    items = sorted(set(fail_items))
+    if not items:
+        return ""
+    return hashlib.sha1("\n".join(items).encode('utf-8')).hexdigest()[:16]
+
+
+def to_sortable_time(test_time) -> str:
+    """把 C 格式时间（月/日不补0）转为可按字符串排序的 YYYY-MM-DD HH:MM:SS，解析失败返回原值"""
     try:
-        # 第一步：统一将输入转为字符串（处理 Timestamp/datetime 类型）
-        if isinstance(time_input, (pd.Timestamp, datetime)):
-            time_str = time_input.strftime('%Y-%m-%d %H:%M:%S.%f')  # 转为带毫秒的字符串
-        else:
-            # 若为字符串，先去除首尾空格
-            time_str = str(time_input).strip()
-        
-        # 状态1：处理 C 格式（标准格式 + 毫秒，如 2025-06-18 16:36:40.449000）
-        # 匹配规则：YYYY-MM-DD HH:MM:SS.xxx（毫秒部分可选）
-        c_pattern = r'^\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}(\.\d+)?$'
-        if re.match(c_pattern, time_str):
-            # 截取毫秒前的字符串，再解析格式化（确保格式统一）
-            time_no_ms = time_str.split('.')[0]
-            dt = datetime.strptime(time_no_ms, '%Y-%m-%d %H:%M:%S')
-            return dt.strftime('%Y-%-m-%-d %H:%M:%S')  # %-m 去除月份前的0（如 06→6）
-        
-        # 状态2：处理 A 格式（英文月份 + 12小时制 + 毫秒）
-        english_months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", 
-                          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-        if any(month in time_str for month in english_months):
-            # 移除微秒部分（.后面的数字+可选空格）
-            time_str = re.sub(r'\.\d+\s*', ' ', time_str).strip()
-            # 解析英文格式（%b=英文缩写月，%I=12小时制，%p=AM/PM）
-            dt = datetime.strptime(time_str, '%b %d %Y %I:%M:%S %p')
-            return dt.strftime('%Y-%-m-%-d %H:%M:%S')
-        
-        # 状态3：处理 B 格式（中文月份 + 12小时制 + 毫秒）
-        elif '月' in time_str and ('上午' in time_str or '下午' in time_str):
-            # 中文月份映射（1月→1，12月→12）
-            month_map = {f"{i}月": str(i) for i in range(1, 13)}
-            for cn_month, num in month_map.items():
-                time_str = time_str.replace(cn_month, num)
-            
-            # 替换上午/下午为英文（适配 strptime 的 %p）
-            time_str = time_str.replace('上午', 'AM').replace('下午', 'PM')
-            # 移除微秒部分
-            time_str = re.sub(r'\.\d+\s*', ' ', time_str).strip()
-            
-            # 解析中文转换后的格式（%m=数字月，%I=12小时制，%p=AM/PM）
-            dt = datetime.strptime(time_str, '%m %d %Y %I:%M:%S %p')
-            return dt.strftime('%Y-%-m-%-d %H:%M:%S')
-        
-        # 所有格式不匹配时，尝试直接解析为datetime（兜底）
-        try:
-            dt = datetime.strptime(time_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-            print("兜底解析为 C 格式")
-            return dt.strftime('%Y-%-m-%-d %H:%M:%S')
-        except:
-            print("格式不匹配，返回原始字符串")
-            return time_str
-    
-    except Exception as e:
-        print(f"时间格式转换错误: {e}")
-        return str(time_input)  # 异常时返回原始输入的字符串形式
+        return datetime.strptime(str(test_time), '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return str(test_time)
 
 
 class TestData(object):
-    def __init__(self,DB_PATH):
+    # 判断文件是否已入库时查询的表（需要有 session_id/file_path/file_md5 列）
+    # fail_only 入库方式下全部PASS的文件没有 test_records 行，只能在 unit_summaries 中找到
+    FILE_INDEX_TABLES = ("test_records", "unit_summaries")
+    # handleDF 每次扫描的行数（SN/测试时间/通道号一般在文件开头几行，找到后不再继续扫描）
+    HEADER_SCAN_CHUNK = 64
+
+    def __init__(self,DB_PATH, read_only: bool = False):
+        """
+        :param read_only: 只读实例（入库进程方式下的界面进程）：不建表/迁移，不入库，退出时不写回WAL，
+                          数据库由入库进程创建和维护
+        """
         super(TestData, self).__init__()
         self.DB_PATH = DB_PATH
-        self.init_db()
+        self.read_only = read_only
+        self.commit_listeners = []  # 文件数据入库提交后的回调（如告警引擎）
+        self._query_local = threading.local()  # 每个线程的查询长连接和已编译的筛选集合
+        self._filter_table_seq = 0
+        # 查询结果缓存（LRU）：key 为规范化后的筛选条件，数据版本号变化时整体失效
+        self._result_cache = OrderedDict()
+        self._result_cache_size = 32
+        self._result_cache_generation = None
+        self._result_cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self.archive = None  # Parquet 归档（parquetArchive.ParquetArchive），设置后 query_test_data 同时查询归档
+        self.parser_engine = "pandas"  # records.csv 解析引擎：pandas / python（recordsParser，不导入 pandas）
+        self.record_mode = "all"  # 入库方式：all 保存所有测试行；fail_only 只保存FAIL行（recordMode）
+        self.pass_archive = None  # fail_only 时PASS行的压缩归档（recordMode.PassArchive），为None时PASS行不保存
+        if not read_only:
+            self.init_db()
+        # 按测试项的流式统计与漂移检测（状态保存在数据库中）
+        self.item_stats = ItemStatsTracker(self.DB_PATH, create_table=not read_only)
+        self.add_commit_listener(self.item_stats.on_unit_committed)
 
-    def parse_file(self, file_path: Path) -> Tuple[pd.DataFrame, str]:
+    def add_commit_listener(self, callback):
+        """
+        注册入库回调：每个文件的数据提交后调用 callback(data_tuples)
+        :param callback: 参数为该文件的行元组列表（字段顺序与 test_records 插入顺序一致）
+        """
+        self.commit_listeners.append(callback)
+
+    def _notify_committed(self, data_tuples):
+        """通知所有入库回调（回调异常不影响入库流程）"""
+        for callback in self.commit_listeners:
+            try:
+                callback(data_tuples)
+            except Exception as e:
+                print(f"❌ 入库回调执行失败：{str(e)}")
+
+    def parse_file(self, file_path: Path, data: Optional[bytes] = None) -> Tuple[pd.DataFrame, str]:
         """
         解析测试记录CSV文件（适配实际文件结构）
         返回：解析后的DataFrame（空DataFrame表示失败）、文件路径字符串
+        parser_engine 为 python 时返回 ParsedRecords（empty 为 True 表示失败），入库结果与 DataFrame 相同
+        :param file_path: 文件路径，压缩包成员为 "压缩包路径!/成员路径"（不解压到磁盘）
+        :param data: 已读取的文件内容（压缩包成员顺序读取时传入），为None时按路径读取
         """
+        if self.parser_engine == "python":
+            return parse_records_csv(file_path, data), str(file_path)
         try:
+            if data is None and split_member_path(file_path) is not None:
+                data = read_member(file_path)
+
+            def source():
+                # 压缩包成员从内存读取（每次读取用新的 BytesIO，pyarrow 失败后 C 引擎可以重新读取）
+                return file_path if data is None else io.BytesIO(data)
+
             # 1. 读取CSV，适配实际列名和数据类型
-            df = pd.read_csv(
-                file_path,
-                parse_dates=['startTime', 'stopTime'],  # 解析实际时间列
-                on_bad_lines='skip',  # 跳过异常行（如格式错误）
-                dtype={
-                    'measurementValue': float,  # 测试值（对应原函数test_value）
-                    'attributeValue': str,  # 关键属性值（如SN、产品名，存于attributeValue列）
-                    'testName': str,  # 测试名称（允许空，用str避免自动设为float）
-                    'status': str,  # 测试状态（成功/失败，允许空）
-                    'measurementUnits': str  # 测试单位（如V、A，允许空）
-                }
-            )
+            if self.parser_engine == "pyarrow":
+                try:
+                    df = self._read_records_csv(source(), engine="pyarrow")
+                except Exception as e:
+                    # pyarrow 解析失败时用 C 引擎重新解析（C 引擎也失败时才算解析失败）
+                    print(f"⚠️ pyarrow 解析失败，改用 C 引擎：{Path(file_path).name}：{str(e)}")
+                    df = self._read_records_csv(source())
+            else:
+                df = self._read_records_csv(source())
 
             # 2. 校验必要列（基于文件实际列名，确保核心数据不缺失）
             required_cols = [
@@ -156,20 +202,197 @@ class TestData(object):
             # df['startTime'] = df['startTime'].dt.strftime('%Y-%m-%d %H:%M:%S').fillna('')
             # df['stopTime'] = df['stopTime'].dt.strftime('%Y-%m-%d %H:%M:%S').fillna('')
 
-            # print(f"✅ 解析成功 {file_path.name} → 有效行数：{len(df)}")
+            # print(f"✅ 解析成功 {Path(file_path).name} → 有效行数：{len(df)}")
             return df, str(file_path)
 
         except Exception as e:
-            print(f"❌ 解析失败 {file_path.name}：{str(e)}")
+            print(f"❌ 解析失败 {Path(file_path).name}：{str(e)}")
             return pd.DataFrame(), str(file_path)
 
+    @staticmethod
+    def _read_records_csv(file_path, engine="c"):
+        """
+        读取records.csv中入库需要的列（其他列不解析）
+        startTime/stopTime 按字符串读取：handleDF 只用第一个非空的开始时间，由 convert_time_format 转换，不再整列解析日期
+        :param engine: c 为 pandas 的 C 解析引擎；pyarrow 为 pyarrow.csv 多线程解析
+        """
+        dtype = {
+            'measurementValue': float,  # 测试值（对应原函数test_value）
+            'attributeValue': str,  # 关键属性值（如SN、产品名，存于attributeValue列）
+            'testName': str,  # 测试名称（允许空，用str避免自动设为float）
+            'status': str,  # 测试状态（成功/失败，允许空）
+            'measurementUnits': str,  # 测试单位（如V、A，允许空）
+            'startTime': str,
+            'stopTime': str,
+        }
+        if engine != "pyarrow":
+            return pd.read_csv(
+                file_path,
+                usecols=list(REQUIRED_COLUMNS),  # 缺少必要列时直接解析失败
+                on_bad_lines='skip',  # 跳过异常行（如格式错误）
+                dtype=dtype
+            )
+        # 不用 pd.read_csv(engine="pyarrow")：它先按 Arrow 推断类型再转为 str，"0123" 这样的SN会变成 "123"
+        # 这里所有列先按字符串读取，异常行直接报错（由 parse_file 改用 C 引擎按 C 引擎的规则处理）
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        table = pa_csv.read_csv(file_path, convert_options=pa_csv.ConvertOptions(
+            include_columns=list(REQUIRED_COLUMNS),
+            column_types={col: pa.string() for col in REQUIRED_COLUMNS},
+            null_values=list(NA_VALUES),
+            strings_can_be_null=True,
+        ))
+        # 字符串列为 pandas 默认的 str 类型（pandas 3 中由 Arrow 存储，空值为 NaN，与 C 引擎一致）
+        df = table.to_pandas()
+        # 未指定类型的列按 C 引擎的规则推断：全为数字时转为 int64/float64（有空值时为 float64），否则保持字符串
+        for col in df.columns:
+            if dtype.get(col) is str:
+                continue
+            try:
+                values = pd.to_numeric(df[col].to_numpy(dtype=object))
+            except (ValueError, TypeError):
+                if dtype.get(col) is float:
+                    raise ValueError(f"could not convert string to float: {col}")
+                continue
+            df[col] = values.astype('float64') if dtype.get(col) is float else values
+        return df
+
     def init_db(self):
         """初始化数据库表（若不存在则创建）"""
         conn = sqlite3.connect(self.DB_PATH)#打开数据库的连接
         cursor = conn.cursor()#数据库的 “工具”
-        # 测试数据表：存储单次测试的所有测试项（单文件对应多行记录）
+        # 新数据库使用增量回收（必须在建表前设置），过期数据清理后可以分批缩小文件；
+        # WAL 模式下读写互不阻塞，后台清理/查询不影响入库
+        if cursor.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        self._create_records_table(cursor)
+        # fail签名表：同一组fail测试项对应一个签名，记录出现次数和首次/最近出现时间
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fail_signatures (
+            signature TEXT PRIMARY KEY,  -- fail测试项集合的哈希
+            test_items TEXT NOT NULL,  -- fail测试项（排序后用换行分隔）
+            item_count INTEGER NOT NULL,  -- fail测试项数量
+            unit_count INTEGER NOT NULL DEFAULT 0,  -- 出现该签名的产品数
+            first_seen DATETIME NOT NULL,  -- 首次出现的测试时间（YYYY-MM-DD HH:MM:SS）
+            last_seen DATETIME NOT NULL  -- 最近出现的测试时间（YYYY-MM-DD HH:MM:SS）
+        )
+        ''')
+        # 产品签名表：每个有fail的records.csv一行，用于按时间窗口分组显示
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS unit_signatures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            signature TEXT NOT NULL,
+            slot_id TEXT NOT NULL,
+            sn TEXT NOT NULL,
+            test_time DATETIME NOT NULL,  -- 测试时间（YYYY-MM-DD HH:MM:SS）
+            file_path TEXT NOT NULL,
+            session_id INTEGER NOT NULL DEFAULT 0  -- 所属监控会话
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_unit_sig_time ON unit_signatures(test_time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_unit_sig_signature ON unit_signatures(signature)')
+        # 产品汇总表：每个入库的records.csv一行（测试项数/fail数），fail_only 入库方式下代替PASS行统计产品数和良率
         cursor.execute('''
-        CREATE TABLE IF NOT EXISTS test_records (
+        CREATE TABLE IF NOT EXISTS unit_summaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            slot_id TEXT NOT NULL,
+            sn TEXT NOT NULL,
+            test_time DATETIME NOT NULL,  -- 测试时间（YYYY-MM-DD HH:MM:SS）
+            item_count INTEGER NOT NULL,  -- 测试项数
+            fail_count INTEGER NOT NULL,  -- fail测试项数
+            test_result TEXT NOT NULL,  -- 产品测试结果（有fail测试项为FAIL）
+            file_path TEXT NOT NULL,
+            file_md5 TEXT NOT NULL,
+            create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+            session_id INTEGER NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_unit_summary_session_time ON unit_summaries(session_id, test_time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_unit_summary_file_path ON unit_summaries(session_id, file_path)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_unit_summary_file_md5 ON unit_summaries(session_id, file_md5)')
+        # 数据库元信息：generation 为数据版本号，每次入库提交都会递增（用于缓存失效判断）
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS db_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('generation', 0)")
+        # pruned_id：RetentionPruner 已从 test_records 删除到的 id（之前的行只在 Parquet 归档中），
+        # 升级时取现存最小 id 之前（没有数据时为已归档到的 id）
+        cursor.execute('''
+            INSERT OR IGNORE INTO db_meta (key, value)
+            SELECT 'pruned_id', COALESCE(MIN(id) - 1, (SELECT value FROM db_meta WHERE key = 'archived_id'), 0)
+            FROM test_records
+        ''')
+        # 按天汇总（原始数据过期清理前写入，永久保留）
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            day TEXT NOT NULL,  -- 测试日期（YYYY-MM-DD）
+            test_item TEXT NOT NULL,
+            session_id INTEGER NOT NULL,
+            n INTEGER NOT NULL,  -- 测试次数
+            n_fail INTEGER NOT NULL,  -- fail次数
+            n_value INTEGER NOT NULL,  -- 数值型测试值的个数
+            value_sum REAL NOT NULL,
+            value_sum_sq REAL NOT NULL,
+            value_min REAL,
+            value_max REAL,
+            PRIMARY KEY (day, test_item, session_id)
+        ) WITHOUT ROWID
+        ''')
+        self._init_sessions(cursor)
+        self._init_search_index(cursor)
+        self._init_manifest(cursor)
+        conn.commit()
+        conn.close()
+        print(f"✅ 数据库初始化完成（文件路径：{self.DB_PATH}）")
+
+    def _init_manifest(self, cursor):
+        """
+        入库清单：同一个会话中每个文件内容（MD5）只能入库一次
+        每个文件一个入库事务，事务中先 INSERT OR IGNORE 清单，没有插入（其他入库路径/进程已入库）时回滚跳过，
+        监控和批量导入同时处理同一个文件时不会重复入库，崩溃后重新导入也不会重复
+        旧数据库升级时，已入库文件按 FILE_INDEX_TABLES 写入清单
+        """
+        is_new = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ingest_manifest'").fetchone() is None
+        self._create_manifest_table(cursor)
+        if not is_new:
+            return
+        existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+        for table in self.FILE_INDEX_TABLES:
+            if table in existing:
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO ingest_manifest (session_id, file_md5, file_path)
+                    SELECT session_id, file_md5, MIN(file_path) FROM {table} WHERE file_md5 != '' GROUP BY session_id, file_md5
+                ''')
+
+    @staticmethod
+    def _create_manifest_table(cursor, schema: str = "main"):
+        """
+        创建入库清单表（分区存储时每个分区文件也有一份，和该分区的测试数据在同一个文件中）
+        :param schema: 数据库名（main 或 ATTACH 的分区别名）
+        """
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.ingest_manifest (
+            session_id INTEGER NOT NULL,
+            file_md5 TEXT NOT NULL,
+            file_path TEXT NOT NULL,  -- 第一次入库时的文件路径
+            create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (session_id, file_md5)
+        ) WITHOUT ROWID
+        ''')
+
+    def _create_records_table(self, cursor, schema: str = "main"):
+        """
+        创建测试数据表和索引（分区存储时每个分区文件也用同样的表结构）
+        :param schema: 数据库名（main 或 ATTACH 的分区别名）
+        """
+        # 测试数据表：存储单次测试的所有测试项（单文件对应多行记录）
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.test_records (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             slot_id TEXT NOT NULL,  --产品测试通道号
             sn TEXT NOT NULL,  --产品SN
@@ -181,19 +404,278 @@ class TestData(object):
             test_result TEXT NOT NULL,  -- 测试结果（PASS/FAIL）
             file_path TEXT NOT NULL,  -- 源文件路径（避免重复入库）
             file_md5 TEXT NOT NULL,  -- 源文件md5值
-            create_time DATETIME DEFAULT CURRENT_TIMESTAMP  -- 数据入库时间
+            create_time DATETIME DEFAULT CURRENT_TIMESTAMP,  -- 数据入库时间
+            session_id INTEGER NOT NULL DEFAULT 0  -- 所属监控会话
         )
         ''')
+        # 旧数据库没有 session_id 列（已有数据在 _init_sessions 中归入第一个会话）
+        columns = [row[1] for row in cursor.execute(f"PRAGMA {schema}.table_info(test_records)").fetchall()]
+        if 'session_id' not in columns:
+            cursor.execute(f"ALTER TABLE {schema}.test_records ADD COLUMN session_id INTEGER NOT NULL DEFAULT 0")
         # 创建索引：加速按SN、测试项、时间查询
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sn ON test_records(sn)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_test_item ON test_records(test_item)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_test_time ON test_records(test_time)')
-        conn.commit()
-        conn.close()
-        print(f"✅ 数据库初始化完成（文件路径：{self.DB_PATH}）")
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_sn ON test_records(sn)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_test_item ON test_records(test_item)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_test_time ON test_records(test_time)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_file_path ON test_records(file_path)')
+        # 所有页面都按会话筛选：fail数据按时间倒序分页、按路径/MD5判断是否已入库
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_session_result_time ON test_records(session_id, test_result, test_time)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_session_file_path ON test_records(session_id, file_path)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_session_file_md5 ON test_records(session_id, file_md5)')
+        self._migrate_test_time(cursor, schema)
+
+    @staticmethod
+    def _migrate_test_time(cursor, schema: str = "main"):
+        """
+        旧数据库的 test_time 为 C 格式（月/日不补0，字符串顺序不是时间顺序），升级时统一转为 YYYY-MM-DD HH:MM:SS
+        :param schema: 数据库名（main 或 ATTACH 的分区别名），转换完成后记录在该文件的 user_version 中，之后不再扫描
+        """
+        if cursor.execute(f"PRAGMA {schema}.user_version").fetchone()[0] >= SORTABLE_TIME_VERSION:
+            return
+        cursor.connection.create_function("to_sortable_time", 1, to_sortable_time, deterministic=True)
+        cursor.execute(f"UPDATE {schema}.test_records SET test_time = to_sortable_time(test_time) "
+                       f"WHERE test_time NOT GLOB '{SORTABLE_TIME_GLOB}'")
+        if cursor.rowcount > 0:
+            print(f"🔧 已把 {cursor.rowcount} 行测试时间转为 YYYY-MM-DD HH:MM:SS（{schema}）")
+        cursor.execute(f"PRAGMA {schema}.user_version = {SORTABLE_TIME_VERSION}")
+
+    def _init_sessions(self, cursor):
+        """
+        监控会话：“清除数据”只是开始一个新会话，所有页面只显示当前会话的数据，历史会话仍可查询
+        旧数据库（没有 session_id 列）升级时，已有数据归入第一个会话
+        """
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_time DATETIME DEFAULT CURRENT_TIMESTAMP,  -- 会话开始时间
+            note TEXT NOT NULL DEFAULT ''  -- 备注
+        )
+        ''')
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(unit_signatures)").fetchall()]
+        if 'session_id' not in columns:
+            cursor.execute("ALTER TABLE unit_signatures ADD COLUMN session_id INTEGER NOT NULL DEFAULT 0")
+
+        cursor.execute("SELECT value FROM db_meta WHERE key = 'current_session'")
+        if cursor.fetchone() is None:
+            cursor.execute("INSERT INTO sessions (note) VALUES ('')")
+            session_id = cursor.lastrowid
+            cursor.execute("UPDATE test_records SET session_id = ? WHERE session_id = 0", (session_id,))
+            cursor.execute("UPDATE unit_signatures SET session_id = ? WHERE session_id = 0", (session_id,))
+            cursor.execute("INSERT INTO db_meta (key, value) VALUES ('current_session', ?)", (session_id,))
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_unit_sig_session_time ON unit_signatures(session_id, test_time)')
+
+    def get_current_session(self, conn=None) -> int:
+        """
+        获取当前监控会话id
+        :param conn: 使用已有的连接（如入库事务所在连接），为None时新建连接
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = sqlite3.connect(self.DB_PATH)
+        try:
+            return conn.execute("SELECT value FROM db_meta WHERE key = 'current_session'").fetchone()[0]
+        finally:
+            if own_conn:
+                conn.close()
+
+    def _resolve_session(self, conn, session_id) -> int:
+        """查询接口的 session_id 参数：None 表示当前会话"""
+        return self.get_current_session(conn) if session_id is None else int(session_id)
+
+    def start_new_session(self, note: str = "") -> int:
+        """
+        开始新的监控会话（O(1)，不删除任何数据），之后入库的数据和所有页面都只属于新会话
+        :param note: 会话备注
+        :return: 新会话id
+        """
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO sessions (note) VALUES (?)", (note,))
+            session_id = cursor.lastrowid
+            cursor.execute("UPDATE db_meta SET value = ? WHERE key = 'current_session'", (session_id,))
+            # 测试项统计只针对当前会话的数据：与会话切换在同一事务中清空（入库进程据会话变化重新加载）
+            self.item_stats.reset(cursor)
+            self._bump_generation(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"🆕 已开始新的监控会话：{session_id}")
+        return session_id
+
+    def list_sessions(self) -> pd.DataFrame:
+        """所有监控会话（最新的在前）"""
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            return pd.read_sql("SELECT id, start_time, note FROM sessions ORDER BY id DESC", conn)
+        finally:
+            conn.close()
+
+    def _init_search_index(self, cursor):
+        """
+        子串搜索索引：search_terms 保存去重后的SN/测试项/文件路径，FTS5 trigram 索引加速 LIKE '%x%' 类查询
+        SQLite 不支持 FTS5/trigram 时退化为在 search_terms（去重后的小表）上做 LIKE
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_terms'")
+        is_new = cursor.fetchone() is None
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS search_terms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,  -- sn / test_item / file_path
+            term TEXT NOT NULL,
+            UNIQUE(kind, term)
+        )
+        ''')
+        self.fts_enabled = True
+        try:
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_terms_fts USING fts5(
+                term, content='search_terms', content_rowid='id', tokenize='trigram'
+            )
+            ''')
+            # 只有新插入（未被 OR IGNORE 忽略）的词才会触发，保证 FTS 表与 search_terms 一致
+            cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS search_terms_ai AFTER INSERT ON search_terms BEGIN
+                INSERT INTO search_terms_fts(rowid, term) VALUES (new.id, new.term);
+            END
+            ''')
+            cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS search_terms_ad AFTER DELETE ON search_terms BEGIN
+                INSERT INTO search_terms_fts(search_terms_fts, rowid, term) VALUES ('delete', old.id, old.term);
+            END
+            ''')
+        except sqlite3.OperationalError as e:
+            self.fts_enabled = False
+            print(f"⚠️ 当前SQLite不支持FTS5 trigram，子串搜索使用LIKE：{str(e)}")
+
+        if is_new:
+            # 已有数据的数据库：一次性补齐搜索词
+            for kind in ('sn', 'test_item', 'file_path'):
+                cursor.execute(f"INSERT OR IGNORE INTO search_terms (kind, term) SELECT DISTINCT '{kind}', {kind} FROM test_records")
+
+    def _record_search_terms(self, cursor, data_tuples):
+        """单个文件入库时登记SN/测试项/文件路径搜索词（与测试数据在同一事务中提交）"""
+        if not data_tuples:
+            return
+        terms = {('sn', str(data_tuples[0][1])), ('file_path', str(data_tuples[0][8]))}
+        terms.update(('test_item', str(row[3])) for row in data_tuples)
+        cursor.executemany("INSERT OR IGNORE INTO search_terms (kind, term) VALUES (?, ?)", terms)
+
+    def search_terms(self, kind: str, text: str, limit: int = 1000) -> list:
+        """
+        子串搜索SN/测试项/文件路径
+        :param kind: sn / test_item / file_path
+        :param text: 子串（不区分大小写）
+        :return: 匹配的完整值列表
+        """
+        sql, params = self._substring_subquery(kind, text)
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            return [row[0] for row in conn.execute(f"{sql} LIMIT ?", params + [limit])]
+        finally:
+            conn.close()
+
+    def _substring_subquery(self, kind: str, text: str):
+        """生成“包含子串 text 的 kind 值”子查询（trigram 至少需要3个字符，更短时用LIKE）"""
+        text = text.strip()
+        if self.fts_enabled and len(text) >= 3:
+            phrase = '"' + text.replace('"', '""') + '"'
+            return ('''SELECT s.term FROM search_terms_fts f JOIN search_terms s ON s.id = f.rowid
+                       WHERE search_terms_fts MATCH ? AND s.kind = ?''', [phrase, kind])
+        escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return ("SELECT term FROM search_terms WHERE kind = ? AND term LIKE ? ESCAPE '\\'",
+                [kind, f'%{escaped}%'])
+
+    def query_daily_rollups(self, test_item: Optional[str] = None, start_day: str = "", end_day: str = "",
+                            session_id: Optional[int] = None) -> pd.DataFrame:
+        """
+        查询已清理原始数据的按天汇总（均值/标准差由 n_value/value_sum/value_sum_sq 计算）
+        :param start_day: 开始日期（YYYY-MM-DD），为空不限制
+        :param end_day: 结束日期（YYYY-MM-DD），为空不限制
+        :param session_id: 监控会话id，为None时不限制会话
+        """
+        conditions = ["1=1"]
+        params = []
+        for condition, value in (("test_item = ?", test_item), ("day >= ?", start_day), ("day <= ?", end_day),
+                                 ("session_id = ?", session_id)):
+            if value not in (None, ""):
+                conditions.append(condition)
+                params.append(value)
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            df = pd.read_sql(f"SELECT * FROM daily_rollups WHERE {' AND '.join(conditions)} ORDER BY day, test_item",
+                             conn, params=params)
+        finally:
+            conn.close()
+        df['mean'] = df['value_sum'] / df['n_value']
+        df['std'] = ((df['value_sum_sq'] - df['n_value'] * df['mean'] ** 2) / (df['n_value'] - 1)).clip(lower=0) ** 0.5
+        return df
+
+    def get_generation(self) -> int:
+        """获取当前数据版本号（入库提交后递增，版本号不变说明数据没有变化）"""
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            row = conn.execute("SELECT value FROM db_meta WHERE key = 'generation'").fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def _cached_query(self, key, compute):
+        """
+        按筛选条件缓存查询结果：数据版本号不变时直接返回缓存（DataFrame 返回深拷贝，调用方改动不影响缓存）
+        :param key: 规范化后的筛选条件元组
+        :param compute: 未命中时执行的查询函数（返回DataFrame或不可变的元组）
+        """
+        generation = self._get_query_conn().execute(
+            "SELECT value FROM db_meta WHERE key = 'generation'").fetchone()[0]
+        with self._result_cache_lock:
+            if generation != self._result_cache_generation:
+                self._result_cache.clear()
+                self._result_cache_generation = generation
+            if key in self._result_cache:
+                self._result_cache.move_to_end(key)
+                self._cache_hits += 1
+                return self._copy_result(self._result_cache[key])
+            self._cache_misses += 1
+
+        result = compute()
+        with self._result_cache_lock:
+            if generation == self._result_cache_generation:
+                self._result_cache[key] = result
+                while len(self._result_cache) > self._result_cache_size:
+                    self._result_cache.popitem(last=False)
+        return self._copy_result(result)
+
+    @staticmethod
+    def _copy_result(result):
+        """
+        DataFrame 返回深拷贝（浅拷贝与缓存共用数据，调用方原地修改数组时会改动缓存），
+        元组等不可变结果直接返回（不用 isinstance(pd.DataFrame)，分页查询不必导入 pandas）
+        """
+        return result if isinstance(result, tuple) else result.copy(deep=True)
+
+    def cache_stats(self) -> dict:
+        """查询结果缓存的命中统计"""
+        with self._result_cache_lock:
+            total = self._cache_hits + self._cache_misses
+            return {
+                "hits": self._cache_hits,
+                "misses": self._cache_misses,
+                "hit_rate": self._cache_hits / total if total else 0.0,
+                "size": len(self._result_cache),
+                "generation": self._result_cache_generation,
+            }
+
+    def _normalize_set(self, values_str) -> tuple:
+        """把多值筛选字符串规范化为排序后的元组（分隔符/顺序/重复不同但内容相同的筛选视为同一个）"""
+        return tuple(sorted(self.parse_exclude_str(values_str)))
+
+    def _bump_generation(self, cursor):
+        """在入库事务中递增数据版本号"""
+        cursor.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'generation'")
 
     #检查文件是否被处理，文件数据是否被加载到数据库里，文件夹地址和文件md5值，两个条件判断
-    def is_file_processed(self,file_path: str) -> bool:
+    def is_file_processed(self,file_path: str, session_id: Optional[int] = None) -> bool:
         conn = None
         current_file_md5 = calculate_file_md5(file_path)
         if not current_file_md5:
@@ -203,12 +685,13 @@ class TestData(object):
             """判断文件是否已入库（避免重复）"""
             conn = sqlite3.connect(self.DB_PATH)
             cursor = conn.cursor()
-            # 双重查询：匹配路径 或 匹配MD5值（两种情况都视为可能已入库）
-            cursor.execute('''
-                SELECT file_path, file_md5 FROM test_records  -- 字段顺序：路径在前，MD5在后
-                WHERE file_path = ? OR file_md5 = ?
-                LIMIT 1  -- 只要找到一条匹配记录即可
-            ''', (file_path, current_file_md5))
+            session_id = self._resolve_session(conn, session_id)
+            # 双重查询：当前会话中匹配路径 或 匹配MD5值（两种情况都视为可能已入库）
+            cursor.execute(" UNION ALL ".join(f'''
+                SELECT file_path, file_md5 FROM {table}  -- 字段顺序：路径在前，MD5在后
+                WHERE (session_id = ? AND file_path = ?) OR (session_id = ? AND file_md5 = ?)
+            ''' for table in self.FILE_INDEX_TABLES) + " LIMIT 1",  # 只要找到一条匹配记录即可
+                (session_id, str(file_path), session_id, current_file_md5) * len(self.FILE_INDEX_TABLES))
             
             result = cursor.fetchone()
             if not result:
@@ -257,10 +740,14 @@ class TestData(object):
         return "没值"
 
     #单笔数据插入数据库中，是监控时候，当监控文件夹的文件出现新的测试数据时候使用
-    def insert_test_data(self,df: pd.DataFrame, file_path: str) -> None:
+    def insert_test_data(self,df: pd.DataFrame, file_path: str) -> bool:
+        """
+        单个文件入库（一个事务，由入库清单保证不重复入库）
+        :return: 是否入库；已入库/无有效数据/入库失败时返回False
+        """
         if self.is_file_processed(file_path):
             print(f"⚠️ 文件已经被存储不可以再存储")
-            return
+            return False
 
         self.slot_id_test_name = "ID"
         try:
@@ -274,77 +761,332 @@ class TestData(object):
             # print("self.slot_id_test_name",self.slot_id_test_name)
             pass
 
-        df,device_sn,test_time,slotId = self.handleDF(df)
-
         current_file_md5 = calculate_file_md5(file_path)
 
         # 5. 准备批量插入数据
-        data_tuples = [
-            (
-                slotId,
-                device_sn,
-                test_time,
-                self.get_test_name(row),
-                self.get_test_value(row),
-                row['upperLimit'],
-                row['lowerLimit'],
-                row['status'],
-                file_path,
-                current_file_md5
-            )
-            for _, row in df.iterrows()
-        ]
+        if isinstance(df, ParsedRecords):
+            # python 解析引擎：解析时已提取每行的字段
+            device_sn = df.sn
+            data_tuples = self.parsed_records_tuples(df, file_path, current_file_md5)
+        else:
+            data_tuples = self.dataframe_tuples(df, file_path, current_file_md5)
+            device_sn = data_tuples[0][1] if data_tuples else "未知SN"
 
         # 6. 批量插入数据库
         if not data_tuples:
             print(f"⚠️ 无有效测试记录：文件={Path(file_path).name}，SN={device_sn}")
-            return
+            return False
 
+        conn = None
         try:
             conn = sqlite3.connect(self.DB_PATH)
-            cursor = conn.cursor()
-            # print(data_tuples)
-            cursor.executemany('''
-                INSERT INTO test_records (slot_id, sn, test_time, test_item, test_value, test_usl, test_lsl, test_result, file_path, file_md5)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', data_tuples)
-            conn.commit()
+            self._prepare_insert(conn, self._stored_rows(data_tuples))
+            session_id = self.get_current_session(conn)
+            if not self._insert_unit(conn, data_tuples, session_id):
+                print(f"⚠️ 文件已经被存储不可以再存储")
+                return False
+            self._notify_committed(data_tuples)
             # print(f"✅ 数据入库成功：SN={device_sn}，测试项数={len(data_tuples)}，文件={Path(file_path).name}")
+            return True
         except sqlite3.Error as db_err:
-            conn.rollback()
             print(f"❌ 数据库插入失败：SN={device_sn}，错误={str(db_err)}")
+            return False
+        except OSError as e:
+            print(f"❌ PASS数据归档失败，文件未入库：SN={device_sn}，错误={str(e)}")
+            return False
         finally:
             if conn:
                 conn.close()
 
+    def _insert_unit(self, conn, data_tuples, session_id) -> bool:
+        """
+        一个文件的入库事务：先 INSERT OR IGNORE 入库清单，再写入测试数据/产品汇总/fail签名/搜索词/数据版本号/PASS归档
+        BEGIN IMMEDIATE 先拿写锁（其他进程正在入库时等待，而不是在事务中途失败）
+        :return: 是否提交；清单中已有该文件（其他入库路径/进程已入库）时回滚并返回False
+        """
+        file_path, file_md5 = str(data_tuples[0][8]), str(data_tuples[0][9])
+        stored_tuples = self._stored_rows(data_tuples)
+        archived = None
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # MD5计算失败的文件无法判断是否重复，不写清单（与 is_file_processed 一致，视为未入库）
+            if file_md5 and not self._claim_unit(cursor, stored_tuples, session_id, file_path, file_md5):
+                conn.rollback()
+                return False
+            if stored_tuples:
+                self._insert_rows(cursor, stored_tuples, session_id)
+            self._record_unit_summary(cursor, data_tuples, session_id)
+            self._record_signature(cursor, data_tuples, session_id)
+            self._record_search_terms(cursor, data_tuples)
+            self._bump_generation(cursor)
+            # PASS行在提交前归档（仍持有写锁）：归档失败时整个文件回滚，清单中没有该文件，之后重新入库
+            archived = self._archive_pass_rows(data_tuples, session_id)
+            conn.commit()
+            return True
+        except Exception:
+            # 先撤销PASS归档再回滚：仍持有写锁，其他入库不会在撤销之前追加到同一个归档文件
+            if archived is not None:
+                self.pass_archive.discard(*archived)
+            conn.rollback()
+            raise
+
+    def _claim_unit(self, cursor, stored_tuples, session_id, file_path, file_md5) -> bool:
+        """
+        在入库事务中写入入库清单
+        :param stored_tuples: 该文件写入 test_records 的行（分区存储时清单同时写入这些行所在的分区）
+        :return: 是否写入；清单中已有该文件时返回False
+        """
+        cursor.execute("INSERT OR IGNORE INTO ingest_manifest (session_id, file_md5, file_path) VALUES (?, ?, ?)",
+                       (session_id, file_md5, file_path))
+        return cursor.rowcount > 0
+
+    def _stored_rows(self, data_tuples):
+        """写入 test_records 的行：fail_only 入库方式只保存FAIL行（入库回调仍然收到所有行）"""
+        if self.record_mode != "fail_only":
+            return data_tuples
+        return [row for row in data_tuples if row[7] == 'FAIL']
+
+    def _record_unit_summary(self, cursor, data_tuples, session_id):
+        """单个文件入库时写入产品汇总（与测试数据在同一事务中提交）"""
+        if not data_tuples:
+            return
+        fail_count = sum(1 for row in data_tuples if row[7] == 'FAIL')
+        slot_id, sn, test_time = data_tuples[0][0], data_tuples[0][1], to_sortable_time(data_tuples[0][2])
+        cursor.execute('''
+            INSERT INTO unit_summaries (slot_id, sn, test_time, item_count, fail_count, test_result, file_path, file_md5, session_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (str(slot_id), str(sn), test_time, len(data_tuples), fail_count, 'FAIL' if fail_count else 'PASS',
+              str(data_tuples[0][8]), str(data_tuples[0][9]), session_id))
+
+    def _archive_pass_rows(self, data_tuples, session_id):
+        """
+        fail_only 入库方式：在入库事务中把 PASS 行追加到压缩归档（失败时抛出 OSError，由 _insert_unit 回滚）
+        :return: 撤销本次追加用的 (归档文件路径, 追加前大小, 追加后大小)，没有归档时为None
+        进程在归档之后、提交之前崩溃时，重新入库会再追加一次（PASS 归档中出现重复行，不会丢失）
+        """
+        if self.record_mode != "fail_only" or self.pass_archive is None:
+            return None
+        return self.pass_archive.write_rows([row for row in data_tuples if row[7] != 'FAIL'], session_id)
+
+    def _prepare_insert(self, conn, data_tuples):
+        """入库事务开始前的准备（单文件存储不需要；分区存储在这里 ATTACH 目标分区）"""
+
+    def _insert_rows(self, cursor, data_tuples, session_id):
+        """写入测试数据行（分区存储时按测试时间写入对应的分区）"""
+        cursor.executemany('''
+            INSERT INTO test_records (slot_id, sn, test_time, test_item, test_value, test_usl, test_lsl, test_result, file_path, file_md5, session_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [row + (session_id,) for row in data_tuples])
+
+    def record_sources(self, conn, start_time_str: str = "", end_time_str: str = "", descending: bool = False):
+        """
+        查询需要读取的测试数据表，生成 (表名, 最小id, 最大id/None)，按时间（也是id）升序或降序
+        单文件存储只有 main.test_records；分区存储只返回与时间范围重叠的分区（读取期间临时 ATTACH 到 conn）
+        """
+        yield "main.test_records", 0, None
+
+    def stored_id_ranges(self, conn) -> list:
+        """
+        仍保存在 SQLite 中的测试数据 id 区间 [(最小id, 最大id/None), ...]
+        归档后、删除前的行同时在数据库和归档中，查询归档时排除这些区间，同一行不会返回两次
+        单文件存储按 id 顺序删除，pruned_id 之后的行都还在数据库中
+        """
+        pruned_id = conn.execute("SELECT value FROM db_meta WHERE key = 'pruned_id'").fetchone()[0]
+        return [(pruned_id + 1, None)]
+
+    def max_record_id(self) -> int:
+        """测试数据当前的最大 id（入库进程通知界面的高水位），没有数据时为0"""
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            # 按 id 降序遍历数据表，第一个有数据的表中的最大 id 即为全局最大
+            for table, _, _ in self.record_sources(conn, descending=True):
+                max_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+                if max_id is not None:
+                    return max_id
+            return 0
+        finally:
+            conn.close()
+
     def query_test_data(
         self,
         sn: Optional[str] = None,
         test_item: Optional[str] = None,
         start_time: Optional[str] = None,
-        end_time: Optional[str] = None
+        end_time: Optional[str] = None,
+        session_id: Optional[int] = None
     ) -> pd.DataFrame:
-        """按需查询测试数据（支持按SN、测试项、时间范围筛选）"""
+        """按需查询测试数据（支持按SN、测试项、时间范围、监控会话筛选，会话为None时使用当前会话）"""
         conn = sqlite3.connect(self.DB_PATH)
-        # 构建查询条件
-        query = "SELECT sn, test_time, test_item, test_value FROM test_records WHERE 1=1"
-        params = []
+        try:
+            # 构建查询条件
+            session_id = self._resolve_session(conn, session_id)
+            conditions, params = self._build_test_data_conditions(sn, test_item, start_time, end_time, session_id)
+            # 执行查询并解析时间列（分区存储时逐个分区查询后合并）
+            frames = [
+                pd.read_sql(f"SELECT sn, test_time, test_item, test_value FROM {table} WHERE {' AND '.join(conditions)}",
+                            conn, params=params, parse_dates=['test_time'])
+                for table, _, _ in self.record_sources(conn, start_time or "", end_time or "")
+            ]
+            # 读取数据库之后再取 id 区间：期间被清理的行会出现在归档结果中，不会漏掉
+            stored_ids = self.stored_id_ranges(conn) if self.archive is not None else []
+        finally:
+            conn.close()
+        # 已归档的数据（只读取需要的列，跳过仍在数据库中的行）
+        if self.archive is not None:
+            archived = self.archive.query(sn, test_item, start_time, end_time, session_id, exclude_ids=stored_ids)
+            if len(archived):
+                archived['test_time'] = archived['test_time'].astype(frames[0]['test_time'].dtype)
+                frames.append(archived)
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        return df.sort_values(['sn', 'test_time'])  # 按SN和时间排序
+
+    def _build_test_data_conditions(self, sn, test_item, start_time, end_time, session_id):
+        """query_test_data 系列接口的筛选条件"""
+        conditions = ["session_id = ?"]
+        params = [session_id]
         if sn:
-            query += " AND sn = ?"
+            conditions.append("sn = ?")
             params.append(sn)
         if test_item:
-            query += " AND test_item = ?"
+            conditions.append("test_item = ?")
             params.append(test_item)
         if start_time:
-            query += " AND test_time >= ?"
-            params.append(start_time)
+            conditions.append("test_time >= ?")
+            params.append(to_sortable_time(start_time))
         if end_time:
-            query += " AND test_time <= ?"
-            params.append(end_time)
-        # 执行查询并解析时间列
-        df = pd.read_sql(query, conn, params=params, parse_dates=['test_time'])
-        conn.close()
-        return df.sort_values(['sn', 'test_time'])  # 按SN和时间排序
+            conditions.append("test_time <= ?")
+            params.append(to_sortable_time(end_time))
+        return conditions, params
+
+    def query_test_data_page(
+        self,
+        sn: Optional[str] = None,
+        test_item: Optional[str] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        page_size: int = 1000,
+        cursor: Optional[tuple] = None,
+        session_id: Optional[int] = None
+    ):
+        """
+        键集分页查询测试数据（按 test_time, id 升序），每页只读取 page_size 行
+        :param cursor: 上一页返回的游标，None表示第一页
+        :param session_id: 监控会话id，为None时使用当前会话
+        :return: (本页行元组列表 [(id, sn, test_time, test_item, test_value), ...], 下一页游标/None)
+        """
+        conn = self._get_query_conn()
+        conditions, params = self._build_test_data_conditions(
+            sn, test_item, start_time, end_time, self._resolve_session(conn, session_id))
+        rows = []
+        for table, low, high in self.record_sources(conn, start_time or "", end_time or ""):
+            if cursor is not None and high is not None and high < cursor[1]:
+                continue  # 游标之前的分区已经读完
+            source_conditions, source_params = list(conditions), list(params)
+            if cursor is not None and low <= cursor[1]:
+                source_conditions.append("(test_time, id) > (?, ?)")
+                source_params.extend(cursor)
+            rows += conn.execute(f'''
+                SELECT id, sn, test_time, test_item, test_value FROM {table}
+                WHERE {' AND '.join(source_conditions)}
+                ORDER BY test_time, id LIMIT ?
+            ''', source_params + [page_size - len(rows)]).fetchall()
+            if len(rows) >= page_size:
+                break
+        next_cursor = (rows[-1][2], rows[-1][0]) if len(rows) == page_size else None
+        return rows, next_cursor
+
+    def iter_item_values(self, test_item: str, chunk_size: int = 50000, id_ranges=None,
+                         session_id: Optional[int] = None):
+        """
+        按 id 键集分页读取某个测试项的测试值（不一次性加载全部数据）
+        :param test_item: 测试项
+        :param chunk_size: 每页行数
+        :param id_ranges: 只读取这些 (起始id, 结束id) 区间（闭区间），为None时读取全部
+        :param session_id: 监控会话id，为None时使用当前会话
+        :return: 生成器，每次返回一页 [(id, test_time, test_value, test_usl, test_lsl), ...]
+        """
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            session_id = self._resolve_session(conn, session_id)
+            for table, source_low, source_high in self.record_sources(conn):
+                for low, high in (id_ranges if id_ranges is not None else [(0, None)]):
+                    # 只读取 id 区间与该数据表（分区）重叠的部分
+                    if (source_high is not None and low > source_high) or (high is not None and high < source_low):
+                        continue
+                    last_id = max(low, source_low) - 1
+                    while True:
+                        query = f'''
+                            SELECT id, test_time, test_value, test_usl, test_lsl FROM {table}
+                            WHERE test_item = ? AND session_id = ? AND id > ?
+                        '''
+                        params = [test_item, session_id, last_id]
+                        if high is not None:
+                            query += " AND id <= ?"
+                            params.append(high)
+                        query += " ORDER BY id LIMIT ?"
+                        params.append(chunk_size)
+                        rows = conn.execute(query, params).fetchall()
+                        if not rows:
+                            break
+                        yield rows
+                        last_id = rows[-1][0]
+                        if len(rows) < chunk_size:
+                            break
+        finally:
+            conn.close()
+
+    def _get_query_conn(self):
+        """
+        查询用的长连接（每个线程一个）：临时表只在所属连接中可见，长连接才能在多次刷新之间复用编译好的筛选集合
+        """
+        conn = getattr(self._query_local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.DB_PATH)
+            self._query_local.conn = conn
+            self._query_local.filter_tables = OrderedDict()  # frozenset(值) -> 临时表名
+        return conn
+
+    def _close_query_conn(self):
+        conn = getattr(self._query_local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._query_local.conn = None
+
+    def close(self):
+        """退出前调用：关闭当前线程的查询连接，并把WAL中的数据写回数据库文件（只读实例只关闭连接）"""
+        self._close_query_conn()
+        if self.read_only:
+            return
+        conn = sqlite3.connect(self.DB_PATH, timeout=30)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        finally:
+            conn.close()
+
+    def _compile_filter_set(self, conn, values, max_tables: int = 16) -> str:
+        """
+        把筛选值集合写入带主键索引的临时表，返回表名（用于 column [NOT] IN temp.xxx）
+        相同的集合直接复用已编译的临时表，集合没有变化时刷新不会重复写入
+        """
+        key = frozenset(values)
+        filter_tables = self._query_local.filter_tables
+        table = filter_tables.get(key)
+        if table is not None:
+            filter_tables.move_to_end(key)
+            return table
+
+        self._filter_table_seq += 1
+        table = f"temp.filter_set_{self._filter_table_seq}"
+        conn.execute(f"CREATE TABLE {table} (value TEXT PRIMARY KEY) WITHOUT ROWID")
+        conn.executemany(f"INSERT OR IGNORE INTO {table} (value) VALUES (?)", [(str(v),) for v in key])
+        conn.commit()
+        filter_tables[key] = table
+        # 只保留最近使用的若干个集合
+        while len(filter_tables) > max_tables:
+            _, old_table = filter_tables.popitem(last=False)
+            conn.execute(f"DROP TABLE IF EXISTS {old_table}")
+        return table
 
     def parse_exclude_str(self, exclude_str):
         """
@@ -368,59 +1110,49 @@ class TestData(object):
                       test_item_exclude_str="",
                       slot_id_exclude_str="",
                       start_time_str="",
-                      end_time_str=""):
+                      end_time_str="",
+                      test_item_filter="",
+                      file_path_filter="",
+                      test_item_include_str="",
+                      slot_id_include_str="",
+                      session_id=None):
         """
         获取测试失败的数据，支持多维度筛选
-        :param sn_filter: SN筛选关键词（模糊匹配），默认为空不筛选
+        :param sn_filter: SN筛选关键词（子串匹配，走trigram索引），默认为空不筛选
+        :param test_item_filter: 测试项筛选关键词（子串匹配），默认为空不筛选
+        :param file_path_filter: 源文件路径筛选关键词（子串匹配），默认为空不筛选
         :param test_item_exclude_str: 排除的test_item字符串（多值用逗号/分号/空格分隔）
         :param slot_id_exclude_str: 排除的slot_id字符串（多值用逗号/分号/空格分隔）
+        :param test_item_include_str: 只保留的test_item字符串（多值用逗号/分号/空格分隔），为空不限制
+        :param slot_id_include_str: 只保留的slot_id字符串（多值用逗号/分号/空格分隔），为空不限制
         :param start_datetime: 开始时间（QDateTime对象），None则不限制
         :param end_datetime: 结束时间（QDateTime对象），None则不限制
+        :param session_id: 监控会话id，为None时使用当前会话
         :return: 筛选后的失败数据DataFrame
         """
-        conn = sqlite3.connect(self.DB_PATH)
+        cache_key = ('fail_data',
+                     (sn_filter or "").strip(), (test_item_filter or "").strip(), (file_path_filter or "").strip(),
+                     self._normalize_set(test_item_exclude_str), self._normalize_set(slot_id_exclude_str),
+                     self._normalize_set(test_item_include_str), self._normalize_set(slot_id_include_str),
+                     start_time_str, end_time_str, session_id)
+        return self._cached_query(cache_key, lambda: self._query_fail_data(
+            sn_filter, test_item_exclude_str, slot_id_exclude_str, start_time_str, end_time_str,
+            test_item_filter, file_path_filter, test_item_include_str, slot_id_include_str, session_id))
+
+    def _query_fail_data(self, sn_filter, test_item_exclude_str, slot_id_exclude_str, start_time_str, end_time_str,
+                         test_item_filter, file_path_filter, test_item_include_str, slot_id_include_str,
+                         session_id=None):
+        """get_fail_data 的实际查询（不经过缓存）"""
+        conn = self._get_query_conn()
         try:
-            # ========== 1. 初始化基础条件和参数 ==========
-            base_conditions = [
-                "test_result = 'FAIL'",
-                "test_time != '未知时间'"  # 排除无效时间
-            ]
-            query_params = []
-
-            # ========== 2. 解析test_item排除条件 ==========
-            exclude_test_items = self.parse_exclude_str(test_item_exclude_str)
-            if exclude_test_items != "" :
-                # 生成 test_item NOT IN (?, ?, ...) 条件
-                placeholders = ', '.join(['?'] * len(exclude_test_items))
-                base_conditions.append(f"test_item NOT IN ({placeholders})")
-                query_params.extend(exclude_test_items)
-
-            # ========== 3. 解析slot_id排除条件 ==========
-            exclude_slot_ids = self.parse_exclude_str(slot_id_exclude_str)
-            if exclude_slot_ids:
-                # 注意：slot_id如果是数字类型，需确保传入的是数字字符串
-                placeholders = ', '.join(['?'] * len(exclude_slot_ids))
-                base_conditions.append(f"slot_id NOT IN ({placeholders})")
-                query_params.extend(exclude_slot_ids)
-
-            # ========== 4. 时间范围筛选（test_time） ==========
-            if start_time_str != "":
-                base_conditions.append("test_time >= ?")
-                query_params.append(start_time_str)
-
-            if end_time_str != "":
-                base_conditions.append("test_time <= ?")
-                query_params.append(end_time_str)
-
-            # ========== 5. SN模糊筛选 ==========
-            if sn_filter and sn_filter.strip():
-                base_conditions.append("sn LIKE ?")
-                query_params.append(f'%{sn_filter.strip()}%')
-
-            # ========== 6. 组装查询语句 ==========
+            base_conditions, query_params = self._build_fail_conditions(
+                conn, sn_filter, test_item_exclude_str, slot_id_exclude_str, start_time_str, end_time_str,
+                test_item_filter, file_path_filter, test_item_include_str, slot_id_include_str, session_id)
+
+            # ========== 6. 组装查询语句（分区存储时逐个分区查询，按时间倒序合并） ==========
             fail_query = f"""
             SELECT slot_id, sn, test_time, test_item, test_value, test_usl, test_lsl, test_result, file_path 
-            FROM test_records 
+            FROM {{table}} 
             WHERE {' AND '.join(base_conditions)}
             ORDER BY test_time DESC
             """
@@ -434,18 +1166,137 @@ class TestData(object):
             # print("拼接后SQL：", temp_sql)
 
             # ========== 7. 执行查询 ==========
-            fail_df = pd.read_sql(
-                fail_query,
-                conn,
-                params=query_params,
-                parse_dates=['test_time']  # 自动解析为datetime类型
-            )
+            frames = [
+                pd.read_sql(
+                    fail_query.format(table=table),
+                    conn,
+                    params=query_params,
+                    parse_dates=['test_time']  # 自动解析为datetime类型
+                )
+                for table, _, _ in self.record_sources(conn, start_time_str, end_time_str, descending=True)
+            ]
+            fail_df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
 
-        finally:
-            conn.close()
+        except sqlite3.Error:
+            # 连接出错时丢弃，下次查询重新建立
+            self._close_query_conn()
+            raise
 
         return fail_df
 
+    def _build_fail_conditions(self, conn, sn_filter="", test_item_exclude_str="", slot_id_exclude_str="",
+                               start_time_str="", end_time_str="", test_item_filter="", file_path_filter="",
+                               test_item_include_str="", slot_id_include_str="", session_id=None):
+        """fail数据的筛选条件（get_fail_data/get_fail_data_page 共用）"""
+        # ========== 1. 初始化基础条件和参数（只查询指定/当前监控会话） ==========
+        base_conditions = [
+            "session_id = ?",
+            "test_result = 'FAIL'",
+            "test_time != '未知时间'"  # 排除无效时间
+        ]
+        query_params = [self._resolve_session(conn, session_id)]
+
+        # ========== 2/3. test_item、slot_id 的排除/包含条件（编译为临时表，不再逐项绑定参数） ==========
+        for column, values_str, exclude in (('test_item', test_item_exclude_str, True),
+                                            ('slot_id', slot_id_exclude_str, True),
+                                            ('test_item', test_item_include_str, False),
+                                            ('slot_id', slot_id_include_str, False)):
+            values = self.parse_exclude_str(values_str)
+            if values:
+                table = self._compile_filter_set(conn, values)
+                base_conditions.append(f"{column} {'NOT IN' if exclude else 'IN'} {table}")
+
+        # ========== 4. 时间范围筛选（test_time，筛选时间也转为补0格式再比较字符串） ==========
+        if start_time_str != "":
+            base_conditions.append("test_time >= ?")
+            query_params.append(to_sortable_time(start_time_str))
+
+        if end_time_str != "":
+            base_conditions.append("test_time <= ?")
+            query_params.append(to_sortable_time(end_time_str))
+
+        # ========== 5. SN/测试项/文件路径子串筛选（先在搜索索引中找到完整值，再走普通索引） ==========
+        for column, keyword in (('sn', sn_filter), ('test_item', test_item_filter), ('file_path', file_path_filter)):
+            if keyword and keyword.strip():
+                subquery, subquery_params = self._substring_subquery(column, keyword)
+                base_conditions.append(f"{column} IN ({subquery})")
+                query_params.extend(subquery_params)
+        return base_conditions, query_params
+
+    def get_fail_data_page(self, page_size: int = 500, cursor: Optional[tuple] = None, **filters):
+        """
+        键集分页获取fail数据（按 test_time, id 降序），每页只读取 page_size 行，不构建DataFrame
+        :param page_size: 每页行数
+        :param cursor: 上一页返回的游标，None表示第一页
+        :param filters: 与 get_fail_data 相同的筛选参数
+        :return: (本页行元组列表，字段顺序见 FAIL_PAGE_COLUMNS, 下一页游标/None)
+        """
+        cache_key = ('fail_page', page_size, cursor,
+                     (filters.get('sn_filter') or "").strip(), (filters.get('test_item_filter') or "").strip(),
+                     (filters.get('file_path_filter') or "").strip(),
+                     self._normalize_set(filters.get('test_item_exclude_str')),
+                     self._normalize_set(filters.get('slot_id_exclude_str')),
+                     self._normalize_set(filters.get('test_item_include_str')),
+                     self._normalize_set(filters.get('slot_id_include_str')),
+                     filters.get('start_time_str', ""), filters.get('end_time_str', ""), filters.get('session_id'))
+        return self._cached_query(cache_key, lambda: self._query_fail_data_page(page_size, cursor, filters))
+
+    def iter_fail_data_pages(self, page_size: int = 50000, **filters):
+        """
+        逐页读取全部fail数据（按 test_time, id 降序），不经过结果缓存，内存只与 page_size 有关（用于导出）
+        :param filters: 与 get_fail_data 相同的筛选参数
+        :return: 生成器，每次返回一页行元组（字段顺序见 FAIL_PAGE_COLUMNS）
+        """
+        cursor = None
+        while True:
+            rows, cursor = self._query_fail_data_page(page_size, cursor, filters)
+            if rows:
+                yield rows
+            if cursor is None:
+                break
+
+    def count_fail_data(self, **filters) -> int:
+        """符合筛选条件的fail数据行数（参数与 get_fail_data 相同）"""
+        conn = self._get_query_conn()
+        try:
+            conditions, params = self._build_fail_conditions(conn, **filters)
+            return sum(
+                conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {' AND '.join(conditions)}", params).fetchone()[0]
+                for table, _, _ in self.record_sources(conn, filters.get('start_time_str', ""),
+                                                       filters.get('end_time_str', ""))
+            )
+        except sqlite3.Error:
+            self._close_query_conn()
+            raise
+
+    def _query_fail_data_page(self, page_size, cursor, filters):
+        """get_fail_data_page 的实际查询（不经过缓存）"""
+        conn = self._get_query_conn()
+        try:
+            conditions, params = self._build_fail_conditions(conn, **filters)
+            rows = []
+            for table, low, high in self.record_sources(conn, filters.get('start_time_str', ""),
+                                                         filters.get('end_time_str', ""), descending=True):
+                if cursor is not None and low > cursor[1]:
+                    continue  # 游标之后（更新）的分区已经读完
+                source_conditions, source_params = list(conditions), list(params)
+                if cursor is not None and (high is None or cursor[1] <= high):
+                    source_conditions.append("(test_time, id) < (?, ?)")
+                    source_params.extend(cursor)
+                rows += conn.execute(f'''
+                    SELECT {', '.join(FAIL_PAGE_COLUMNS)} FROM {table}
+                    WHERE {' AND '.join(source_conditions)}
+                    ORDER BY test_time DESC, id DESC LIMIT ?
+                ''', source_params + [page_size - len(rows)]).fetchall()
+                if len(rows) >= page_size:
+                    break
+        except sqlite3.Error:
+            self._close_query_conn()
+            raise
+        time_index, id_index = FAIL_PAGE_COLUMNS.index('test_time'), FAIL_PAGE_COLUMNS.index('id')
+        next_cursor = (rows[-1][time_index], rows[-1][id_index]) if len(rows) == page_size else None
+        return tuple(rows), next_cursor
+
     # def get_fail_data(self, sn_filter=""):
     #     """
     #     获取测试失败的数据，排除test_item为CHECK_STATION_SECURITY和OrphanedRequiredLimits的记录
@@ -487,74 +1338,252 @@ class TestData(object):
         
     #     return fail_df
 
+    #单个文件入库时记录fail签名（与测试数据在同一事务中提交）
+    def _record_signature(self, cursor, data_tuples, session_id):
+        """
+        计算并保存单个文件的fail签名
+        :param cursor: 入库事务所在的游标
+        :param data_tuples: 该文件的行元组列表（字段顺序与 test_records 插入顺序一致）
+        :param session_id: 所属监控会话
+        """
+        if not data_tuples:
+            return
+        fail_items = sorted({row[3] for row in data_tuples if row[7] == 'FAIL'})
+        signature = compute_fail_signature(fail_items)
+        if not signature:
+            return
+        slot_id, sn, test_time = data_tuples[0][0], data_tuples[0][1], to_sortable_time(data_tuples[0][2])
+        cursor.execute('''
+            INSERT INTO fail_signatures (signature, test_items, item_count, unit_count, first_seen, last_seen)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT(signature) DO UPDATE SET
+                unit_count = unit_count + 1,
+                first_seen = MIN(first_seen, excluded.first_seen),
+                last_seen = MAX(last_seen, excluded.last_seen)
+        ''', (signature, "\n".join(fail_items), len(fail_items), test_time, test_time))
+        cursor.execute('''
+            INSERT INTO unit_signatures (signature, slot_id, sn, test_time, file_path, session_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (signature, str(slot_id), str(sn), test_time, str(data_tuples[0][8]), session_id))
+
+    def get_fail_signature_groups(self,
+                                  test_item_exclude_str="",
+                                  start_time_str="",
+                                  end_time_str="",
+                                  session_id=None):
+        """
+        按fail签名分组统计时间窗口内的fail产品（同一组fail测试项视为同一根因）
+        :param test_item_exclude_str: 排除的test_item字符串，排除后按剩余fail项重新分组
+        :param start_time_str: 开始时间（YYYY-MM-DD HH:MM:SS），为空不限制
+        :param end_time_str: 结束时间（YYYY-MM-DD HH:MM:SS），为空不限制
+        :param session_id: 监控会话id，为None时使用当前会话
+        :return: 每个签名一行的DataFrame，按产品数降序
+        """
+        cache_key = ('signature_groups', self._normalize_set(test_item_exclude_str), start_time_str, end_time_str,
+                     session_id)
+        return self._cached_query(cache_key, lambda: self._query_fail_signature_groups(
+            test_item_exclude_str, start_time_str, end_time_str, session_id))
+
+    def _query_fail_signature_groups(self, test_item_exclude_str, start_time_str, end_time_str, session_id=None):
+        """get_fail_signature_groups 的实际查询（不经过缓存）"""
+        conn = sqlite3.connect(self.DB_PATH)
+        conditions = ["u.session_id = ?"]
+        params = [self._resolve_session(conn, session_id)]
+        if start_time_str != "":
+            conditions.append("u.test_time >= ?")
+            params.append(to_sortable_time(start_time_str))
+        if end_time_str != "":
+            conditions.append("u.test_time <= ?")
+            params.append(to_sortable_time(end_time_str))
+        try:
+            units_df = pd.read_sql(f'''
+                SELECT u.sn, u.slot_id, u.test_time, s.test_items
+                FROM unit_signatures u JOIN fail_signatures s ON s.signature = u.signature
+                WHERE {' AND '.join(conditions)}
+            ''', conn, params=params)
+        finally:
+            conn.close()
+
+        columns = ['signature', 'test_items', 'item_count', 'unit_count', 'first_seen', 'last_seen', 'sn_list']
+        if units_df.empty:
+            return pd.DataFrame(columns=columns)
+
+        # 排除屏蔽项后，剩余fail项组合相同的签名合并为一组
+        exclude_test_items = set(self.parse_exclude_str(test_item_exclude_str))
+        if exclude_test_items:
+            units_df['test_items'] = units_df['test_items'].map(
+                lambda items: "\n".join(i for i in items.split("\n") if i not in exclude_test_items))
+            units_df = units_df[units_df['test_items'] != ""]
+            if units_df.empty:
+                return pd.DataFrame(columns=columns)
+
+        groups_df = units_df.groupby('test_items', sort=False).agg(
+            unit_count=('sn', 'size'),
+            first_seen=('test_time', 'min'),
+            last_seen=('test_time', 'max'),
+            sn_list=('sn', lambda sns: ", ".join(sorted(set(sns)))),
+        ).reset_index()
+        groups_df['item_count'] = groups_df['test_items'].str.count("\n") + 1
+        groups_df['signature'] = groups_df['test_items'].map(lambda items: compute_fail_signature(items.split("\n")))
+        return groups_df[columns].sort_values('unit_count', ascending=False, ignore_index=True)
+
     #传入文件夹地址列表，判断表中的那些文件是否已经被处理过，返回没被处理文件地址列表
     def get_unprocessed_files(self, file_paths):
         """批量检查未处理文件，减少数据库查询次数"""
         if not file_paths:
             return []
-            
+        return list(self.iter_unprocessed_files(file_paths))
+
+    def iter_unprocessed_files(self, file_paths, chunk_size: int = 50000, session_id: Optional[int] = None):
+        """
+        流式返回未处理的文件路径（保持输入顺序）
+        候选路径分批写入临时表，再与 test_records 的 file_path 索引做反连接，
+        不受SQLite绑定参数数量上限限制，可处理上百万个候选文件
+        :param file_paths: 候选文件路径（列表或生成器）
+        :param chunk_size: 每批写入/读取的行数
+        :param session_id: 监控会话id，为None时使用当前会话（其他会话入库过的文件视为未处理）
+        :return: 生成器，逐个返回未处理的文件路径
+        """
         conn = sqlite3.connect(self.DB_PATH)
-        cursor = conn.cursor()
-        
-        # 批量查询已存在的文件路径和MD5
-        placeholders = ', '.join('?' for _ in file_paths)
-        cursor.execute(f'''
-            SELECT file_path, file_md5 FROM test_records 
-            WHERE file_path IN ({placeholders})
-        ''', file_paths)
-        
-        processed = set()
-        for path, md5 in cursor.fetchall():
-            processed.add(path)
-        
-        conn.close()
-        
-        # 计算未处理文件
-        unprocessed = []
-        for fp in file_paths:
-            if fp not in processed:
-                unprocessed.append(fp)
-        
-        return unprocessed
+        try:
+            session_id = self._resolve_session(conn, session_id)
+            conn.execute("CREATE TEMP TABLE candidate_files (seq INTEGER PRIMARY KEY, file_path TEXT NOT NULL)")
+            batch = []
+            for fp in file_paths:
+                batch.append((str(fp),))
+                if len(batch) >= chunk_size:
+                    conn.executemany("INSERT INTO temp.candidate_files (file_path) VALUES (?)", batch)
+                    batch = []
+            if batch:
+                conn.executemany("INSERT INTO temp.candidate_files (file_path) VALUES (?)", batch)
+            conn.commit()
+
+            cursor = conn.execute(f'''
+                SELECT c.file_path FROM temp.candidate_files c
+                WHERE {" AND ".join(f"NOT EXISTS (SELECT 1 FROM {table} r WHERE r.session_id = ? AND r.file_path = c.file_path)"
+                                    for table in self.FILE_INDEX_TABLES)}
+                ORDER BY c.seq
+            ''', (session_id,) * len(self.FILE_INDEX_TABLES))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0]
+        finally:
+            conn.close()
         
     #一个pd参数，代表的是records.csv，同一个csv，sn和通道号，测试结果和测试时间是一致的，单独解析出来
     def handleDF(self,df: pd.DataFrame):
-        """将适配后解析的测试数据批量插入数据库"""
+        """
+        提取整个文件共用的 SN、测试时间、通道号
+        分块逐行扫描，三个值都找到后立即停止（不对整个 DataFrame 做布尔筛选，也不复制）
+        :return: (device_sn, test_time, slotId)；数据为空或缺失必要列时返回None
+        """
         # 1. 基础校验：DataFrame为空或无必要列，直接返回
         required_cols = ['attributeName', 'attributeValue', "testName","subTestName","subSubTestName","upperLimit","measurementValue","lowerLimit","measurementUnits",'startTime', "stopTime", 'status']
         if df.empty or not all(col in df.columns for col in required_cols):
             print(f"⚠️ 跳过入库：数据为空或缺失必要列（需包含{required_cols}）")
-            return
+            return None
+
+        # 2. 找到 SN（attributeName 为 PrimaryIdentity）、测试时间（第一个非空 startTime）、通道号所在的行
+        sn_pos = time_pos = slot_pos = None
+        for start in range(0, len(df), self.HEADER_SCAN_CHUNK):
+            chunk = df.iloc[start:start + self.HEADER_SCAN_CHUNK]
+            for pos, (name, start_time, sub_sub_name) in enumerate(zip(
+                    chunk['attributeName'].to_numpy(dtype=object),
+                    chunk['startTime'].to_numpy(dtype=object),
+                    chunk['subSubTestName'].to_numpy(dtype=object)), start):
+                if sn_pos is None and name == 'PrimaryIdentity':
+                    sn_pos = pos
+                if time_pos is None and start_time is not None and start_time == start_time and start_time != "":
+                    time_pos = pos
+                if slot_pos is None and sub_sub_name == self.slot_id_test_name:
+                    slot_pos = pos
+                if sn_pos is not None and time_pos is not None and slot_pos is not None:
+                    break
+            else:
+                continue
+            break
 
-        # 2. 提取SN
-        sn_row = df[df['attributeName'] == 'PrimaryIdentity']
-        device_sn: Optional[str] = sn_row['attributeValue'].iloc[0] if not sn_row.empty else "未知SN"
+        # 3. SN
+        device_sn: Optional[str] = df['attributeValue'].iloc[sn_pos] if sn_pos is not None else "未知SN"
         if device_sn is None or device_sn == "":
             device_sn = "未知SN"
 
-        # 3. 提取测试时间（统一用startTime，格式化为datetime）
-        time_row = df[df['startTime'].notna() & (df['startTime'] != "")]
-        test_time_str: Optional[str] = time_row['startTime'].iloc[0] if not time_row.empty else "2025-01-01 00:00:00"
+        # 4. 通道号（同时作为时间格式缓存的站点）
+        slotId: Optional[str] = df['measurementValue'].iloc[slot_pos] if slot_pos is not None else "未知通道号"
+        if slotId is None or slotId == "":
+            slotId = "未知通道号"
+
+        # 5. 测试时间（入库为补0的 YYYY-MM-DD HH:MM:SS，见 SORTABLE_TIME_VERSION）
+        test_time_str: Optional[str] = df['startTime'].iloc[time_pos] if time_pos is not None else "2025-01-01 00:00:00"
+        test_time = to_sortable_time(convert_time_format(test_time_str, station=slotId))
+        return device_sn,test_time,slotId
 
-        # print("test_time_str",test_time_str)
-        test_time = convert_time_format(test_time_str)
+    @staticmethod
+    def _blank_na(values: list) -> list:
+        """列的值列表中空值替换为空字符串（等同 fillna("")，但只处理需要的列，不复制整个 DataFrame）"""
+        return ["" if value is None or value != value else value for value in values]
 
-        # 4. 处理测试结果（统一为PASS/FAIL）
-        df['status'] = df['status'].fillna('PASS')
-        df['status'] = df['status'].apply(lambda x: 'FAIL' if str(x).upper() in ['FAIL', 'ERROR'] else 'PASS')
+    def dataframe_tuples(self, df: pd.DataFrame, file_path, file_md5, as_text=False):
+        """
+        pandas 解析结果转为入库行元组（按列生成，不逐行 iterrows）
+        :param as_text: 与 batch_insert_test_data 一致，通道号/SN/测试时间等转为字符串
+        :return: 行元组列表；数据为空或缺失必要列时为空列表
+        """
+        header = self.handleDF(df)
+        if header is None:
+            return []
+        device_sn, test_time, slot_id = header
 
-        # 6. 提取通道号
-        slotId_row = df[df['subSubTestName'] == self.slot_id_test_name]
-        slotId: Optional[str] = slotId_row['measurementValue'].iloc[0] if not slotId_row.empty else "未知通道号"
-        if slotId is None or slotId == "":
-            slotId = "未知通道号"
+        # 测试结果统一为PASS/FAIL（空值为PASS）
+        statuses = np.where(df['status'].astype(str).str.upper().isin(('FAIL', 'ERROR')), 'FAIL', 'PASS').tolist()
+        # 测试项：attributeName，为空时用 testName_subTestName_subSubTestName
+        test_items = []
+        for attribute_name, *parts in zip(*(self._blank_na(df[col].tolist()) for col in (
+                'attributeName', 'testName', 'subTestName', 'subSubTestName'))):
+            if attribute_name != "":
+                test_items.append(str(attribute_name).strip())
+            else:
+                test_items.append("_".join(part for part in (str(p).strip() for p in parts) if part) or "未知测试名")
+        # 测试值：attributeValue，为空时用 measurementValue
+        test_values = [
+            str(attribute_value).strip() or str(value).strip()
+            for attribute_value, value in zip(self._blank_na(df['attributeValue'].tolist()),
+                                              self._blank_na(df['measurementValue'].tolist()))
+        ]
+        columns = (test_items, test_values, self._blank_na(df['upperLimit'].tolist()),
+                   self._blank_na(df['lowerLimit'].tolist()), statuses)
+        if not as_text:
+            return [(slot_id, device_sn, test_time, *row, file_path, file_md5) for row in zip(*columns)]
+        head = (str(slot_id), str(device_sn) if device_sn else "", str(test_time) if test_time else "")
+        tail = (str(file_path) if file_path else "", str(file_md5) if file_md5 else "")
+        return [head + (item if item else "", value if value else "", usl, lsl, status) + tail
+                for item, value, usl, lsl, status in zip(*columns)]
 
-        df = df.fillna("")  # 把所有 NaN 替换为空字符串（根据字段类型调整，比如数值型用 0）
-        return df,device_sn,test_time,slotId
+    def parsed_records_tuples(self, parsed: ParsedRecords, file_path, file_md5, as_text=False):
+        """
+        python 解析引擎的结果转为入库行元组（与 dataframe_tuples 生成的行元组相同）
+        :param as_text: 与 batch_insert_test_data 一致，通道号/SN/测试时间等转为字符串
+        """
+        slot_id = parsed.slot_id(self.slot_id_test_name)
+        test_time = to_sortable_time(convert_time_format(
+            parsed.start_time if parsed.start_time is not None else "2025-01-01 00:00:00", station=slot_id))
+        if not as_text:
+            return [(slot_id, parsed.sn, test_time, *row, file_path, file_md5) for row in parsed.rows]
+        head = (str(slot_id), str(parsed.sn) if parsed.sn else "", str(test_time) if test_time else "")
+        tail = (str(file_path) if file_path else "", str(file_md5) if file_md5 else "")
+        return [head + row + tail for row in parsed.rows]
 
     #批量插入数据到数据库中，是遍历某个文件夹得到的数据
-    def batch_insert_test_data(self, batch_data):
-        data_tuples_all = []
+    def batch_insert_test_data(self, batch_data) -> int:
+        """
+        批量入库（每个文件一个事务）
+        :param batch_data: (df_single, file_path) 列表
+        :return: 实际入库的文件数（其他入库路径/进程已入库的文件不计）
+        """
+        committed_units = []  # 每个文件的行元组，提交后逐个通知入库回调
 
         self.slot_id_test_name = "ID"
         try:
@@ -570,51 +1599,52 @@ class TestData(object):
 
         for df, file_path in batch_data:
             current_file_md5 = calculate_file_md5(file_path)
-            df,device_sn,test_time,slotId = self.handleDF(df)
-            data_tuples = [
-                (
-                    str(slotId),
-                    str(device_sn) if device_sn else "",  # 确保是字符串，避免 None
-                    str(test_time) if test_time else "",  # 确保是字符串
-                    str(self.get_test_name(row)) if self.get_test_name(row) else "",
-                    str(self.get_test_value(row)) if self.get_test_value(row) else "",  # 数值型可保留原类型
-                    row['upperLimit'],
-                    row['lowerLimit'],
-                    str(row['status']) if 'status' in row and row['status'] is not None else "",
-                    str(file_path) if file_path else "",
-                    str(current_file_md5) if current_file_md5 else ""
-                )
-                for _, row in df.iterrows()
-            ]
-            data_tuples_all.extend(data_tuples)
+            if isinstance(df, ParsedRecords):
+                # python 解析引擎：解析时已提取每行的字段
+                committed_units.append(self.parsed_records_tuples(df, file_path, current_file_md5, as_text=True))
+                continue
+            committed_units.append(self.dataframe_tuples(df, file_path, current_file_md5, as_text=True))
 
+        return self._commit_units(committed_units)
 
+    def _commit_units(self, committed_units) -> int:
+        """
+        逐个文件入库（每个文件一个事务，见 _insert_unit），每个文件提交后通知入库回调
+        单个文件入库失败只回滚该文件，不影响其他文件
+        :param committed_units: 每个文件的行元组列表
+        :return: 实际入库的文件数
+        """
+        committed_units = [data_tuples for data_tuples in committed_units if data_tuples]
+        inserted = skipped = rows = 0
+        conn = None
         try:
             conn = sqlite3.connect(self.DB_PATH)
-            cursor = conn.cursor()
-            total = len(data_tuples_all)
-            print(f"待插入数据总条数：{total}")
-            batch_size = 2000
-            for i in range(0, total, batch_size):
-                batch = data_tuples_all[i:i+batch_size]
-                # print(batch)
-                cursor.executemany('''
-                    INSERT INTO test_records (slot_id, sn, test_time, test_item, test_value, test_usl, test_lsl, test_result, file_path, file_md5)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', batch)
-                print(f"已插入第 {i//batch_size + 1} 批，累计 {min(i+batch_size, total)}/{total} 条")
-            conn.commit()
-            print(f"✅ 数据入库成功，测试项数={len(data_tuples_all)}")
-            # df_all = self.query_test_data()
-            # sn_list = df_all['sn'].unique()  # 所有产品SN
-            # print(sn_list)
+            # 每个文件一个事务：WAL 下 synchronous=NORMAL 提交时不逐个同步到磁盘（断电只会丢失最近提交的文件，重新导入即可），
+            # 导入期间不自动检查点，全部文件提交后再把 WAL 写回数据库一次
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA wal_autocheckpoint = 0")
+            self._prepare_insert(conn, [row for data_tuples in committed_units for row in self._stored_rows(data_tuples)])
+            session_id = self.get_current_session(conn)
+            print(f"待入库文件数：{len(committed_units)}")
+            for data_tuples in committed_units:
+                try:
+                    if not self._insert_unit(conn, data_tuples, session_id):
+                        skipped += 1
+                        continue
+                except Exception as e:
+                    print(f"❌ 数据库插入失败：文件={data_tuples[0][8]}，错误={str(e)}")
+                    continue
+                inserted += 1
+                rows += len(data_tuples)
+                self._notify_committed(data_tuples)
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            print(f"✅ 数据入库成功：{inserted} 个文件，测试项数={rows}" + (f"，{skipped} 个文件已入库（跳过）" if skipped else ""))
         except sqlite3.Error as db_err:
-            conn.rollback()
-        except Exception as e:
-            print(e)
+            print(f"❌ 数据库插入失败：{str(db_err)}")
         finally:
             if conn:
                 conn.close()
+        return inserted
 
 if __name__ == "__main__":
     DB_PATH = Path("./test_data.db")
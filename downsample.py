@@ -0,0 +1,107 @@
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int):
+    """
+    LTTB（Largest-Triangle-Three-Buckets）降采样：保留曲线形状的前提下把点数降到 n_out
+    :param x: 已按升序排列的横坐标
+    :param y: 纵坐标
+    :param n_out: 输出点数（≥3）
+    :return: 降采样后的 (x, y)
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    # 第一个和最后一个点固定保留，中间 n - 2 个点均分为 n_out - 2 个桶
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out_index = np.empty(n_out, dtype=np.int64)
+    out_index[0] = 0
+    out_index[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        # 下一个桶的平均点（最后一个桶用最后一个点）
+        if i < n_out - 3:
+            next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        # 与上一个选中点、下一个桶平均点组成的三角形面积最大的点
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        out_index[i + 1] = previous
+    return x[out_index], y[out_index]
+
+
+class MinMaxBucketer(object):
+    """
+    流式 min/max 分桶：按横坐标把 [x_min, x_max] 均分为 n_buckets 个桶，每个桶只保留最小值和最大值两个点
+    内存只与桶数有关，适合分块读取上百万个点后再交给 LTTB 精细降采样
+    事先不知道横坐标范围时（单遍读取），先按第一块的范围创建，之后每块用 extend 扩大范围
+    """
+    def __init__(self, x_min: float, x_max: float, n_buckets: int):
+        self.x_min = x_min
+        self.span = max(x_max - x_min, 1e-9)
+        self.n_buckets = n_buckets
+        self.min_x = np.full(n_buckets, np.nan)
+        self.min_y = np.full(n_buckets, np.inf)
+        self.max_x = np.full(n_buckets, np.nan)
+        self.max_y = np.full(n_buckets, -np.inf)
+        self.count = 0
+
+    def extend(self, x_min: float, x_max: float):
+        """
+        扩大横坐标范围以包含 [x_min, x_max]：每次桶宽加倍、相邻两个桶合并（最小值取较小的、最大值取较大的），
+        合并后每个桶仍是桶内所有点的最小值和最大值（桶数须为偶数）
+        """
+        half = self.n_buckets // 2
+        while x_min < self.x_min or x_max > self.x_min + self.span:
+            # 向左扩大时原来的桶合并到后一半，向右扩大时合并到前一半
+            offset = half if x_min < self.x_min else 0
+            pairs = slice(0, 2 * half, 2), slice(1, 2 * half, 2)
+            min_x, min_y, max_x, max_y = (np.full(self.n_buckets, fill) for fill in (np.nan, np.inf, np.nan, -np.inf))
+            left_lower = self.min_y[pairs[0]] <= self.min_y[pairs[1]]
+            min_y[offset:offset + half] = np.where(left_lower, self.min_y[pairs[0]], self.min_y[pairs[1]])
+            min_x[offset:offset + half] = np.where(left_lower, self.min_x[pairs[0]], self.min_x[pairs[1]])
+            right_higher = self.max_y[pairs[1]] >= self.max_y[pairs[0]]
+            max_y[offset:offset + half] = np.where(right_higher, self.max_y[pairs[1]], self.max_y[pairs[0]])
+            max_x[offset:offset + half] = np.where(right_higher, self.max_x[pairs[1]], self.max_x[pairs[0]])
+            self.min_x, self.min_y, self.max_x, self.max_y = min_x, min_y, max_x, max_y
+            if offset:
+                self.x_min -= self.span
+            self.span *= 2
+
+    def add(self, x: np.ndarray, y: np.ndarray):
+        """加入一块数据（范围外的点由调用方过滤）"""
+        if len(x) == 0:
+            return
+        self.count += len(x)
+        buckets = ((x - self.x_min) / self.span * self.n_buckets).astype(np.int64)
+        buckets = np.clip(buckets, 0, self.n_buckets - 1)
+
+        # 按 (桶, y) 排序后，每个桶的第一个点是最小值，最后一个点是最大值
+        order = np.lexsort((y, buckets))
+        sorted_buckets = buckets[order]
+        first = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+        last = np.r_[first[1:] - 1, len(order) - 1]
+        bucket_ids = sorted_buckets[first]
+
+        low = order[first]
+        update = y[low] < self.min_y[bucket_ids]
+        self.min_y[bucket_ids[update]] = y[low[update]]
+        self.min_x[bucket_ids[update]] = x[low[update]]
+
+        high = order[last]
+        update = y[high] > self.max_y[bucket_ids]
+        self.max_y[bucket_ids[update]] = y[high[update]]
+        self.max_x[bucket_ids[update]] = x[high[update]]
+
+    def result(self):
+        """返回按横坐标排序的 (x, y)"""
+        filled = ~np.isnan(self.min_x)
+        x = np.concatenate([self.min_x[filled], self.max_x[filled]])
+        y = np.concatenate([self.min_y[filled], self.max_y[filled]])
+        order = np.argsort(x, kind='stable')
+        return x[order], y[order]
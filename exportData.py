@@ -0,0 +1,142 @@
+"""
+fail数据导出：按键集分页从数据库流式读取，逐页写入CSV/Parquet，内存只与每页行数有关
+
+命令行用法：
+    python exportData.py fail.csv [--db test_data.db --start "2025-06-18 00:00:00" --end "2025-06-18 23:59:59"]
+    python exportData.py fail.parquet --sn SN123 --exclude-items "CHECK_STATION_SECURITY"
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import threading
+from typing import Callable, Optional
+
+from dataSQL import FAIL_PAGE_COLUMNS
+
+# 导出的列（不含数据库内部 id）
+EXPORT_COLUMNS = tuple(col for col in FAIL_PAGE_COLUMNS if col != 'id')
+EXPORT_FORMATS = ("csv", "parquet")
+
+
+class ExportCancelled(Exception):
+    """导出被取消（未完成的文件已删除）"""
+
+
+class _CsvWriter(object):
+    def __init__(self, path):
+        # utf-8-sig：Excel 直接打开不乱码
+        self.file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter(object):
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("导出 Parquet 需要安装 pyarrow（pip install pyarrow）")
+        self.pa = pa
+        self.schema = pa.schema([(col, pa.string()) for col in EXPORT_COLUMNS])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        # 每页一个行组
+        columns = [[None if value is None else str(value) for value in column] for column in zip(*rows)]
+        self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def export_fail_data(test_data, path: str, fmt: Optional[str] = None, filters: Optional[dict] = None,
+                     chunk_size: int = 50000, progress: Optional[Callable[[int, int], None]] = None,
+                     cancel_event: Optional[threading.Event] = None) -> dict:
+    """
+    把筛选后的fail数据导出为CSV/Parquet（先写入临时文件，完成后再改名，取消或失败时不留下半个文件）
+    :param test_data: TestData 实例
+    :param path: 导出文件路径
+    :param fmt: csv/parquet，为None时按文件扩展名判断
+    :param filters: 与 get_fail_data 相同的筛选参数
+    :param chunk_size: 每页行数
+    :param progress: 进度回调 progress(已导出行数, 总行数)，每页调用一次
+    :param cancel_event: 设置后在下一页开始前取消导出，抛出 ExportCancelled
+    :return: {"rows": 导出行数, "seconds": 耗时, "path": 文件路径}
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式：{fmt}（可选 {'/'.join(EXPORT_FORMATS)}）")
+    filters = filters or {}
+    start = time.perf_counter()
+    total = test_data.count_fail_data(**filters)
+    if progress:
+        progress(0, total)
+
+    temp_path = path + ".part"
+    writer = _CsvWriter(temp_path) if fmt == "csv" else _ParquetWriter(temp_path)
+    exported = 0
+    try:
+        for rows in test_data.iter_fail_data_pages(page_size=chunk_size, **filters):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelled(f"导出已取消（已导出 {exported}/{total} 行）")
+            writer.write([row[1:] for row in rows])  # 去掉 id 列
+            exported += len(rows)
+            if progress:
+                progress(exported, total)
+        writer.close()
+        os.replace(temp_path, path)
+    except BaseException:
+        writer.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    seconds = time.perf_counter() - start
+    print(f"📤 已导出 {exported} 行fail数据：{path}，耗时 {seconds:.1f}s")
+    return {"rows": exported, "seconds": seconds, "path": path}
+
+
+def main(argv=None):
+    from partitionedData import open_test_data
+
+    app_path = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="导出fail数据（CSV/Parquet）")
+    parser.add_argument("output", help="导出文件路径（.csv 或 .parquet）")
+    parser.add_argument("--db", default=os.path.join(app_path, "test_data.db"), help="数据库文件路径")
+    parser.add_argument("--config", default=os.path.join(app_path, "config", "config.json"), help="配置文件路径")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="导出格式，缺省按文件扩展名判断")
+    parser.add_argument("--start", default="", help="开始时间（与测试时间格式一致）")
+    parser.add_argument("--end", default="", help="结束时间（与测试时间格式一致）")
+    parser.add_argument("--sn", default="", help="SN（子串匹配）")
+    parser.add_argument("--test-item", default="", help="测试项（子串匹配）")
+    parser.add_argument("--exclude-items", default="", help="排除的测试项（逗号/分号/空格分隔）")
+    parser.add_argument("--session", type=int, help="监控会话id，缺省为当前会话")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    test_data = open_test_data(args.db, args.config)
+    filters = dict(sn_filter=args.sn, test_item_filter=args.test_item, test_item_exclude_str=args.exclude_items,
+                   start_time_str=args.start, end_time_str=args.end, session_id=args.session)
+
+    def print_progress(done, total):
+        print(f"\r导出进度：{done}/{total}", end="\n" if done >= total else "", flush=True)
+
+    try:
+        export_fail_data(test_data, args.output, fmt=args.format, filters=filters, chunk_size=args.chunk_size,
+                         progress=print_progress)
+    except KeyboardInterrupt:
+        print("\n⚠️ 导出已取消")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+无界面运行（不导入 PyQt，适合产线服务器 / systemd）
+
+用法：
+    python headless.py watch [--dir ~/Library/Logs/Atlas/unit-archive --backfill]
+    python headless.py backfill DIR
+    python headless.py query [--sn SN --test-item ITEM --start "2025-06-18 00:00:00" --end ... --fail --limit 100]
+    python headless.py export fail.csv [--start ... --end ... --sn ... --exclude-items ...]
+公共参数：--db 数据库文件（默认程序目录下的 test_data.db），--config 配置文件
+
+收到 SIGTERM/SIGINT 时不再接收新文件，等待正在入库的文件提交、WAL 写回数据库文件后退出
+systemd 示例：
+    [Service]
+    ExecStart=/usr/bin/python3 /opt/monitoring_fail/headless.py watch
+    Restart=on-failure
+"""
+import os
+import sys
+import csv
+import signal
+import argparse
+import threading
+import contextlib
+
+if getattr(sys, 'frozen', False):
+    APP_PATH = os.path.dirname(sys.executable)
+else:
+    APP_PATH = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_DB_PATH = os.path.join(APP_PATH, "test_data.db")
+DEFAULT_CONFIG_PATH = os.path.join(APP_PATH, "config", "config.json")
+DEFAULT_MONITOR_DIR = "~/Library/Logs/Atlas/unit-archive"
+
+
+def install_signal_handlers(stop_event: threading.Event):
+    """SIGTERM/SIGINT 只设置停止标志，由各命令在安全的位置退出"""
+    def handle(signum, frame):
+        print(f"\n🛑 收到信号 {signal.Signals(signum).name}，正在停止...")
+        stop_event.set()
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, handle)
+
+
+def open_data(args, with_alerts: bool = False):
+    """按配置打开数据库；with_alerts 时把入库告警写入告警日志（与界面相同的规则）"""
+    # 按需导入：query/export 不需要告警引擎
+    from partitionedData import open_test_data
+
+    test_data = open_test_data(args.db, args.config)
+    if with_alerts:
+        from alertRules import AlertEngine, load_rules
+        test_data.add_commit_listener(AlertEngine(load_rules(args.config)).on_unit_committed)
+    return test_data
+
+
+def cmd_watch(args, stop_event):
+    """监控文件夹，新的records.csv入库（可先补录已有文件）"""
+    from monitoringCSV import BasicFileHandler
+    from retention import RetentionPruner, load_retention
+    from pathlib import Path
+
+    monitor_dir = Path(args.dir).expanduser()
+    monitor_dir.mkdir(parents=True, exist_ok=True)
+    test_data = open_data(args, with_alerts=True)
+    exit_code = 0
+    if args.backfill:
+        exit_code = backfill(test_data, monitor_dir, stop_event)
+
+    def on_dir_deleted():
+        # 监控目录被删除时退出（非0退出码，由 systemd 按 Restart=on-failure 重启）
+        nonlocal exit_code
+        exit_code = 1
+        stop_event.set()
+
+    handler = BasicFileHandler(lambda: None, on_dir_deleted)
+    observer = handler.start(monitor_dir, test_data)
+    pruner = RetentionPruner(test_data, **load_retention(args.config))
+    pruner.start()
+    try:
+        while not stop_event.wait(1):
+            pass
+    finally:
+        # 先停止监控（等待正在入库的文件提交），再停止清理，最后写回WAL
+        observer.stop()
+        observer.join()
+        pruner.stop()
+        test_data.close()
+        print("🛑 监控已停止")
+    return exit_code
+
+
+def backfill(test_data, root_dir, stop_event) -> int:
+    from monitoringCSV import find_records_files, ingest_files
+
+    files = find_records_files(root_dir)
+    result = ingest_files(test_data, files, stop_event=stop_event)
+    print(f"📥 补录完成：扫描 {len(files)} 个文件，未入库 {result['unprocessed']} 个，成功入库 {result['processed']} 个")
+    return 1 if stop_event.is_set() else 0
+
+
+def cmd_backfill(args, stop_event):
+    """一次性导入文件夹下所有未入库的records.csv"""
+    if not os.path.isdir(args.root):
+        print(f"❌ 文件夹不存在：{args.root}")
+        return 1
+    test_data = open_data(args, with_alerts=True)
+    try:
+        return backfill(test_data, args.root, stop_event)
+    finally:
+        test_data.close()
+
+
+def cmd_query(args, stop_event):
+    """查询测试数据/fail数据，以CSV输出到标准输出（分页读取，不一次性加载）"""
+    # 标准输出只输出CSV，初始化信息输出到标准错误
+    with contextlib.redirect_stdout(sys.stderr):
+        test_data = open_data(args)
+    try:
+        return _write_query_rows(test_data, args, stop_event)
+    finally:
+        test_data.close()
+
+
+def _write_query_rows(test_data, args, stop_event):
+    from dataSQL import FAIL_PAGE_COLUMNS
+
+    writer = csv.writer(sys.stdout)
+    written = 0
+    if args.fail:
+        # fail数据：SN/测试项为子串匹配，按时间倒序
+        writer.writerow(FAIL_PAGE_COLUMNS[1:])
+        pages = test_data.iter_fail_data_pages(page_size=args.page_size, sn_filter=args.sn,
+                                               test_item_filter=args.test_item, start_time_str=args.start,
+                                               end_time_str=args.end, session_id=args.session)
+    else:
+        # 测试数据：SN/测试项为精确匹配，按时间升序
+        writer.writerow(('sn', 'test_time', 'test_item', 'test_value'))
+        pages = _iter_test_data_pages(test_data, args)
+    try:
+        for rows in pages:
+            if stop_event.is_set():
+                return 1
+            if args.limit:
+                rows = rows[:args.limit - written]
+            writer.writerows(row[1:] for row in rows)
+            written += len(rows)
+            if args.limit and written >= args.limit:
+                break
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # 输出管道被关闭（如 | head），直接退出
+        sys.stdout = open(os.devnull, 'w')
+    return 0
+
+
+def _iter_test_data_pages(test_data, args):
+    cursor = None
+    while True:
+        rows, cursor = test_data.query_test_data_page(args.sn or None, args.test_item or None, args.start or None,
+                                                      args.end or None, page_size=args.page_size, cursor=cursor,
+                                                      session_id=args.session)
+        if rows:
+            yield rows
+        if cursor is None:
+            break
+
+
+def cmd_export(args, stop_event):
+    """导出fail数据到CSV/Parquet（收到停止信号时取消，不留下半个文件）"""
+    from exportData import export_fail_data, ExportCancelled
+
+    test_data = open_data(args)
+    filters = dict(sn_filter=args.sn, test_item_filter=args.test_item, test_item_exclude_str=args.exclude_items,
+                   start_time_str=args.start, end_time_str=args.end, session_id=args.session)
+    try:
+        export_fail_data(test_data, args.output, filters=filters, chunk_size=args.page_size, cancel_event=stop_event)
+    except ExportCancelled as e:
+        print(f"⚠️ {e}")
+        return 1
+    finally:
+        test_data.close()
+    return 0
+
+
+def main(argv=None) -> int:
+    # systemd 下标准输出不是终端，按行刷新，日志不会滞留在缓冲区
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description="monitoring_fail 无界面运行")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="数据库文件路径")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="配置文件路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("watch", help="监控文件夹并入库")
+    p.add_argument("--dir", default=DEFAULT_MONITOR_DIR, help="监控的文件夹")
+    p.add_argument("--backfill", action="store_true", help="启动时先导入文件夹中未入库的文件")
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("backfill", help="导入文件夹中所有未入库的records.csv")
+    p.add_argument("root", help="文件夹路径")
+    p.set_defaults(func=cmd_backfill)
+
+    for name, func, help_text in (("query", cmd_query, "查询测试数据/fail数据（CSV输出到标准输出）"),
+                                  ("export", cmd_export, "导出fail数据到CSV/Parquet")):
+        p = sub.add_parser(name, help=help_text)
+        if name == "export":
+            p.add_argument("output", help="导出文件路径（.csv 或 .parquet）")
+            p.add_argument("--exclude-items", default="", help="排除的测试项（逗号/分号/空格分隔）")
+        else:
+            p.add_argument("--fail", action="store_true", help="只查询fail数据（SN/测试项为子串匹配）")
+            p.add_argument("--limit", type=int, default=0, help="最多输出的行数，0表示不限制")
+        p.add_argument("--sn", default="", help="SN")
+        p.add_argument("--test-item", default="", help="测试项")
+        p.add_argument("--start", default="", help="开始时间（与测试时间格式一致）")
+        p.add_argument("--end", default="", help="结束时间（与测试时间格式一致）")
+        p.add_argument("--session", type=int, help="监控会话id，缺省为当前会话")
+        p.add_argument("--page-size", type=int, default=5000)
+        p.set_defaults(func=func)
+
+    args = parser.parse_args(argv)
+    stop_event = threading.Event()
+    install_signal_handlers(stop_event)
+    return args.func(args, stop_event)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
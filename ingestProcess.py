@@ -0,0 +1,186 @@
+"""
+独立的入库进程：监控文件夹、解析records.csv、写入数据库（WAL，界面进程同时只读）
+界面进程通过 multiprocessing.connection 接收入库通知，解析时的 pandas 计算不再与 Qt 事件循环争抢 GIL，
+入库进程崩溃也不会影响界面（由界面的管理线程重启）
+
+入库进程 -> 界面的消息：
+    ("commit", 最大id)         有新数据提交（多个文件合并为一次通知，最多每 NOTIFY_INTERVAL 秒一次）
+    ("alert", Alert)           入库告警 / 测试项漂移告警
+    ("backfill_done", dict)    批量导入完成：{"scanned", "unprocessed", "processed"}，失败时为 {"error"}
+    ("session", 会话id)        已开始新的监控会话
+    ("ready", pid)             数据库已初始化（界面进程之后再以只读方式打开数据库）
+界面 -> 入库进程的命令：
+    ("backfill", 文件夹)  ("new_session",)  ("stop",)
+"""
+import os
+import sys
+import json
+import threading
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+# 入库方式：thread 为界面进程内的监控线程（原方式），process 为独立的入库进程
+INGEST_MODES = ("thread", "process")
+NOTIFY_INTERVAL = 0.2
+INGEST_PROCESS_FLAG = "--ingest-process"  # 打包后的可执行文件以这个参数启动时作为入库进程运行
+
+
+def load_ingest_mode(config_path: Optional[str] = None) -> str:
+    """从config.json读取 ingest_mode（缺省或无效时为 thread）"""
+    mode = "thread"
+    if config_path and os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                mode = json.load(f).get("ingest_mode", "thread")
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 读取入库方式失败，使用监控线程入库：{e}")
+    if mode not in INGEST_MODES:
+        print(f"⚠️ 未知的入库方式：{mode}（可选 {'/'.join(INGEST_MODES)}），使用监控线程入库")
+        mode = "thread"
+    return mode
+
+
+class _Notifier(object):
+    """向界面发送消息（多个线程共用一个管道，发送加锁）；提交通知合并后由后台线程发送"""
+    def __init__(self, conn, test_data):
+        self.conn = conn
+        self.test_data = test_data
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="IngestNotifier", daemon=True)
+        self._thread.start()
+
+    def send(self, *message):
+        with self._lock:
+            try:
+                self.conn.send(message)
+            except (OSError, EOFError):
+                pass  # 界面进程已退出，主循环会在 recv 时发现并退出
+
+    def on_unit_committed(self, data_tuples):
+        self._dirty.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if not self._dirty.wait(0.5):
+                continue
+            self._dirty.clear()
+            self.send("commit", self.test_data.max_record_id())
+            self._stop_event.wait(NOTIFY_INTERVAL)
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+        if self._dirty.is_set():
+            self.send("commit", self.test_data.max_record_id())
+
+
+def ingest_command(args) -> list:
+    """启动入库进程的命令行：源码运行时直接执行本文件（不导入界面模块），打包后为可执行文件 + INGEST_PROCESS_FLAG"""
+    if getattr(sys, 'frozen', False):
+        return [sys.executable, INGEST_PROCESS_FLAG] + list(args)
+    return [sys.executable, os.path.abspath(__file__)] + list(args)
+
+
+def start_ingest_process(db_path, config_path, monitor_dir, listener, authkey: bytes):
+    """
+    启动入库进程（新的解释器执行本模块的 main，不导入 PyQt6 和界面）
+    入库进程连接界面进程的 listener（multiprocessing.connection.Listener），认证密钥通过标准输入传入（不出现在命令行中）
+    :return: subprocess.Popen
+    """
+    process = subprocess.Popen(ingest_command([str(db_path), config_path or "", str(monitor_dir), listener.address]),
+                               stdin=subprocess.PIPE)
+    process.stdin.write(authkey.hex().encode() + b"\n")
+    process.stdin.close()
+    return process
+
+
+def run_ingest(db_path, config_path, monitor_dir, conn):
+    """
+    入库进程的主循环（不导入 PyQt），数据库的初始化/迁移和数据清理都只在入库进程中进行
+    :param conn: 与界面进程通信的连接（multiprocessing.connection.Connection）
+    """
+    from partitionedData import open_test_data
+    from alertRules import AlertEngine, load_rules
+    from monitoringCSV import BasicFileHandler, find_records_files, ingest_files
+    from retention import RetentionPruner, load_retention
+
+    monitor_dir = Path(monitor_dir)
+    test_data = open_test_data(db_path, config_path)
+    notifier = _Notifier(conn, test_data)
+    alert_engine = AlertEngine(load_rules(config_path))
+    alert_engine.add_listener(lambda alert: notifier.send("alert", alert))
+    test_data.add_commit_listener(alert_engine.on_unit_committed)
+    test_data.item_stats.add_listener(lambda alert: notifier.send("alert", alert))
+    test_data.add_commit_listener(notifier.on_unit_committed)
+    notifier.send("ready", os.getpid())
+
+    # 监控目录被删除时重建目录并重新监控
+    dir_deleted = threading.Event()
+    handler = BasicFileHandler(lambda: None, dir_deleted.set)
+
+    def start_observer():
+        monitor_dir.mkdir(parents=True, exist_ok=True)
+        return handler.start(monitor_dir, test_data)
+
+    observer = start_observer()
+    pruner = RetentionPruner(test_data, **load_retention(config_path))
+    pruner.start()
+    print(f"🚀 入库进程已启动（pid={os.getpid()}）")
+    try:
+        while True:
+            if dir_deleted.is_set():
+                dir_deleted.clear()
+                observer.stop()
+                observer.join()
+                observer = start_observer()
+            try:
+                if not conn.poll(0.5):
+                    continue
+                command = conn.recv()
+            except (EOFError, OSError):
+                print("⚠️ 界面进程已断开，入库进程退出")
+                break
+            if command[0] == "stop":
+                break
+            elif command[0] == "backfill":
+                try:
+                    files = find_records_files(command[1])
+                    result = ingest_files(test_data, files)
+                    result["scanned"] = len(files)
+                except Exception as e:
+                    result = {"error": str(e)}
+                notifier.send("backfill_done", result)
+            elif command[0] == "new_session":
+                session_id = test_data.start_new_session()
+                alert_engine.reset()
+                notifier.send("session", session_id)
+    finally:
+        observer.stop()
+        observer.join()
+        pruner.stop()
+        notifier.stop()
+        test_data.close()
+        print("🛑 入库进程已停止")
+
+
+def main(argv=None) -> int:
+    """
+    入库进程入口：参数为 数据库路径 配置文件路径（可为空字符串） 监控目录 界面进程的地址，认证密钥从标准输入读取
+    """
+    from multiprocessing.connection import Client
+
+    db_path, config_path, monitor_dir, address = (sys.argv[1:] if argv is None else argv)[:4]
+    authkey = bytes.fromhex(sys.stdin.readline().strip())
+    conn = Client(address, authkey=authkey)
+    try:
+        run_ingest(db_path, config_path or None, monitor_dir, conn)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+import json
+import math
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+from alertRules import Alert, parse_event_time
+
+# 行元组中各字段的位置（与 test_records 插入顺序一致）
+ROW_TIME, ROW_ITEM, ROW_VALUE, ROW_USL, ROW_LSL = 2, 3, 4, 5, 6
+
+# 近似分位数（P² 算法，每个分位数只保存5个标记点）
+QUANTILES = (0.05, 0.5, 0.95)
+
+
+def to_float(value) -> Optional[float]:
+    """文本测试值/上下限转为数字，非数字（如'未知上限'、SN等属性值）返回None"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+class P2Quantile(object):
+    """P² 流式分位数估计（Jain & Chlamtac），O(1) 内存"""
+    def __init__(self, p: float, state: Optional[dict] = None):
+        self.p = p
+        state = state or {}
+        self.heights: List[float] = state.get("heights", [])  # 前5个值先直接保存
+        self.positions: List[float] = state.get("positions", [1, 2, 3, 4, 5])
+        self.desired: List[float] = state.get("desired", [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5])
+
+    def to_dict(self) -> dict:
+        return {"heights": self.heights, "positions": self.positions, "desired": self.desired}
+
+    def add(self, x: float):
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(x)
+            heights.sort()
+            return
+
+        # 1. 找到 x 所在的区间并更新边界
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while k < 3 and x >= heights[k + 1]:
+                k += 1
+        positions = self.positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        increments = (0, self.p / 2, self.p, (1 + self.p) / 2, 1)
+        for i in range(5):
+            self.desired[i] += increments[i]
+
+        # 2. 调整中间3个标记点
+        for i in range(1, 4):
+            d = self.desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not heights[i - 1] < candidate < heights[i + 1]:
+                    candidate = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = candidate
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        if not self.heights:
+            return None
+        if len(self.heights) < 5:
+            # 样本不足5个时直接取排序后的近似位置
+            index = min(int(round(self.p * (len(self.heights) - 1))), len(self.heights) - 1)
+            return self.heights[index]
+        return self.heights[2]
+
+
+class ItemStats(object):
+    """单个测试项的流式统计：Welford（全量均值/方差）+ EWMA（近期均值/方差）+ P² 分位数"""
+    def __init__(self, alpha: float, state: Optional[dict] = None):
+        state = state or {}
+        self.alpha = alpha
+        self.count = state.get("count", 0)
+        self.mean = state.get("mean", 0.0)
+        self.m2 = state.get("m2", 0.0)
+        self.min = state.get("min")
+        self.max = state.get("max")
+        self.ewma_mean = state.get("ewma_mean")
+        self.ewma_var = state.get("ewma_var", 0.0)
+        self.usl = state.get("usl")
+        self.lsl = state.get("lsl")
+        self.drift = state.get("drift", "")  # 当前的漂移状态（空字符串表示正常）
+        self.last_time = state.get("last_time", "")
+        quantile_states = state.get("quantiles", {})
+        self.quantiles = {p: P2Quantile(p, quantile_states.get(str(p))) for p in QUANTILES}
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max,
+            "ewma_mean": self.ewma_mean, "ewma_var": self.ewma_var, "usl": self.usl, "lsl": self.lsl,
+            "drift": self.drift, "last_time": self.last_time,
+            "quantiles": {str(p): q.to_dict() for p, q in self.quantiles.items()},
+        }
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def add(self, x: float, usl: Optional[float], lsl: Optional[float], test_time: str):
+        # Welford 更新
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        # EWMA 更新（均值与方差）
+        if self.ewma_mean is None:
+            self.ewma_mean = x
+        else:
+            diff = x - self.ewma_mean
+            increment = self.alpha * diff
+            self.ewma_mean += increment
+            self.ewma_var = (1 - self.alpha) * (self.ewma_var + diff * increment)
+        for quantile in self.quantiles.values():
+            quantile.add(x)
+        if usl is not None:
+            self.usl = usl
+        if lsl is not None:
+            self.lsl = lsl
+        self.last_time = test_time
+
+    def detect_drift(self, min_count: int, sigma_limit: float, spread_ratio: float, cpk_limit: float) -> str:
+        """
+        判断测试项是否在fail之前向上下限漂移
+        :return: 漂移描述（空字符串表示正常）
+        """
+        if self.count < min_count or self.ewma_mean is None:
+            return ""
+        std = math.sqrt(self.variance)
+        ewma_std = math.sqrt(self.ewma_var)
+        reasons = []
+
+        # 1. 近期均值偏离长期均值（超过EWMA控制限），且朝向上/下限方向
+        ewma_sigma = std * math.sqrt(self.alpha / (2 - self.alpha))
+        shift = self.ewma_mean - self.mean
+        toward_limit = (shift > 0 and self.usl is not None) or (shift < 0 and self.lsl is not None)
+        if ewma_sigma > 0 and abs(shift) > sigma_limit * ewma_sigma and toward_limit:
+            reasons.append(f"均值{'上' if shift > 0 else '下'}移 {self.mean:.4g}→{self.ewma_mean:.4g}")
+
+        # 2. 近期离散度明显变大
+        if std > 0 and ewma_std > spread_ratio * std:
+            reasons.append(f"离散度变大 σ {std:.4g}→{ewma_std:.4g}")
+
+        # 3. 近期分布（均值±3σ）已逼近上/下限（按近期数据估算的Cpk偏低）
+        if ewma_std > 0:
+            cpk_candidates = []
+            if self.usl is not None:
+                cpk_candidates.append((self.usl - self.ewma_mean) / (3 * ewma_std))
+            if self.lsl is not None:
+                cpk_candidates.append((self.ewma_mean - self.lsl) / (3 * ewma_std))
+            if cpk_candidates and min(cpk_candidates) < cpk_limit:
+                reasons.append(f"近期Cpk={min(cpk_candidates):.2f}")
+        return "；".join(reasons)
+
+
+class ItemStatsTracker(object):
+    """
+    按测试项维护 measurementValue 的流式统计，入库提交后增量更新
+    状态持久化在数据库 item_stats 表中，第一次使用时才加载（不入库的进程不加载），无需重新处理历史数据
+    统计属于当前监控会话（db_meta.current_session）：每次更新在同一个写事务中确认会话未变，
+    其他进程开始新会话（清空 item_stats）后重新加载，不会把旧会话的统计写回去
+    """
+    def __init__(self, db_path, alpha: float = 0.05, min_count: int = 30, sigma_limit: float = 3.0,
+                 spread_ratio: float = 1.5, cpk_limit: float = 1.0, create_table: bool = True):
+        self.db_path = db_path
+        self.alpha = alpha
+        self.min_count = min_count
+        self.sigma_limit = sigma_limit
+        self.spread_ratio = spread_ratio
+        self.cpk_limit = cpk_limit
+        self.listeners: List[Callable[[Alert], None]] = []
+        self._lock = threading.Lock()
+        self._stats: Dict[str, ItemStats] = {}
+        self._session = None  # 已加载的统计所属的会话，None 表示未加载
+        if create_table:
+            self._init_table()
+
+    def add_listener(self, callback: Callable[[Alert], None]):
+        """注册漂移告警回调（测试项从正常变为漂移时触发一次）"""
+        self.listeners.append(callback)
+
+    def _init_table(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS item_stats (
+                test_item TEXT PRIMARY KEY,  -- 测试项
+                state TEXT NOT NULL,  -- 流式统计状态（JSON）
+                update_time DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _current_session(conn):
+        try:
+            row = conn.execute("SELECT value FROM db_meta WHERE key = 'current_session'").fetchone()
+        except sqlite3.OperationalError:
+            return 0  # 没有会话表的数据库（单独使用统计时）
+        return row[0] if row else 0
+
+    def _sync(self, conn, force: bool = False):
+        """会话变化（或 force）时从数据库重新加载统计，调用方持有 _lock"""
+        session = self._current_session(conn)
+        if session == self._session and not force:
+            return
+        self._stats.clear()
+        for test_item, state in conn.execute("SELECT test_item, state FROM item_stats"):
+            try:
+                self._stats[test_item] = ItemStats(self.alpha, json.loads(state))
+            except (ValueError, TypeError) as e:
+                print(f"⚠️ 测试项统计状态损坏，重新统计：{test_item}，错误：{str(e)}")
+        self._session = session
+
+    def reset(self, cursor=None):
+        """
+        清空所有测试项的统计（开始新的监控会话时调用）
+        :param cursor: 开始新会话的事务（与会话切换一起提交），为None时单独提交
+        """
+        with self._lock:
+            self._stats.clear()
+            self._session = None
+            if cursor is not None:
+                cursor.execute("DELETE FROM item_stats")
+                return
+            conn = sqlite3.connect(self.db_path)
+            try:
+                conn.execute("DELETE FROM item_stats")
+                conn.commit()
+            finally:
+                conn.close()
+
+    def on_unit_committed(self, data_tuples: list):
+        """入库回调：用单个文件的数值测试值更新统计，并持久化有变化的测试项"""
+        changed: Dict[str, ItemStats] = {}
+        new_drifts = []
+        with self._lock:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                self._sync(conn)
+                for row in data_tuples:
+                    value = to_float(row[ROW_VALUE])
+                    if value is None:
+                        continue
+                    test_item = row[ROW_ITEM]
+                    stats = self._stats.get(test_item)
+                    if stats is None:
+                        stats = self._stats[test_item] = ItemStats(self.alpha)
+                    stats.add(value, to_float(row[ROW_USL]), to_float(row[ROW_LSL]), str(row[ROW_TIME]))
+                    changed[test_item] = stats
+
+                for test_item, stats in changed.items():
+                    drift = stats.detect_drift(self.min_count, self.sigma_limit, self.spread_ratio, self.cpk_limit)
+                    if drift and not stats.drift:
+                        new_drifts.append(Alert("item_drift", test_item, parse_event_time(stats.last_time),
+                                                f"测试项 {test_item} 漂移：{drift}"))
+                    stats.drift = drift
+                self._save(conn, changed)
+                conn.commit()
+            except sqlite3.Error as db_err:
+                conn.rollback()
+                self._session = None  # 内存中的统计与数据库不一致，下次重新加载
+                print(f"❌ 保存测试项统计失败：{str(db_err)}")
+            finally:
+                conn.close()
+
+        for alert in new_drifts:
+            print(f"📈 告警[{alert.rule}]：{alert.message}")
+            for callback in self.listeners:
+                try:
+                    callback(alert)
+                except Exception as e:
+                    print(f"❌ 漂移告警回调执行失败：{str(e)}")
+
+    @staticmethod
+    def _save(conn, changed: Dict[str, ItemStats]):
+        if not changed:
+            return
+        conn.executemany('''
+            INSERT INTO item_stats (test_item, state, update_time) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(test_item) DO UPDATE SET state = excluded.state, update_time = excluded.update_time
+        ''', [(item, json.dumps(stats.to_dict())) for item, stats in changed.items()])
+
+    def get_summary(self) -> List[dict]:
+        """所有测试项的统计摘要（漂移的测试项排在前面），从数据库重新加载，其他进程入库的数据也包含在内"""
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                self._sync(conn, force=True)
+            finally:
+                conn.close()
+            rows = []
+            for test_item, stats in self._stats.items():
+                rows.append({
+                    "test_item": test_item,
+                    "count": stats.count,
+                    "mean": stats.mean,
+                    "std": math.sqrt(stats.variance),
+                    "min": stats.min,
+                    "max": stats.max,
+                    "ewma_mean": stats.ewma_mean,
+                    "ewma_std": math.sqrt(stats.ewma_var),
+                    **{f"p{int(p * 100)}": q.value() for p, q in stats.quantiles.items()},
+                    "usl": stats.usl,
+                    "lsl": stats.lsl,
+                    "drift": stats.drift,
+                    "last_time": stats.last_time,
+                })
+        return sorted(rows, key=lambda r: (r["drift"] == "", r["test_item"]))
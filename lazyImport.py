@@ -0,0 +1,38 @@
+import importlib
+
+
+class LazyModule(object):
+    """
+    模块代理：第一次访问属性时才导入模块（如 pd = lazy_import("pandas")，启动时不导入 pandas）
+    导入由 importlib 完成（自带模块级的导入锁），多个线程同时第一次访问也只导入一次
+    用法与普通模块一样，但类型注解中的 pd.DataFrame 会在定义函数时求值，
+    使用的模块需要 from __future__ import annotations
+    """
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        value = getattr(self._load(), attr)
+        # 缓存到代理上，之后的访问不再经过 __getattr__
+        self.__dict__[attr] = value
+        return value
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "已导入" if self.__dict__['_module'] is not None else "未导入"
+        return f"<LazyModule {self.__dict__['_name']}（{state}）>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """延迟导入模块：返回代理，第一次访问属性时才真正导入"""
+    return LazyModule(name)
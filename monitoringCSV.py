@@ -1,23 +1,48 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from typing import List, Optional, Union
 from dataSQL import TestData
+from archiveMembers import is_archive, iter_records_members, list_records_members, split_member_path
+from lazyImport import lazy_import
 
-# 自定义事件处理器（继承FileSystemEventHandler，重写需要的事件方法）
-class BasicFileHandler(FileSystemEventHandler):
+# watchdog 在第一次开始监控时才导入（批量导入/无界面 backfill 不需要 watchdog）
+watchdog_events = lazy_import("watchdog.events")
+
+# 原地写入的压缩包：大小和修改时间保持 ARCHIVE_SETTLE_SECONDS 秒不变后再读取；读取失败（还没写完/被占用）时
+# 等待时间逐次加长，最多重试 ARCHIVE_MAX_RETRIES 次
+ARCHIVE_SETTLE_SECONDS = 2.0
+ARCHIVE_MAX_RETRIES = 5
+
+
+def _file_stat(path):
+    """(大小, 修改时间)，文件不存在时为None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+# 自定义事件处理器（事件由 start 中创建的 FileSystemEventHandler 转发到 on_xxx 方法）
+class BasicFileHandler(object):
     def __init__(self, update_callback,on_dir_deleted_callback):
         self.update_callback = update_callback  # UI更新回调函数
         self.TestData = None  # 延迟初始化，在start中设置
         self.on_dir_deleted_callback = on_dir_deleted_callback  # 目录删除回调
         self.MONITOR_DIR = None
+        self.observer = None
+        self._archive_lock = threading.Lock()
+        self._pending_archives = {}  # 等待写入完成的压缩包：路径 -> (定时器, 事件时的(大小, 修改时间), 已重试次数)
 
     def start(self,MONITOR_DIR,test_data):
         self.MONITOR_DIR = MONITOR_DIR
         self.TestData = test_data
+        from watchdog.observers import Observer
         self.observer = Observer()
         # 配置监控：监听目标文件夹，递归监控所有子文件夹（recursive=True）
         self.observer.schedule(
-            self,
+            self._event_handler(),
             path=str(self.MONITOR_DIR),
             recursive=True
         )
@@ -27,6 +52,16 @@ class BasicFileHandler(FileSystemEventHandler):
         print(f"📋 开始监控文件夹：{self.MONITOR_DIR}")
         print(f"💡 提示：在 {self.MONITOR_DIR} 下创建/修改/删除文件，查看输出")
         return self.observer
+
+    def _event_handler(self):
+        """watchdog 的事件处理器：把文件创建/移动/修改/删除事件转发到本对象的 on_xxx 方法"""
+        handler = watchdog_events.FileSystemEventHandler()
+        handler.on_created = self.on_created
+        handler.on_moved = self.on_moved
+        handler.on_modified = self.on_modified
+        handler.on_deleted = self.on_deleted
+        return handler
+
     # 当文件被创建时触发
     def on_created(self, event):
         file_path = Path(event.src_path)
@@ -40,11 +75,83 @@ class BasicFileHandler(FileSystemEventHandler):
             self.TestData.insert_test_data(df_single,file_path)
             self.update_callback()  # 通知UI更新
             print("触发UI更新回调")
+        elif not event.is_directory and is_archive(file_path):
+            self.schedule_archive(file_path)
+
+    # 压缩后改名（先写临时文件再移动）的压缩包在移动完成时入库
+    def on_moved(self, event):
+        if not event.is_directory and is_archive(event.dest_path):
+            self.schedule_archive(Path(event.dest_path))
 
-    # 当文件被修改时触发（注意：某些编辑器保存可能触发多次）
-    # def on_modified(self, event):
-    #     if not event.is_directory:
-    #         print(f"🔄 文件修改：{event.src_path}")
+    # 原地写入的压缩包：创建时还没写完，写入期间持续触发修改事件
+    def on_modified(self, event):
+        if not event.is_directory and is_archive(event.src_path):
+            self.schedule_archive(Path(event.src_path))
+
+    def schedule_archive(self, archive_path):
+        """压缩包写入完成（大小和修改时间不再变化）后再入库，同一个压缩包的多个事件合并为一次"""
+        key = str(archive_path)
+        with self._archive_lock:
+            pending = self._pending_archives.get(key)
+            if pending is not None:
+                pending[0].cancel()
+            self._start_archive_timer(key, 0)
+
+    def _start_archive_timer(self, key, retries):
+        # 调用方持有 _archive_lock
+        timer = threading.Timer(ARCHIVE_SETTLE_SECONDS * (retries + 1), self._check_archive, args=(key,))
+        timer.daemon = True
+        self._pending_archives[key] = (timer, _file_stat(key), retries)
+        timer.start()
+
+    def _check_archive(self, key):
+        """定时器线程：压缩包没有变化时入库，还在写入时继续等待，读取失败时稍后重试"""
+        with self._archive_lock:
+            pending = self._pending_archives.get(key)
+            if pending is None or pending[0] is not threading.current_thread():
+                return  # 之后又有新的事件，由新的定时器处理
+            _, last_stat, retries = pending
+            stat = _file_stat(key)
+            if stat is None:
+                del self._pending_archives[key]  # 压缩包已被删除/移走
+                return
+            if stat != last_stat:
+                self._start_archive_timer(key, retries)
+                return
+        alive = self.observer is not None and self.observer.is_alive()
+        ok = alive and self.ingest_archive(Path(key))
+        with self._archive_lock:
+            if self._pending_archives.get(key, (None,))[0] is not threading.current_thread():
+                return
+            if ok or not alive or retries >= ARCHIVE_MAX_RETRIES:
+                del self._pending_archives[key]
+                if alive and not ok:
+                    print(f"⚠️ 压缩包重试 {retries} 次后仍无法读取，可以之后用“获取fail数据”补录：{key}")
+                return
+            self._start_archive_timer(key, retries + 1)
+
+    def ingest_archive(self, archive_path) -> bool:
+        """
+        逐个读取压缩包中未入库的records.csv并入库（不解压到磁盘）
+        :return: 是否读取完整个压缩包（读取失败时已入库的成员保留，重试时跳过）
+        """
+        inserted = 0
+        ok = True
+        try:
+            for member, data in iter_records_members(archive_path):
+                if self.TestData.is_file_processed(member):
+                    continue
+                print(f"\n🔍 检测到压缩包中的测试文件：{member}")
+                df_single, member = self.TestData.parse_file(member, data)
+                if self.TestData.insert_test_data(df_single, member):
+                    inserted += 1
+        except Exception as e:
+            # 压缩包还在写入/被占用时无法读取，稍后重试
+            print(f"⚠️ 读取压缩包失败：{archive_path}：{str(e)}")
+            ok = False
+        if inserted:
+            self.update_callback()  # 通知UI更新
+        return ok
 
     def on_deleted(self, event):
         # 只处理目录删除事件，且删除的是监控的根目录（不是子目录）
@@ -67,6 +174,117 @@ class BasicFileHandler(FileSystemEventHandler):
     #     print(f"➡️  移动：{event.src_path} -> {event.dest_path}")
 
 
+def find_records_files(root_dir) -> List[Union[Path, str]]:
+    """
+    递归查找文件夹下的所有records.csv，包括压缩包（.zip/.tar.gz/.tgz/.tar）中的records.csv
+    压缩包成员的路径为 "压缩包路径!/成员路径" 字符串（不转为 Path，与 iter_records_members 生成的路径一致）
+    """
+    found = []
+    for dir_path, _, file_names in os.walk(root_dir):
+        for name in file_names:
+            path = os.path.join(dir_path, name)
+            if name == "records.csv":
+                found.append(Path(path))
+            elif is_archive(name):
+                try:
+                    found.extend(list_records_members(path))
+                except Exception as e:
+                    print(f"⚠️ 读取压缩包失败：{path}：{str(e)}")
+    return found
+
+
+def parse_records_file(test_data, file_path, data: Optional[bytes] = None):
+    """
+    解析单个records.csv（供线程池调用），只解析不入库
+    :param data: 已读取的文件内容（压缩包成员），为None时按路径读取
+    :return: (df_single, processed_file_path)，空文件/已入库/解析为空/失败时返回None
+    """
+    try:
+        fp = Path(file_path)
+        # 快速检查：跳过空文件
+        if (len(data) if data is not None else fp.stat().st_size) == 0:
+            print(f"ℹ️ 跳过空文件：{file_path}")
+            return None
+
+        if test_data.is_file_processed(file_path):
+            print(f"⚠️ 文件已经被存储不可以再存储")
+            return None
+
+        df_single, processed_file_path = test_data.parse_file(file_path, data)
+
+        # 过滤空数据
+        if df_single.empty:
+            print(f"ℹ️ 文件 {file_path} 解析后为空，跳过")
+            return None
+        return df_single, processed_file_path
+    except Exception as e:
+        print(f"❌ 处理文件 {file_path} 失败: {str(e)}")
+        return None
+
+
+def ingest_files(test_data, file_paths, max_workers: Optional[int] = None,
+                 stop_event: Optional[threading.Event] = None) -> dict:
+    """
+    批量导入records.csv（界面“获取fail数据”和无界面 backfill 共用）
+    先过滤已入库的文件，再用线程池并行解析，最后统一批量入库
+    同一个压缩包中的records.csv在一个任务中顺序读取（tar.gz 只解压一遍），不同压缩包/文件并行解析
+    :param file_paths: 候选文件路径
+    :param max_workers: 解析线程数，默认 min(8, CPU数+1)
+    :param stop_event: 设置后不再解析剩余文件（已解析的数据仍然入库）
+    :return: {"unprocessed": 未入库的文件数, "processed": 实际入库的文件数（同时被其他入库路径/进程入库的文件不计）}
+    """
+    unprocessed_files = test_data.get_unprocessed_files([str(fp) for fp in file_paths])
+    if not unprocessed_files:
+        return {"unprocessed": 0, "processed": 0}
+
+    def stopped():
+        return stop_event is not None and stop_event.is_set()
+
+    def parse(fp):
+        if stopped():
+            return []
+        result = parse_records_file(test_data, fp)
+        return [] if result is None else [result]
+
+    def parse_archive(archive_path, members):
+        results = []
+        for member, data in iter_records_members(archive_path, members):
+            if stopped():
+                break
+            result = parse_records_file(test_data, member, data)
+            if result is not None:
+                results.append(result)
+        return results
+
+    loose_files, archives = [], {}
+    for fp in unprocessed_files:
+        member = split_member_path(fp)
+        if member is None:
+            loose_files.append(fp)
+        else:
+            archives.setdefault(member[0], []).append(fp)
+
+    # 线程池只解析数据，所有文件解析完成后统一批量入库
+    batch_data = []
+    with ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() + 1)) as executor:
+        futures = {executor.submit(parse, fp): fp for fp in loose_files}
+        futures.update({executor.submit(parse_archive, archive_path, members): archive_path
+                        for archive_path, members in archives.items()})
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"处理文件失败 {futures[future]}: {str(e)}")
+                continue
+            batch_data.extend(results)  # 每个元素是 (df_single, processed_file_path)
+
+    inserted = 0
+    if batch_data:
+        inserted = test_data.batch_insert_test_data(batch_data)
+        print(f"\n🎉 批量插入成功！共插入 {inserted} 组数据。")
+    return {"unprocessed": len(unprocessed_files), "processed": inserted}
+
+
 def test():
     print(test)
 
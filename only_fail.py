@@ -1,24 +1,30 @@
 import sys
 import os,json
 import sqlite3
-import pandas as pd
-import queue
+import threading
+import subprocess
+from multiprocessing.connection import Listener, AuthenticationError
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout,QHeaderView,
                              QPushButton, QLineEdit, QLabel, QTableWidget, QMainWindow,
-                             QTableWidgetItem,QMessageBox,QAbstractItemView)
+                             QTableWidgetItem,QMessageBox,QAbstractItemView,QCheckBox,
+                             QHBoxLayout,QComboBox,QFileDialog,QProgressDialog)
 from PyQt6.QtCore import QTimer, QDateTime, Qt, QUrl, QThread, pyqtSignal
 from PyQt6.QtGui import QDesktopServices, QColor
 from PyQt6.QtWidgets import QStyleFactory
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 from pathlib import Path
 
 from ui.main import Ui_ui_test  # 从生成的UI文件导入
-from monitoringCSV import BasicFileHandler
-from dataSQL import TestData
+from monitoringCSV import BasicFileHandler, find_records_files, ingest_files
+from dataSQL import FAIL_PAGE_COLUMNS
+from archiveMembers import split_member_path
 from readMD import MDViewer
 from jsonInfo import JsonComponentBinder
 from FilterConfigInfoUI import FilterConfigInfoUI
+from alertRules import AlertEngine, load_rules
+from retention import RetentionPruner, load_retention
+from partitionedData import open_test_data
+from exportData import export_fail_data, ExportCancelled
+from ingestProcess import start_ingest_process, load_ingest_mode, INGEST_PROCESS_FLAG, main as ingest_main
 
 
 if getattr(sys, 'frozen', False):
@@ -78,6 +84,7 @@ class MonitorThread(QThread):
         self.monitor_dir = monitor_dir
         self.test_data = test_data
         self.handler = BasicFileHandler(self.on_file_updated,self.on_dir_deleted_callback)  # 改用内部回调
+        self.observer = None
 
     def on_file_updated(self):
         """线程内回调，通过信号通知主线程"""
@@ -93,13 +100,192 @@ class MonitorThread(QThread):
             self.msleep(1000)  # 每秒检查一次中断请求
 
     def stop(self):
+        # 先等线程退出（observer 在 run 中启动），再停止 observer 并等待正在入库的文件提交
+        self.requestInterruption()
+        self.wait()
         if self.observer:
             self.observer.stop()
             self.observer.join()
+            self.observer = None
+
+class IngestProcessThread(QThread):
+    """
+    入库进程的管理线程：启动入库进程，把入库进程的通知转为信号；入库进程崩溃时自动重启
+    界面进程只读数据库，不再在界面进程中解析records.csv；建表/迁移和数据清理都由入库进程进行
+    """
+    commit_signal = pyqtSignal(int)  # 有新数据提交（参数为最大id）
+    alert_signal = pyqtSignal(object)  # 告警
+    backfill_signal = pyqtSignal(object)  # 批量导入结果
+    session_signal = pyqtSignal(int)  # 已开始新的监控会话
+    RESTART_DELAY_MS = 3000
+
+    def __init__(self, db_path, config_path, monitor_dir):
+        super().__init__()
+        self.args = (str(db_path), config_path, str(monitor_dir))
+        self.process = None
+        self.listener = None
+        self.conn = None  # 入库进程连接后才可用，之前发送的命令先排队
+        self.queued = []
+        self.ready_event = threading.Event()  # 入库进程已初始化数据库，界面可以只读打开
+        self.backfill_pending = False  # 已发送导入命令、尚未收到结果（入库进程崩溃时需要通知界面）
+        self._send_lock = threading.Lock()
+        # 在主线程中启动入库进程，创建后即可发送命令
+        self._start_process()
+
+    def _start_process(self):
+        # 入库进程是新的解释器（不导入界面模块），通过 Listener 连接回界面进程
+        authkey = os.urandom(32)
+        self.listener = Listener(authkey=authkey)
+        self.conn = None
+        self.process = start_ingest_process(*self.args, self.listener, authkey)
+        threading.Thread(target=self._accept, args=(self.listener,), name="IngestAccept", daemon=True).start()
+
+    def _accept(self, listener):
+        try:
+            conn = listener.accept()
+        except (OSError, EOFError, AuthenticationError):
+            return  # 入库进程启动失败/已重启，listener 已关闭
+        with self._send_lock:
+            if listener is not self.listener:
+                conn.close()
+                return
+            self.conn = conn
+            queued, self.queued = self.queued, []
+            for command in queued:
+                self._send(command)
+
+    def _close_connection(self):
+        # 调用方持有 _send_lock
+        for resource in (self.conn, self.listener):
+            if resource is not None:
+                try:
+                    resource.close()
+                except OSError:
+                    pass
+        self.conn = self.listener = None
+
+    def _send(self, command):
+        # 调用方持有 _send_lock
+        try:
+            self.conn.send(command)
+        except OSError:
+            print(f"⚠️ 入库进程未运行，命令未发送：{command[0]}")
+            return False
+        self.backfill_pending = self.backfill_pending or command[0] == "backfill"
+        return True
+
+    def send(self, *command):
+        """向入库进程发送命令（主线程调用），入库进程还没有连接时排队，连接后发送"""
+        with self._send_lock:
+            if self.conn is None:
+                if self.process is None or self.process.poll() is not None:
+                    print(f"⚠️ 入库进程未运行，命令未发送：{command[0]}")
+                    return False
+                self.queued.append(command)
+                self.backfill_pending = self.backfill_pending or command[0] == "backfill"
+                return True
+            return self._send(command)
+
+    def run(self):
+        signals = {"commit": self.commit_signal, "alert": self.alert_signal,
+                   "backfill_done": self.backfill_signal, "session": self.session_signal}
+        while not self.isInterruptionRequested():
+            conn = self.conn
+            if conn is None:
+                self.msleep(100)  # 等待入库进程连接
+            else:
+                try:
+                    if conn.poll(0.5):
+                        message = conn.recv()
+                        if message[0] == "ready":
+                            self.ready_event.set()
+                        else:
+                            if message[0] == "backfill_done":
+                                self.backfill_pending = False
+                            signals[message[0]].emit(message[1])
+                        continue
+                except (EOFError, OSError):
+                    try:
+                        self.process.wait(1)  # 连接已断开，等待进程退出
+                    except subprocess.TimeoutExpired:
+                        pass
+            if self.process.poll() is None or self.isInterruptionRequested():
+                continue
+            print(f"❌ 入库进程已退出（exitcode={self.process.returncode}），{self.RESTART_DELAY_MS / 1000:g}s 后重启")
+            with self._send_lock:
+                self._close_connection()
+                self.queued = []
+            if self.backfill_pending:
+                self.backfill_pending = False
+                self.backfill_signal.emit({"error": f"入库进程已退出（exitcode={self.process.returncode}）"})
+            self.msleep(self.RESTART_DELAY_MS)
+            if not self.isInterruptionRequested():
+                with self._send_lock:
+                    self._start_process()
+
+    def stop(self):
+        self.send("stop")
         self.requestInterruption()
         self.wait()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.terminate()
+            self.process.wait()
+        with self._send_lock:
+            self._close_connection()
+
+class InitDataThread(QThread):
+    """启动时的数据库初始化线程：创建数据库实例（建表/迁移/对账）并查询fail表格的第一页，避免阻塞UI"""
+    result_signal = pyqtSignal(object)  # (数据库实例, 第一页行, 下一页游标)，失败时为异常
+
+    def __init__(self, db_path, fail_filters, page_size, ready_event=None):
+        super().__init__()
+        self.db_path = db_path
+        self.fail_filters = fail_filters  # 为None时不查询第一页（fail表格按签名分组显示）
+        self.page_size = page_size
+        # 入库进程方式：等入库进程初始化数据库后只读打开（界面进程不建表/迁移）
+        self.ready_event = ready_event
+
+    def run(self):
+        try:
+            if self.ready_event is not None:
+                while not self.ready_event.wait(0.2):
+                    if self.isInterruptionRequested():
+                        raise RuntimeError("已取消")
+            test_data = open_test_data(self.db_path, CONFIG_PATH, read_only=self.ready_event is not None)
+            rows, cursor = [], None
+            if self.fail_filters is not None:
+                rows, cursor = test_data.get_fail_data_page(page_size=self.page_size, **self.fail_filters)
+            result = (test_data, rows, cursor)
+        except Exception as e:
+            result = e
+        self.result_signal.emit(result)
+
+class ExportThread(QThread):
+    """导出线程：分页读取fail数据写入文件，避免阻塞UI"""
+    progress_signal = pyqtSignal(int, int)  # 已导出行数, 总行数
+    result_signal = pyqtSignal(object)  # 导出结果dict，失败/取消时为异常
+
+    def __init__(self, test_data, path, filters):
+        super().__init__()
+        self.test_data = test_data
+        self.path = path
+        self.filters = filters
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        try:
+            result = export_fail_data(self.test_data, self.path, filters=self.filters,
+                                      progress=self.progress_signal.emit, cancel_event=self.cancel_event)
+        except Exception as e:
+            result = e
+        self.result_signal.emit(result)
 
 class failInfoWindow(QMainWindow, Ui_ui_test):
+    alert_signal = pyqtSignal(object)  # 告警信号（入库线程 -> 主线程）
+    FAIL_PAGE_SIZE = 500  # fail明细表每次加载的行数
+
     def __init__(self):
         super().__init__()
         self.setupUi(self)  # 初始化UI
@@ -108,8 +294,6 @@ class failInfoWindow(QMainWindow, Ui_ui_test):
         #初始化创建插件UI实例
         self.FilterConfigInfoUI = FilterConfigInfoUI(parent=self)  # 绑定父对象，避免内存泄漏
 
-        # 初始化sop_UI,加载md文件并显示
-        self.init_sop_ui()
         # 初始化ui的配置信息
         self.init_json_info()
 
@@ -117,16 +301,46 @@ class failInfoWindow(QMainWindow, Ui_ui_test):
         self.db_path = file_path #数据库文件地址
         self.monitor_dir = Path("~/Library/Logs/Atlas/unit-archive").expanduser() #被监控的文件夹地址
         self.monitor_thread = None #监控线程
-        self.test_data = None #数据库类的实例
+        self.test_data = None #数据库类的实例（deferred_init 中创建）
+        self.retention_pruner = None
+        self.init_thread = None #数据库初始化线程
+        self.init_finished = False #延迟初始化是否已完成
+
+        #告警引擎，入库后增量评估滑动窗口规则，告警通过信号显示在告警表格上
+        self.alert_engine = AlertEngine(load_rules(CONFIG_PATH))
+        self.alert_engine.add_listener(self.alert_signal.emit)
+        self.alert_signal.connect(self.add_alert_row)
 
         #初始化时间标签，显示监听事件～当前时间
         self.init_time_range_label()
         #初始化显示fail信息的表格
         self.init_table_fail()
+        #初始化显示告警信息的表格
+        self.init_table_alert()
+        #fail表格按fail签名分组显示的开关
+        self.checkBox_group_signature = QCheckBox("fail表格按fail签名分组显示", self.groupBox_config)
+        self.verticalLayout_7.addWidget(self.checkBox_group_signature)
+        self.checkBox_group_signature.toggled.connect(self.on_group_signature_toggled)
+        #fail表格的子串搜索（SN/测试项/源文件路径），输入停止300ms后再刷新表格
+        self.init_search_box()
+        #按当前筛选条件导出fail数据（CSV/Parquet）
+        self.export_thread = None
+        self.pushButton_export_fail = QPushButton("导出fail数据", self.groupBox_config)
+        self.verticalLayout_7.addWidget(self.pushButton_export_fail)
+        self.pushButton_export_fail.clicked.connect(self.export_fail_data)
 
         #获取fail-csv的文件夹路径
         enable_drag_drop(self.textEdit_logpath)
 
+        #fail明细分页加载：滚动到底部时加载下一页
+        self.fail_filters = {}
+        self.fail_cursor = None
+        self.fail_has_more = False
+        self.tableWidget_fail.verticalScrollBar().valueChanged.connect(self.on_fail_table_scrolled)
+
+        #双击fail表格的行，打开该测试项的测试值趋势图
+        self.tableWidget_fail.cellDoubleClicked.connect(self.open_trend_dialog)
+
         #清除数据并重启监控，删掉数据库，还有表格的内容
         self.pushButton_clear.clicked.connect(self.clear_status)
         #获取指定文件夹里的fail数据，存在数据库中并显示在ui上
@@ -136,9 +350,36 @@ class failInfoWindow(QMainWindow, Ui_ui_test):
         #点击Action打开配置筛选的ui
         self.actionchang.triggered.connect(self.open_filter_config_ui)
 
-        #开启监控线程
+        #入库方式：thread 在界面进程的监控线程中入库，process 由独立的入库进程入库（config.json 的 ingest_mode）
+        self.ingest_mode = load_ingest_mode(CONFIG_PATH)
+        self.ingest_thread = None
+
+        #SOP、数据库、监控和fail表格在窗口显示后再初始化，初始化完成前不能操作数据
+        self.set_data_actions_enabled(False)
+        self.statusBar().showMessage("正在加载数据...")
+        QTimer.singleShot(0, self.deferred_init)
+
+    #窗口显示后的初始化（事件循环开始后执行，窗口先绘制出来）
+    def deferred_init(self):
+        # 初始化sop_UI,加载md文件并显示
+        self.init_sop_ui()
+        #后台线程初始化数据库，完成后 on_data_ready 开启监控线程
         self.init_monitoring()
 
+    #数据库初始化完成后（第一次）：后台按保留策略清理过期的原始数据，允许操作数据
+    def finish_init(self):
+        #config.json 的 retention.raw_days 为0时不清理，入库进程方式时由入库进程清理（界面进程只读）
+        if self.ingest_mode == "thread":
+            self.retention_pruner = RetentionPruner(self.test_data, **load_retention(CONFIG_PATH))
+            self.retention_pruner.start()
+        self.set_data_actions_enabled(True)
+        self.init_finished = True
+
+    #依赖数据库的按钮，初始化完成前禁用
+    def set_data_actions_enabled(self, enabled):
+        for button in (self.pushButton_clear, self.pushButton_get_failcsv, self.pushButton_export_fail):
+            button.setEnabled(enabled)
+
     def open_filter_config_ui(self):
         """点击Action打开/激活插件UI"""
         self.FilterConfigInfoUI.show()  # 显示插件窗口
@@ -172,18 +413,55 @@ class failInfoWindow(QMainWindow, Ui_ui_test):
     def init_monitoring(self):
         # 确保监控目录存在
         self.monitor_dir.mkdir(parents=True,exist_ok=True)
-        
-        # 初始化数据库
-        self.test_data = TestData(self.db_path)
-        
+
+        if self.init_thread is not None:
+            return  # 正在初始化
+        # 按配置的存储方式（单文件/按天/按周分区）创建数据库实例并查询第一页，在后台线程执行
+        fail_filters = None if self.checkBox_group_signature.isChecked() else self.get_fail_filters()
+        ready_event = None
+        if self.ingest_mode == "process":
+            # 入库进程负责建表/迁移，界面进程等它初始化完成后只读打开数据库
+            self.start_ingest_process()
+            ready_event = self.ingest_thread.ready_event
+        self.init_thread = InitDataThread(self.db_path, fail_filters, self.FAIL_PAGE_SIZE, ready_event)
+        self.init_thread.result_signal.connect(self.on_data_ready)
+        self.init_thread.start()
+
+    # 数据库初始化完成（主线程）：把入库告警/测试项漂移告警接到告警表格，启动监控线程，显示第一页
+    def on_data_ready(self, result):
+        init_thread, self.init_thread = self.init_thread, None
+        init_thread.wait()
+        if isinstance(result, Exception):
+            print(f"❌ 数据库初始化失败：{str(result)}")
+            self.statusBar().showMessage(f"数据库初始化失败：{str(result)}")
+            return
+        test_data, rows, cursor = result
+        if self.ingest_mode == "thread":
+            test_data.add_commit_listener(self.alert_engine.on_unit_committed)
+            test_data.item_stats.add_listener(self.alert_signal.emit)
+        self.test_data = test_data
+
         # 启动监控线程
         self.start_monitor_thread()
-        # 更新UI
-        self.update_table_fail()
+        # 更新UI：加载期间切换了分组显示或修改了筛选条件时重新查询
+        if self.checkBox_group_signature.isChecked() or init_thread.fail_filters != self.get_fail_filters():
+            self.update_table_fail()
+        else:
+            self.fail_filters = init_thread.fail_filters
+            self.tableWidget_fail.setRowCount(0)
+            self.append_fail_rows(rows)
+            self.fail_cursor = cursor
+            self.fail_has_more = cursor is not None
+            self.show_cache_stats()
         print("初始化监控系统")
+        if not self.init_finished:
+            self.finish_init()
 
     # 启动监控线程
     def start_monitor_thread(self):
+        if self.ingest_mode == "process":
+            self.start_ingest_process()
+            return
         if self.monitor_thread and self.monitor_thread.isRunning():
             self.monitor_thread.stop()
         
@@ -196,23 +474,48 @@ class failInfoWindow(QMainWindow, Ui_ui_test):
         self.monitor_thread.delete_signal.connect(self.init_monitoring)
         self.monitor_thread.start()
 
-    # 清除数据并重启监控
+    # 启动入库进程（只启动一次；监控目录被删除时由入库进程重建，进程崩溃时由管理线程重启）
+    def start_ingest_process(self):
+        if self.ingest_thread is not None:
+            return
+        self.ingest_thread = IngestProcessThread(self.db_path, CONFIG_PATH, self.monitor_dir)
+        self.ingest_thread.commit_signal.connect(self.on_ingest_committed)
+        self.ingest_thread.alert_signal.connect(self.add_alert_row)
+        self.ingest_thread.backfill_signal.connect(self.on_backfill_finished)
+        self.ingest_thread.session_signal.connect(self.on_session_started)
+        self.ingest_thread.start()
+
+    # 入库进程提交了新数据：刷新fail表格
+    def on_ingest_committed(self, max_id):
+        self.update_table_fail()
+
+    # 入库进程已开始新的监控会话
+    def on_session_started(self, session_id):
+        self.tableWidget.setRowCount(0)
+        self.update_table_fail()
+        QMessageBox.information(self, "成功", "已清除数据并重新开始监控")
+
+    # 清除数据并重启监控（开始新的监控会话，历史数据保留在数据库中）
     def clear_status(self):
+        if self.ingest_mode == "process":
+            # 由入库进程开始新会话并清空告警状态，完成后通知界面刷新
+            self.start_time = QDateTime.currentDateTime().toString(self.time_format)
+            self.ingest_thread.send("new_session")
+            return
         try:
             # 停止当前监控
             if self.monitor_thread and self.monitor_thread.isRunning():
                 self.monitor_thread.stop()
 
-            # 删除数据库文件
-            if os.path.exists(self.db_path):
-                os.remove(self.db_path)
-                print("🗑️ 数据库文件已删除")
+            # 开始新的监控会话，页面只显示新会话的数据
+            self.test_data.start_new_session()
+            self.alert_engine.reset()
+            self.tableWidget.setRowCount(0)
 
             # 更新起始时间
             self.start_time = QDateTime.currentDateTime().toString(self.time_format)
             
-            # 重新初始化数据库和监控
-            self.test_data = TestData(self.db_path)
+            # 重新开始监控
             self.start_monitor_thread()
             
             # 更新UI
@@ -294,115 +597,274 @@ class failInfoWindow(QMainWindow, Ui_ui_test):
         self.tableWidget_fail.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.tableWidget_fail.setSortingEnabled(True)  # 初始启用排序
 
-    #从数据库获取fail的数据，增加筛选功能
-    def get_fail_data_filter(self):
-        start_datetime = self.FilterConfigInfoUI.get_start_datetime()
-        end_datetime = self.FilterConfigInfoUI.get_end_datetime()
-        test_item_exclude = self.FilterConfigInfoUI.get_test_item_exclude_str()
-        sn_filter = ""
-        slot_id_exclude = ""
-        fail_data = self.test_data.get_fail_data(
-            sn_filter=sn_filter,
-            test_item_exclude_str=test_item_exclude,
-            slot_id_exclude_str=slot_id_exclude,
-            start_time_str=start_datetime,
-            end_time_str=end_datetime
+    #初始化搜索框
+    def init_search_box(self):
+        self.comboBox_search_kind = QComboBox(self.groupBox_config)
+        self.comboBox_search_kind.addItem("SN", "sn")
+        self.comboBox_search_kind.addItem("测试项", "test_item")
+        self.comboBox_search_kind.addItem("源文件路径", "file_path")
+        self.lineEdit_search = QLineEdit(self.groupBox_config)
+        self.lineEdit_search.setPlaceholderText("搜索（包含该字符串）")
+        self.lineEdit_search.setClearButtonEnabled(True)
+        layout_search = QHBoxLayout()
+        layout_search.addWidget(self.comboBox_search_kind)
+        layout_search.addWidget(self.lineEdit_search)
+        self.verticalLayout_7.addLayout(layout_search)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.update_table_fail)
+        self.lineEdit_search.textChanged.connect(self.search_timer.start)
+        self.comboBox_search_kind.currentIndexChanged.connect(self.search_timer.start)
+
+    #初始化显示告警的表格（config区域的表格）
+    def init_table_alert(self):
+        self.tableWidget.setColumnCount(4)
+        self.tableWidget.setHorizontalHeaderLabels(["时间", "规则", "对象", "告警信息"])
+        self.tableWidget.setColumnWidth(0, 130)
+        self.tableWidget.setColumnWidth(1, 110)
+        self.tableWidget.setColumnWidth(2, 120)
+        self.tableWidget.horizontalHeader().setStretchLastSection(True)
+        self.tableWidget.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.tableWidget.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+
+    #新告警插入到告警表格最上方，只保留最近的告警
+    def add_alert_row(self, alert):
+        self.tableWidget.insertRow(0)
+        alert_info = alert.to_dict()
+        for col, key in enumerate(["event_time", "rule", "key", "message"]):
+            item = QTableWidgetItem(str(alert_info[key]))
+            item.setForeground(QColor(Qt.GlobalColor.red))
+            self.tableWidget.setItem(0, col, item)
+        max_rows = self.alert_engine.recent_alerts.maxlen
+        if self.tableWidget.rowCount() > max_rows:
+            self.tableWidget.setRowCount(max_rows)
+
+    #从界面读取fail数据的筛选条件
+    def get_fail_filters(self):
+        # 搜索框的内容按选择的类型传给对应的子串筛选参数
+        fail_filters = {"sn_filter": "", "test_item_filter": "", "file_path_filter": ""}
+        fail_filters[f"{self.comboBox_search_kind.currentData()}_filter"] = self.lineEdit_search.text()
+        fail_filters.update(
+            test_item_exclude_str=self.FilterConfigInfoUI.get_test_item_exclude_str(),
+            slot_id_exclude_str="",
+            start_time_str=self.FilterConfigInfoUI.get_start_datetime(),
+            end_time_str=self.FilterConfigInfoUI.get_end_datetime()
         )
+        return fail_filters
+
+    #从数据库获取fail的数据，增加筛选功能（一次性返回全部结果的DataFrame）
+    def get_fail_data_filter(self):
+        fail_data = self.test_data.get_fail_data(**self.get_fail_filters())
         # print("fail_data",fail_data)
         return fail_data
 
+    #切换fail表格的显示方式（明细/按签名分组）
+    def on_group_signature_toggled(self, checked):
+        self.tableWidget_fail.setRowCount(0)
+        if checked:
+            self.init_table_fail_grouped()
+        else:
+            self.init_table_fail()
+        self.update_table_fail()
+
+    #初始化按fail签名分组显示的表格
+    def init_table_fail_grouped(self):
+        self.tableWidget_fail.setColumnCount(7)
+        self.tableWidget_fail.setHorizontalHeaderLabels([
+            "签名", "产品数", "fail项数", "首次出现", "最近出现", "fail测试项", "SN"
+        ])
+        for col, width in enumerate([130, 60, 60, 150, 150, 300, 200]):
+            self.tableWidget_fail.setColumnWidth(col, width)
+
+    #按fail签名分组更新fail表格，同一组fail测试项只显示一行
+    def update_table_fail_grouped(self):
+        groups = self.test_data.get_fail_signature_groups(
+            test_item_exclude_str=self.FilterConfigInfoUI.get_test_item_exclude_str(),
+            start_time_str=self.FilterConfigInfoUI.get_start_datetime(),
+            end_time_str=self.FilterConfigInfoUI.get_end_datetime()
+        )
+        self.tableWidget_fail.setUpdatesEnabled(False)
+        self.tableWidget_fail.setSortingEnabled(False)
+        self.tableWidget_fail.setRowCount(len(groups))
+        for row_idx, row in enumerate(groups.itertuples(index=False)):
+            values = [row.signature, row.unit_count, row.item_count, row.first_seen, row.last_seen,
+                      row.test_items.replace("\n", "; "), row.sn_list]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem()
+                # 数字列用数值存储，保证排序正确
+                item.setData(Qt.ItemDataRole.DisplayRole, int(value) if col in (1, 2) else str(value))
+                item.setForeground(QColor(Qt.GlobalColor.red))
+                self.tableWidget_fail.setItem(row_idx, col, item)
+        self.tableWidget_fail.setUpdatesEnabled(True)
+        self.tableWidget_fail.setSortingEnabled(True)
+
     #更新fail表格的内容
     def update_table_fail(self):
-        self.fail_data = self.get_fail_data_filter()
-        if self.fail_data.empty:
-            self.tableWidget_fail.setRowCount(0)
+        if self.test_data is None:
+            return  # 数据库还未初始化（deferred_init 完成后会刷新）
+        try:
+            self._update_table_fail()
+        finally:
+            self.show_cache_stats()
+
+    def show_cache_stats(self):
+        stats = self.test_data.cache_stats()
+        self.statusBar().showMessage(
+            f"查询缓存命中率：{stats['hit_rate']:.0%}（命中 {stats['hits']} / 未命中 {stats['misses']}）")
+
+    def _update_table_fail(self):
+        if self.checkBox_group_signature.isChecked():
+            self.update_table_fail_grouped()
+            return
+
+        # 明细只加载第一页，滚动到底部时再加载下一页（内存只和已浏览的行数有关）
+        self.fail_filters = self.get_fail_filters()
+        self.fail_cursor = None
+        self.fail_has_more = True
+        self.tableWidget_fail.setRowCount(0)  # 清空表格
+        self.load_more_fail_rows()
+
+    #滚动条接近底部时加载下一页
+    def on_fail_table_scrolled(self, value):
+        scroll_bar = self.tableWidget_fail.verticalScrollBar()
+        if value >= scroll_bar.maximum() - 5:
+            self.load_more_fail_rows()
+
+    #按游标读取下一页fail数据并追加到表格末尾
+    def load_more_fail_rows(self):
+        if self.checkBox_group_signature.isChecked() or not self.fail_has_more or self.test_data is None:
+            return
+        rows, self.fail_cursor = self.test_data.get_fail_data_page(
+            page_size=self.FAIL_PAGE_SIZE, cursor=self.fail_cursor, **self.fail_filters)
+        self.fail_has_more = self.fail_cursor is not None
+        self.append_fail_rows(rows)
+
+    #把一页fail数据追加到表格末尾
+    def append_fail_rows(self, rows):
+        if not rows:
             return
 
         # ========== 关键步骤1：暂停UI刷新 + 禁用排序 ==========
         self.tableWidget_fail.setUpdatesEnabled(False)
         self.tableWidget_fail.setSortingEnabled(False)  # 禁用排序，避免行号错乱
-        
+
         # ========== 关键步骤2：记录当前排序状态 ==========
         sort_col, sort_order = self._get_table_sort_state()
 
-        # ========== 步骤3：清空并填充表格 ==========
-        self.tableWidget_fail.setRowCount(0)  # 清空表格
-        total_rows = len(self.fail_data)
-        self.tableWidget_fail.setRowCount(total_rows)
-
-        # 填充数据（按原始数据索引，此时排序已禁用，行号和数据索引一致）
-        for row_idx, (df_index, row) in enumerate(self.fail_data.iterrows()):
-            # 封装创建红色Item的函数
-            def create_red_item(text):
-                item_text = str(text) if pd.notna(text) else ""
-                item = QTableWidgetItem(item_text)
-                item.setForeground(QColor(Qt.GlobalColor.red))
-                # 关键：设置Item的用户数据，存储原始数据索引（用于按钮点击）
-                item.setData(Qt.ItemDataRole.UserRole, df_index)
-                return item
+        # ========== 步骤3：在表格末尾追加本页数据 ==========
+        start_row = self.tableWidget_fail.rowCount()
+        self.tableWidget_fail.setRowCount(start_row + len(rows))
 
+        # 封装创建红色Item的函数
+        def create_red_item(text):
+            item_text = str(text) if text is not None else ""
+            item = QTableWidgetItem(item_text)
+            item.setForeground(QColor(Qt.GlobalColor.red))
+            return item
+
+        for row_idx, row in enumerate(rows, start=start_row):
+            record = dict(zip(FAIL_PAGE_COLUMNS, row))
             # 0: SN
-            self.tableWidget_fail.setItem(row_idx, 0, create_red_item(row['sn']))
+            self.tableWidget_fail.setItem(row_idx, 0, create_red_item(record['sn']))
             # 1: slot_id
-            self.tableWidget_fail.setItem(row_idx, 1, create_red_item(row['slot_id']))
+            self.tableWidget_fail.setItem(row_idx, 1, create_red_item(record['slot_id']))
             # 2: 测试时间
-            if pd.notna(row['test_time']):
-                time_text = row['test_time'].strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                time_text = ""
-            self.tableWidget_fail.setItem(row_idx, 2, create_red_item(time_text))
+            self.tableWidget_fail.setItem(row_idx, 2, create_red_item(record['test_time']))
             # 3: 测试项
-            self.tableWidget_fail.setItem(row_idx, 3, create_red_item(row['test_item']))
+            self.tableWidget_fail.setItem(row_idx, 3, create_red_item(record['test_item']))
             # 4: 上限
-            self.tableWidget_fail.setItem(row_idx, 4, create_red_item(row['test_usl']))
+            self.tableWidget_fail.setItem(row_idx, 4, create_red_item(record['test_usl']))
             # 5: 测试值
-            self.tableWidget_fail.setItem(row_idx, 5, create_red_item(row['test_value']))
+            self.tableWidget_fail.setItem(row_idx, 5, create_red_item(record['test_value']))
             # 6: 下限
-            self.tableWidget_fail.setItem(row_idx, 6, create_red_item(row['test_lsl']))
+            self.tableWidget_fail.setItem(row_idx, 6, create_red_item(record['test_lsl']))
             # 7: 结果
-            try:
-                result_text = str(row['test_result']) if pd.notna(row['test_result']) else "无结果"
-            except Exception as e:
-                result_text = f"异常: {str(e)[:10]}"
-            self.tableWidget_fail.setItem(row_idx, 7, create_red_item(result_text))
+            self.tableWidget_fail.setItem(row_idx, 7, create_red_item(record['test_result'] or "无结果"))
             # 8: 源文件路径
-            self.tableWidget_fail.setItem(row_idx, 8, create_red_item(row['file_path']))
+            self.tableWidget_fail.setItem(row_idx, 8, create_red_item(record['file_path']))
 
-            # 9: 操作列 - 打开文件夹按钮（核心修复：不再依赖行号，改用Item的用户数据）
+            # 9: 操作列 - 打开文件夹按钮（闭包直接传递文件路径，不依赖行号）
             open_button = QPushButton("打开文件夹", self.tableWidget_fail)
-            # 绑定点击事件（通过闭包传递原始数据索引，而非行号）
             open_button.clicked.connect(
-                lambda checked, idx=df_index: self.on_open_folder_clicked(idx)
+                lambda checked, path=record['file_path']: self.on_open_folder_clicked(path)
             )
             self.tableWidget_fail.setCellWidget(row_idx, 9, open_button)
 
         # ========== 关键步骤4：恢复排序 + UI刷新 ==========
         self.tableWidget_fail.setUpdatesEnabled(True)
-        # 先启用排序，再恢复之前的排序状态
+        # 先启用排序，再恢复之前的排序状态（只对已加载的行排序）
         self.tableWidget_fail.setSortingEnabled(True)
         self._restore_table_sort_state(sort_col, sort_order)
 
         # 优化列宽（按钮列）
         self.tableWidget_fail.setColumnWidth(9, 120)
 
+    #按当前筛选条件导出fail数据，后台线程分页写入文件，进度对话框可以取消
+    def export_fail_data(self):
+        if self.export_thread is not None or self.test_data is None:
+            return
+        default_path = os.path.join(os.path.expanduser("~"),
+                                    f"fail_{QDateTime.currentDateTime().toString('yyyyMMdd_HHmmss')}.csv")
+        path, selected_filter = QFileDialog.getSaveFileName(self, "导出fail数据", default_path,
+                                                            "CSV (*.csv);;Parquet (*.parquet)")
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += ".parquet" if "parquet" in selected_filter else ".csv"
+
+        self.export_dialog = QProgressDialog("正在导出fail数据...", "取消", 0, 0, self)
+        self.export_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.export_dialog.setMinimumDuration(0)
+        self.export_thread = ExportThread(self.test_data, path, self.get_fail_filters())
+        self.export_thread.progress_signal.connect(self.on_export_progress)
+        self.export_thread.result_signal.connect(self.on_export_finished)
+        self.export_dialog.canceled.connect(self.export_thread.cancel_event.set)
+        self.export_thread.start()
+
+    def on_export_progress(self, exported, total):
+        self.export_dialog.setMaximum(max(total, 1))
+        self.export_dialog.setValue(exported)
+        self.export_dialog.setLabelText(f"正在导出fail数据：{exported}/{total} 行")
+
+    def on_export_finished(self, result):
+        self.export_thread.wait()
+        self.export_thread = None
+        self.export_dialog.canceled.disconnect()
+        self.export_dialog.close()
+        if isinstance(result, ExportCancelled):
+            QMessageBox.information(self, "提示", str(result))
+        elif isinstance(result, Exception):
+            QMessageBox.warning(self, "错误", f"导出失败: {str(result)}")
+        else:
+            QMessageBox.information(self, "成功", f"已导出 {result['rows']} 行fail数据：\n{result['path']}")
+
+    #打开双击行对应测试项的趋势图（分组显示时不支持）
+    def open_trend_dialog(self, row, column):
+        if self.checkBox_group_signature.isChecked():
+            return
+        item = self.tableWidget_fail.item(row, 3)
+        if item is None or item.text() == "":
+            return
+        from trendChart import TrendDialog  # numpy/pandas 第一次打开趋势图时才导入
+        dialog = TrendDialog(self.test_data, item.text(), parent=self)
+        dialog.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dialog.show()
+
     #fail表的最后一列，用于打开fail数据的原始路径
-    def on_open_folder_clicked(self, df_index):
+    def on_open_folder_clicked(self, file_path):
         """
         当“打开文件夹”按钮被点击时调用
-        :param df_index: DataFrame 中该行数据的真实索引标签
+        :param file_path: 该行数据的源文件路径
         """
-        try:
-            # 使用 .loc 按索引标签安全地获取行数据
-            row_data = self.fail_data.loc[df_index]
-            file_path = row_data['file_path']
-        except KeyError:
-            QMessageBox.warning(self, "错误", f"无法在数据中找到索引为 {df_index} 的行。")
-            return
-
-        if not file_path or pd.isna(file_path):
+        if not file_path or file_path != file_path:  # 空值/NaN
             QMessageBox.warning(self, "警告", "文件路径为空或无效。")
             return
 
+        member = split_member_path(file_path)
+        if member is not None:
+            file_path = member[0]  # 压缩包中的records.csv：打开压缩包所在的文件夹
         folder_path = os.path.dirname(str(file_path)) # 确保 file_path 是字符串
 
         if not os.path.exists(folder_path):
@@ -425,100 +887,70 @@ class failInfoWindow(QMainWindow, Ui_ui_test):
             QMessageBox.critical(self, "错误", f"文件夹不存在：\n{log_path_str}")
             return False
 
+        # 入库进程方式：交给入库进程导入，完成后通知界面
+        if self.ingest_mode == "process":
+            if self.ingest_thread.send("backfill", str(log_path)):
+                self.pushButton_get_failcsv.setEnabled(False)
+                self.statusBar().showMessage(f"正在导入：{log_path}")
+            return
+
         # 1. 先收集所有符合条件的文件路径（减少IO操作次数）
-        records_files_found = list(log_path.rglob('records.csv'))
+        records_files_found = find_records_files(log_path)
         if not records_files_found:
             QMessageBox.information(self, "提示", "未找到任何records.csv文件")
             return
 
-        # 2. 批量检查已处理文件（减少数据库查询次数）
-        file_paths = [str(fp) for fp in records_files_found]
-        unprocessed_files = self.test_data.get_unprocessed_files(file_paths)
-        
-        if not unprocessed_files:
+        # 2. 过滤已入库的文件，线程池并行解析后批量入库
+        try:
+            result = ingest_files(self.test_data, records_files_found)
+        except Exception as e:
+            QMessageBox.critical(self.textEdit_logpath, "批量插入失败", f"数据库批量插入出错：\n{str(e)}")
+            return False
+        if not result["unprocessed"]:
             QMessageBox.information(self, "提示", "没有需要处理的新文件")
             return
 
-        # 3. 批量处理文件（使用线程池加速）
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        # 1. 创建线程安全的队列，存储所有处理后的数据（线程安全，无需额外加锁）
-        batch_data_queue = queue.Queue()
-        processed_count = 0
-        max_workers = min(8, os.cpu_count() + 1)
-
-        # 2. 线程池处理文件：只解析数据，存入队列
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务（传递队列给子线程）
-            futures = {
-                executor.submit(self.process_single_file, fp, batch_data_queue): fp 
-                for fp in unprocessed_files
-            }
-            
-            # 处理结果（统计成功处理的文件数）
-            for future in as_completed(futures):
-                try:
-                    if future.result():
-                        processed_count += 1
-                except Exception as e:
-                    print(f"处理文件失败 {futures[future]}: {str(e)}")
-
-        # 3. 所有线程完成后，批量提取队列中的数据
-        batch_data = []
-        while not batch_data_queue.empty():
-            batch_data.append(batch_data_queue.get())  # 每个元素是 (df_single, processed_file_path)
-
-        # 4. 批量插入数据库（调用 TestData 的批量插入接口）
-        if batch_data:
-            try:
-                self.test_data.batch_insert_test_data(batch_data)
-                print(f"\n🎉 批量插入成功！共插入 {len(batch_data)} 组数据。")
-            except Exception as e:
-                QMessageBox.critical(self.textEdit_logpath, "批量插入失败", f"数据库批量插入出错：\n{str(e)}")
-                return False
-
-        # 5. 更新 UI
+        # 3. 更新 UI
         self.update_table_fail()
         QMessageBox.information(self, "成功", 
-                              f"处理完成！\n共扫描 {len(records_files_found)} 个文件，\n其中 {processed_count} 个为新文件并已成功处理。")
-
-
-    #按下按钮后，从指定文件夹获取fail数据，单个解析，准备统一插入数据库
-    def process_single_file(self, file_path, data_queue):
-        """
-        处理单个文件的逻辑，供线程池调用
-        只解析数据，存入线程安全队列，不直接插入数据库
-        :param file_path: 待处理文件路径
-        :param data_queue: 线程安全的队列，用于存储处理后的数据
-        :return: 是否处理成功（True/False）
-        """
-        try:
-            fp = Path(file_path)
-            # 快速检查：跳过空文件
-            if fp.stat().st_size == 0:
-                print(f"ℹ️ 跳过空文件：{file_path}")
-                return False
-
-            if self.test_data.is_file_processed(file_path):
-                print(f"⚠️ 文件已经被存储不可以再存储")
-                return False
-                
-            # 解析文件（原有逻辑不变）
-            df_single, processed_file_path = self.test_data.parse_file(fp)
-            
-            # 过滤空数据
-            if df_single.empty:
-                print(f"ℹ️ 文件 {file_path} 解析后为空，跳过")
-                return False
-                
-            # 将数据存入队列（线程安全）
-            data_queue.put( (df_single, processed_file_path) )
-            # print(f"✅ 成功解析文件：{file_path}（数据行数：{len(df_single)}）")
-            return True
-        except Exception as e:
-            print(f"❌ 处理文件 {file_path} 失败: {str(e)}")
-            return False
+                              f"处理完成！\n共扫描 {len(records_files_found)} 个文件，\n其中 {result['processed']} 个为新文件并已成功处理。")
+
+    #入库进程的批量导入完成
+    def on_backfill_finished(self, result):
+        self.pushButton_get_failcsv.setEnabled(True)
+        if "error" in result:
+            QMessageBox.critical(self.textEdit_logpath, "批量插入失败", f"数据库批量插入出错：\n{result['error']}")
+        elif not result["scanned"]:
+            QMessageBox.information(self, "提示", "未找到任何records.csv文件")
+        elif not result["unprocessed"]:
+            QMessageBox.information(self, "提示", "没有需要处理的新文件")
+        else:
+            self.update_table_fail()
+            QMessageBox.information(self, "成功",
+                                  f"处理完成！\n共扫描 {result['scanned']} 个文件，\n其中 {result['processed']} 个为新文件并已成功处理。")
+
+    def closeEvent(self, event):
+        # 与 headless.py 一致：先停止入库（等待正在入库的文件提交），再停止清理，最后写回WAL
+        if self.init_thread is not None:
+            self.init_thread.requestInterruption()
+            self.init_thread.wait()
+        if self.export_thread is not None:
+            self.export_thread.cancel_event.set()
+            self.export_thread.wait()
+        # 入库进程方式：通知入库进程提交正在入库的数据后退出
+        if self.ingest_thread is not None:
+            self.ingest_thread.stop()
+        if self.monitor_thread is not None:
+            self.monitor_thread.stop()
+        if self.retention_pruner is not None:
+            self.retention_pruner.stop()
+        if self.test_data is not None:
+            self.test_data.close()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == [INGEST_PROCESS_FLAG]:
+        sys.exit(ingest_main(sys.argv[2:]))  # 打包后入库进程也从可执行文件启动
     app = QApplication(sys.argv)
     window = failInfoWindow()
     window.show()
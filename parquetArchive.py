@@ -0,0 +1,204 @@
+from __future__ import annotations
+import os
+import json
+import glob
+import shutil
+import threading
+import importlib.util
+from typing import Iterable, Optional, Sequence, Tuple, Union
+
+from dataSQL import CONFIG_PATH
+from lazyImport import lazy_import
+
+pd = lazy_import("pandas")
+# 可选依赖：未安装 pyarrow 时不能使用 Parquet 归档（安装时也延迟到第一次归档/查询才导入）
+if importlib.util.find_spec("pyarrow") is not None:
+    pa = lazy_import("pyarrow")
+    ds = lazy_import("pyarrow.dataset")
+else:
+    pa = ds = None
+
+# 归档的列（与 test_records 一致，入库时间和会话一起保留）
+ARCHIVE_COLUMNS = ('id', 'slot_id', 'sn', 'test_time', 'test_item', 'test_value', 'test_usl', 'test_lsl',
+                   'test_result', 'file_path', 'file_md5', 'create_time', 'session_id')
+
+# query_test_data 返回的列
+QUERY_COLUMNS = ('sn', 'test_time', 'test_item', 'test_value')
+
+
+def _archive_schema():
+    # test_time 存为时间戳：按时间筛选时可以用行组的 min/max 统计跳过不相关的行组
+    return pa.schema([
+        ('id', pa.int64()),
+        ('slot_id', pa.string()),
+        ('sn', pa.string()),
+        ('test_time', pa.timestamp('s')),
+        ('test_item', pa.string()),
+        ('test_value', pa.string()),
+        ('test_usl', pa.string()),
+        ('test_lsl', pa.string()),
+        ('test_result', pa.string()),
+        ('file_path', pa.string()),
+        ('file_md5', pa.string()),
+        ('create_time', pa.string()),
+        ('session_id', pa.int64()),
+        # 分区列（hive 目录 day=YYYY-MM-DD）
+        ('day', pa.string()),
+    ])
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([('day', pa.string())]), flavor='hive')
+
+
+def _legacy_partitioning():
+    # 旧的归档目录 day=YYYY-MM-DD/test_item=...（每个测试项一个目录），打开归档时转换为按天一个目录
+    return ds.partitioning(pa.schema([('test_item', pa.string())]), flavor='hive')
+
+
+def open_archive(config_path: Optional[str] = CONFIG_PATH, read_only: bool = False):
+    """
+    按config.json的 archive_dir 打开 Parquet 归档（未配置或未安装 pyarrow 时返回None）
+    :param read_only: 只查询（不转换旧的目录结构，由写入归档的进程转换）
+    """
+    archive_dir = ""
+    if config_path and os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                archive_dir = json.load(f).get("archive_dir", "")
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 读取归档目录失败，不启用 Parquet 归档：{e}")
+    if not archive_dir:
+        return None
+    if pa is None:
+        print("⚠️ 已配置 archive_dir 但未安装 pyarrow，不启用 Parquet 归档（pip install pyarrow）")
+        return None
+    return ParquetArchive(os.path.expanduser(archive_dir), read_only=read_only)
+
+
+class ParquetArchive(object):
+    """
+    原始测试数据的 Parquet 列式归档（zstd 压缩，按 day 分区目录存放，每批数据每天一个文件）
+    - 归档：RetentionPruner 清理过期数据/分区前先写入归档
+    - 查询：只读取需要的列；时间范围先按分区目录裁剪，文件内按 test_item、test_time 排序，
+      测试项和时间条件再按行组的 min/max 统计跳过
+    测试项不作为目录：测试项有几千个时每批数据会产生几千个小文件，测试项中的 / \\ : 等字符也不适合作为目录名
+    """
+    def __init__(self, root_dir: str, row_group_size: int = 100000, read_only: bool = False):
+        if pa is None:
+            raise ImportError("Parquet 归档需要安装 pyarrow（pip install pyarrow）")
+        self.root_dir = root_dir
+        self.row_group_size = row_group_size
+        self.schema = _archive_schema()
+        self._dataset = None  # 归档文件列表缓存，写入后失效
+        self._lock = threading.Lock()
+        os.makedirs(self.root_dir, exist_ok=True)
+        if not read_only:
+            self._migrate_legacy_layout()
+
+    def _migrate_legacy_layout(self):
+        """把旧的 day=.../test_item=... 目录合并为每天一个文件（写入新文件后再删除旧目录，中途失败时下次打开重新转换）"""
+        for day_dir in sorted(glob.glob(os.path.join(self.root_dir, "day=*"))):
+            item_dirs = glob.glob(os.path.join(day_dir, "test_item=*"))
+            if not item_dirs:
+                continue
+            files = [os.path.join(dir_path, name) for item_dir in item_dirs
+                     for dir_path, _, names in os.walk(item_dir) for name in names if name.endswith(".parquet")]
+            if files:
+                table = ds.dataset(files, format='parquet', partitioning=_legacy_partitioning(),
+                                   partition_base_dir=day_dir).to_table()
+                df = table.to_pandas()
+                df['test_time'] = df['test_time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+                self.write_rows(list(df[list(ARCHIVE_COLUMNS)].itertuples(index=False, name=None)),
+                                name=f"legacy-{os.path.basename(day_dir)[4:]}")
+            for item_dir in item_dirs:
+                shutil.rmtree(item_dir)
+            print(f"🗂️ 已转换旧的归档目录：{day_dir}（{len(files)} 个文件）")
+
+    def write_rows(self, rows: Sequence[tuple], name: str) -> int:
+        """
+        写入一批行（字段顺序为 ARCHIVE_COLUMNS）
+        :param name: 文件名前缀，同名文件会被覆盖（同一批数据重复归档不会产生重复行）
+        :return: 写入的行数
+        """
+        if not rows:
+            return 0
+        df = pd.DataFrame(list(rows), columns=list(ARCHIVE_COLUMNS))
+        df['test_time'] = pd.to_datetime(df['test_time'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+        df['day'] = df['test_time'].dt.strftime('%Y-%m-%d').fillna('unknown')
+        for col in ('id', 'session_id'):
+            df[col] = df[col].astype('int64')
+        # 按测试项、时间排序后写入：同一测试项的行集中在少数行组中，按测试项/时间筛选时能跳过其他行组
+        df = df.sort_values(['day', 'test_item', 'test_time'], kind='stable')
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        with self._lock:
+            ds.write_dataset(
+                table, self.root_dir, format='parquet', partitioning=_partitioning(),
+                basename_template=f"{name}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore',
+                file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+                max_rows_per_group=self.row_group_size, min_rows_per_group=min(self.row_group_size, len(df)),
+                use_threads=False,
+            )
+            self._dataset = None
+        return len(df)
+
+    def _get_dataset(self):
+        with self._lock:
+            if self._dataset is None:
+                self._dataset = ds.dataset(self.root_dir, format='parquet', schema=self.schema,
+                                           partitioning=_partitioning())
+            return self._dataset
+
+    def query(
+        self,
+        sn: Optional[str] = None,
+        test_item: Union[str, Iterable[str], None] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        session_id: Optional[int] = None,
+        columns: Sequence[str] = QUERY_COLUMNS,
+        exclude_ids: Sequence[Tuple[int, Optional[int]]] = ()
+    ) -> pd.DataFrame:
+        """
+        查询归档数据（条件与 TestData.query_test_data 一致）
+        :param test_item: 单个测试项或测试项集合
+        :param columns: 只读取这些列
+        :param exclude_ids: 跳过这些 (起始id, 结束id/None) 区间的行（已归档但仍在数据库中的行，见 TestData.stored_id_ranges）
+        """
+        expr = None
+
+        def add(condition):
+            nonlocal expr
+            expr = condition if expr is None else expr & condition
+
+        if session_id is not None:
+            add(ds.field('session_id') == session_id)
+        if sn:
+            add(ds.field('sn') == sn)
+        if test_item:
+            items = [test_item] if isinstance(test_item, str) else list(test_item)
+            add(ds.field('test_item').isin(items))
+        # 时间范围：day 裁剪分区目录，test_time/test_item 按行组统计过滤
+        if start_time:
+            start = pd.Timestamp(start_time)
+            add(ds.field('day') >= start.strftime('%Y-%m-%d'))
+            add(ds.field('test_time') >= pa.scalar(start.to_pydatetime(), type=pa.timestamp('s')))
+        if end_time:
+            end = pd.Timestamp(end_time)
+            add(ds.field('day') <= end.strftime('%Y-%m-%d'))
+            add(ds.field('test_time') <= pa.scalar(end.to_pydatetime(), type=pa.timestamp('s')))
+        for low, high in exclude_ids:
+            stored = ds.field('id') >= low
+            if high is not None:
+                stored = stored & (ds.field('id') <= high)
+            add(~stored)
+        table = self._get_dataset().to_table(columns=list(columns), filter=expr)
+        return table.to_pandas()
+
+    def size(self) -> int:
+        """归档文件总大小（字节）"""
+        total = 0
+        for dir_path, _, file_names in os.walk(self.root_dir):
+            total += sum(os.path.getsize(os.path.join(dir_path, name)) for name in file_names)
+        return total
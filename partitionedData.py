@@ -0,0 +1,423 @@
+from __future__ import annotations
+import os
+import json
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from dataSQL import TestData, CONFIG_PATH
+from lazyImport import lazy_import
+from parquetArchive import open_archive
+from recordMode import load_record_mode, open_pass_archive
+from recordsParser import load_parser_engine
+
+pd = lazy_import("pandas")
+
+# 存储方式：single 为单个数据库文件；day/week 为按测试日期每天/每周一个分区文件
+STORAGE_MODES = ("single", "day", "week")
+
+# 分区的 id 区间：id = (分区开始日期 - ID_EPOCH).days * PARTITION_ID_STRIDE + 分区内序号
+# 各分区的 id 不重叠且随时间递增，游标分页/趋势图的 id 区间可以跨分区使用
+ID_EPOCH = date(2000, 1, 1)
+PARTITION_ID_STRIDE = 10 ** 9
+
+# 同一个连接最多同时 ATTACH 的分区数（SQLite 默认上限为10，保留余量）
+MAX_ATTACHED = 8
+
+
+def load_storage_mode(config_path: Optional[str] = CONFIG_PATH) -> str:
+    """从config.json读取 storage_mode（缺省或无效时为 single）"""
+    mode = "single"
+    if config_path and os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                mode = json.load(f).get("storage_mode", "single")
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 读取存储方式失败，使用单文件存储：{e}")
+    if mode not in STORAGE_MODES:
+        print(f"⚠️ 未知的存储方式：{mode}（可选 {'/'.join(STORAGE_MODES)}），使用单文件存储")
+        mode = "single"
+    return mode
+
+
+def open_test_data(db_path, config_path: Optional[str] = CONFIG_PATH, read_only: bool = False) -> TestData:
+    """
+    按配置的存储方式创建数据库实例（配置了 archive_dir 时同时打开 Parquet 归档，按 parser_engine 选择解析引擎，
+    按 record_mode 选择入库方式，fail_only 方式下配置了 pass_archive_dir 时PASS行写入压缩归档）
+    :param read_only: 只读实例（入库进程方式下的界面进程）：不建表/迁移，不转换旧的归档目录，不打开PASS归档
+    """
+    mode = load_storage_mode(config_path)
+    if mode == "single":
+        test_data = TestData(db_path, read_only=read_only)
+    else:
+        test_data = PartitionedTestData(db_path, partition=mode, read_only=read_only)
+    test_data.archive = open_archive(config_path, read_only=read_only)
+    test_data.parser_engine = load_parser_engine(config_path)
+    test_data.record_mode = load_record_mode(config_path)
+    if test_data.record_mode == "fail_only" and not read_only:
+        test_data.pass_archive = open_pass_archive(config_path)
+    return test_data
+
+
+def parse_day(time_str) -> Optional[date]:
+    """从测试时间（YYYY-MM-DD HH:MM:SS，也兼容 C 格式）取出日期，无法解析时返回None"""
+    try:
+        return datetime.strptime(str(time_str).strip().split(' ')[0], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+class PartitionedTestData(TestData):
+    """
+    按测试日期分区存储：每天/每周一个 SQLite 文件，只保存 test_records
+    主数据库（DB_PATH）保存会话、签名、搜索词、统计等其他表，以及分区目录 partitions 和已入库文件清单 partition_files
+    - 入库：按测试时间写入对应分区（入库事务中临时 ATTACH）
+    - 查询：只读取与时间范围重叠的分区（逐个 ATTACH 到查询连接）
+    - 清理：删除过期分区的文件，不需要逐行 DELETE/VACUUM
+    主数据库中原有的 test_records（切换存储方式前的数据、测试时间无法解析的数据）继续作为最早的一个分区参与查询
+    入库清单：写入分区的文件在主数据库和分区文件中各有一条清单（同一个事务），WAL 模式下多个文件的提交只在
+    各自文件内是原子的，崩溃后两边可能不一致，启动时由 _reconcile_partitions 撤销只提交了一半的文件
+    """
+    FILE_INDEX_TABLES = ("test_records", "partition_files", "unit_summaries")
+
+    def __init__(self, DB_PATH, partition: str = "day", partition_dir: Optional[str] = None, read_only: bool = False):
+        if partition not in ("day", "week"):
+            raise ValueError(f"不支持的分区方式：{partition}（可选 day/week）")
+        self.partition = partition
+        self.partition_dir = partition_dir or os.path.splitext(str(DB_PATH))[0] + "_partitions"
+        if not read_only:
+            os.makedirs(self.partition_dir, exist_ok=True)
+        super().__init__(DB_PATH, read_only=read_only)
+
+    def init_db(self):
+        super().init_db()
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            # 分区目录：每个分区一行
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS partitions (
+                key TEXT PRIMARY KEY,  -- 分区名（day: 20250618，week: w20250616 为该周周一）
+                start_day TEXT NOT NULL,  -- 分区第一天（YYYY-MM-DD）
+                end_day TEXT NOT NULL,  -- 分区最后一天（YYYY-MM-DD）
+                path TEXT NOT NULL,  -- 分区文件路径
+                id_base INTEGER NOT NULL  -- 分区内 id 从 id_base + 1 开始
+            )
+            ''')
+            # 已入库文件清单（判断文件是否已入库时不需要打开所有分区）
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS partition_files (
+                session_id INTEGER NOT NULL,
+                file_path TEXT NOT NULL,
+                file_md5 TEXT NOT NULL,
+                partition_key TEXT NOT NULL
+            )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_partition_files_path ON partition_files(session_id, file_path)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_partition_files_md5 ON partition_files(session_id, file_md5)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_partition_files_key ON partition_files(partition_key)')
+            # 主数据库清单中记录文件写入的分区（NULL：数据在主数据库中/没有写入测试数据/升级前已入库）
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(ingest_manifest)").fetchall()]
+            if 'partition_key' not in columns:
+                conn.execute("ALTER TABLE ingest_manifest ADD COLUMN partition_key TEXT")
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_ingest_manifest_partition ON ingest_manifest(partition_key)')
+            # 已删除的分区：目录记录已删除、文件还没删掉（其他连接还打开着文件时稍后重试）
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS dropped_partitions (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL
+            )
+            ''')
+            conn.commit()
+            self._reconcile_partitions(conn)
+            self._delete_dropped_files(conn)
+        finally:
+            conn.close()
+
+    def _reconcile_partitions(self, conn):
+        """
+        对比主数据库和每个分区的入库清单，撤销崩溃时只提交了一半的文件（之后重新导入即可）：
+        - 分区中有、主数据库中没有：删除分区中该文件的测试数据和清单
+        - 主数据库中有、分区中没有：删除主数据库中该文件的清单/产品汇总/fail签名/分区文件记录
+        BEGIN IMMEDIATE 等待其他进程正在提交的入库事务完成后再对比
+        """
+        repaired = 0
+        for key, path in conn.execute("SELECT key, path FROM partitions").fetchall():
+            if not os.path.exists(path):
+                continue
+            self._attach(conn, key, path)
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                # 升级前创建的分区：补建清单，测试时间转为可排序格式
+                self._create_manifest_table(cursor, f"p_{key}")
+                self._migrate_test_time(cursor, f"p_{key}")
+                partial_rows = cursor.execute(f'''
+                    SELECT session_id, file_md5 FROM p_{key}.ingest_manifest
+                    EXCEPT SELECT session_id, file_md5 FROM main.ingest_manifest WHERE partition_key = ?
+                ''', (key,)).fetchall()
+                partial_units = cursor.execute(f'''
+                    SELECT m.session_id, m.file_md5, m.file_path FROM main.ingest_manifest m
+                    WHERE m.partition_key = ? AND NOT EXISTS (
+                        SELECT 1 FROM p_{key}.ingest_manifest p WHERE p.session_id = m.session_id AND p.file_md5 = m.file_md5)
+                ''', (key,)).fetchall()
+                for session_id, file_md5 in partial_rows:
+                    for table in ("test_records", "ingest_manifest"):
+                        cursor.execute(f"DELETE FROM p_{key}.{table} WHERE session_id = ? AND file_md5 = ?",
+                                       (session_id, file_md5))
+                for session_id, file_md5, file_path in partial_units:
+                    cursor.execute('''
+                        UPDATE fail_signatures SET unit_count = unit_count - 1
+                        WHERE signature IN (SELECT signature FROM unit_signatures WHERE session_id = ? AND file_path = ?)
+                    ''', (session_id, file_path))
+                    cursor.execute("DELETE FROM unit_signatures WHERE session_id = ? AND file_path = ?",
+                                   (session_id, file_path))
+                    for table in ("unit_summaries", "partition_files", "ingest_manifest"):
+                        cursor.execute(f"DELETE FROM main.{table} WHERE session_id = ? AND file_md5 = ?",
+                                       (session_id, file_md5))
+                if partial_rows or partial_units:
+                    self._bump_generation(cursor)
+                    repaired += len(partial_rows) + len(partial_units)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute(f"DETACH DATABASE p_{key}")
+        if repaired:
+            print(f"⚠️ 已撤销 {repaired} 个未完整入库的文件（崩溃时只提交了一半），重新导入即可")
+
+    def _partition_of(self, day: date):
+        """日期所在分区：(分区名, 第一天, 最后一天)"""
+        if self.partition == "week":
+            start = day - timedelta(days=day.weekday())
+            return f"w{start:%Y%m%d}", start, start + timedelta(days=6)
+        return f"{day:%Y%m%d}", day, day
+
+    def _ensure_partition(self, conn, day: date) -> str:
+        """确保日期所在分区的文件和目录记录存在，返回分区名"""
+        key, start, end = self._partition_of(day)
+        if conn.execute("SELECT 1 FROM partitions WHERE key = ?", (key,)).fetchone():
+            return key
+        # 同名分区刚被删除、旧文件还在：先删除旧文件，删不掉时本次不入库（旧数据不能重新出现在查询中）
+        if conn.execute("SELECT 1 FROM dropped_partitions WHERE key = ?", (key,)).fetchone():
+            self._delete_dropped_files(conn, key)
+            if conn.execute("SELECT 1 FROM dropped_partitions WHERE key = ?", (key,)).fetchone():
+                raise sqlite3.OperationalError(f"数据分区 {key} 已删除但文件还在使用中，请稍后重新导入")
+        path = os.path.join(self.partition_dir, f"records_{key}.db")
+        id_base = (start - ID_EPOCH).days * PARTITION_ID_STRIDE
+        part_conn = sqlite3.connect(path)
+        try:
+            cursor = part_conn.cursor()
+            cursor.execute("PRAGMA journal_mode = WAL")
+            self._create_records_table(cursor)
+            self._create_manifest_table(cursor)
+            # AUTOINCREMENT 从 id_base 开始分配
+            cursor.execute('''
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT 'test_records', ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'test_records')
+            ''', (id_base,))
+            part_conn.commit()
+        finally:
+            part_conn.close()
+        conn.execute("INSERT OR IGNORE INTO partitions (key, start_day, end_day, path, id_base) VALUES (?, ?, ?, ?, ?)",
+                     (key, start.isoformat(), end.isoformat(), path, id_base))
+        conn.commit()
+        print(f"🗂️ 已创建数据分区：{path}")
+        return key
+
+    @staticmethod
+    def _attach(conn, key: str, path: str) -> bool:
+        """ATTACH 分区（别名 p_分区名），已经 ATTACH 时不重复，返回本次是否新 ATTACH"""
+        alias = f"p_{key}"
+        if any(row[1] == alias for row in conn.execute("PRAGMA database_list").fetchall()):
+            return False
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+        return True
+
+    def _partition_key(self, test_time) -> Optional[str]:
+        """测试时间所在的分区名（测试时间无法解析的行写入主数据库，返回None）"""
+        day = parse_day(test_time)
+        return self._partition_of(day)[0] if day else None
+
+    def _prepare_insert(self, conn, data_tuples):
+        # ATTACH 不能在事务中执行，入库前先 ATTACH 本次用到的所有分区
+        for test_time in {row[2] for row in data_tuples}:
+            day = parse_day(test_time)
+            if day is None:
+                continue
+            key = self._ensure_partition(conn, day)
+            path = conn.execute("SELECT path FROM partitions WHERE key = ?", (key,)).fetchone()[0]
+            self._attach(conn, key, path)
+
+    def _claim_unit(self, cursor, stored_tuples, session_id, file_path, file_md5) -> bool:
+        # 清单同时写入数据所在的分区，分区中的测试数据和它的清单总是一起提交（一个文件的行都在同一个分区）
+        key = self._partition_key(stored_tuples[0][2]) if stored_tuples else None
+        if key is None:
+            return super()._claim_unit(cursor, stored_tuples, session_id, file_path, file_md5)
+        # ATTACH 之后分区被清理删除：不能再写入即将删除的文件（与 drop_partitions_before 在主数据库写锁上串行）
+        if not cursor.execute("SELECT 1 FROM main.partitions WHERE key = ?", (key,)).fetchone():
+            raise sqlite3.OperationalError(f"数据分区 {key} 已被清理删除，文件未入库")
+        cursor.execute('''
+            INSERT OR IGNORE INTO main.ingest_manifest (session_id, file_md5, file_path, partition_key) VALUES (?, ?, ?, ?)
+        ''', (session_id, file_md5, file_path, key))
+        if cursor.rowcount == 0:
+            return False
+        cursor.execute(f"INSERT OR IGNORE INTO p_{key}.ingest_manifest (session_id, file_md5, file_path) VALUES (?, ?, ?)",
+                       (session_id, file_md5, file_path))
+        return cursor.rowcount > 0
+
+    def _insert_rows(self, cursor, data_tuples, session_id):
+        partitions = {test_time: self._partition_key(test_time) for test_time in {row[2] for row in data_tuples}}
+        groups = {}
+        for row in data_tuples:
+            groups.setdefault(partitions[row[2]], []).append(row)
+        for key, rows in groups.items():
+            if key is None:
+                super()._insert_rows(cursor, rows, session_id)
+                continue
+            cursor.executemany(f'''
+                INSERT INTO p_{key}.test_records (slot_id, sn, test_time, test_item, test_value, test_usl, test_lsl, test_result, file_path, file_md5, session_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [row + (session_id,) for row in rows])
+            cursor.executemany('''
+                INSERT INTO partition_files (session_id, file_path, file_md5, partition_key) VALUES (?, ?, ?, ?)
+            ''', [(session_id, file_path, file_md5, key) for file_path, file_md5 in {(row[8], row[9]) for row in rows}])
+
+    def _commit_units(self, committed_units) -> int:
+        # 一次导入跨越很多天时，ATTACH 数量会超过上限：按分区分组，每 MAX_ATTACHED 个分区一个连接
+        groups = {}
+        for data_tuples in committed_units:
+            if data_tuples:
+                groups.setdefault(self._partition_key(data_tuples[0][2]), []).append(data_tuples)
+        keys = list(groups)
+        inserted = 0
+        for i in range(0, len(keys), MAX_ATTACHED):
+            inserted += super()._commit_units([units for key in keys[i:i + MAX_ATTACHED] for units in groups[key]])
+        return inserted
+
+    def record_sources(self, conn, start_time_str: str = "", end_time_str: str = "", descending: bool = False):
+        conditions = ["1=1"]
+        params = []
+        start_day, end_day = parse_day(start_time_str), parse_day(end_time_str)
+        if start_day:
+            conditions.append("end_day >= ?")
+            params.append(start_day.isoformat())
+        if end_day:
+            conditions.append("start_day <= ?")
+            params.append(end_day.isoformat())
+        partitions = conn.execute(f'''
+            SELECT key, path, id_base FROM partitions WHERE {' AND '.join(conditions)} ORDER BY id_base
+        ''', params).fetchall()
+        first_base = conn.execute("SELECT MIN(id_base) FROM partitions").fetchone()[0]
+
+        sources = [(None, None, 0, first_base)]  # 主数据库中的 test_records
+        sources += [(key, path, id_base + 1, id_base + PARTITION_ID_STRIDE) for key, path, id_base in partitions]
+        if descending:
+            sources.reverse()
+        for key, path, low, high in sources:
+            if key is None:
+                yield "main.test_records", low, high
+                continue
+            if not os.path.exists(path):
+                print(f"⚠️ 数据分区文件不存在，跳过：{path}")
+                continue
+            attached = self._attach(conn, key, path)
+            try:
+                yield f"p_{key}.test_records", low, high
+            finally:
+                if attached:
+                    conn.execute(f"DETACH DATABASE p_{key}")
+
+    def stored_id_ranges(self, conn) -> list:
+        # 主数据库中（分区存储之前入库）的行到现存的最大 id 为止；每个现存分区占一段 id 区间（相邻分区合并为一段）
+        ranges = []
+        main_max = conn.execute("SELECT MAX(id) FROM main.test_records").fetchone()[0]
+        if main_max is not None:
+            ranges.append((super().stored_id_ranges(conn)[0][0], main_max))
+        for (id_base,) in conn.execute("SELECT id_base FROM partitions ORDER BY id_base").fetchall():
+            if ranges and ranges[-1][1] == id_base:
+                ranges[-1] = (ranges[-1][0], id_base + PARTITION_ID_STRIDE)
+            else:
+                ranges.append((id_base + 1, id_base + PARTITION_ID_STRIDE))
+        return ranges
+
+    def list_partitions(self) -> pd.DataFrame:
+        """所有数据分区（按时间升序），含文件大小"""
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            df = pd.read_sql("SELECT key, start_day, end_day, path FROM partitions ORDER BY id_base", conn)
+        finally:
+            conn.close()
+        df['size'] = [os.path.getsize(path) if os.path.exists(path) else 0 for path in df['path']]
+        return df
+
+    def drop_partitions_before(self, day) -> dict:
+        """
+        删除最后一天早于 day 的所有分区（删除目录记录后删除文件）
+        其他线程/进程的连接可能还打开着分区文件：删除失败（Windows 上为 PermissionError）的文件记录在
+        dropped_partitions 中，下次清理或启动时重试
+        :param day: 日期（date 或 YYYY-MM-DD 字符串）
+        :return: {"partitions": 删除的分区数, "bytes": 删除的文件大小}
+        """
+        day = day if isinstance(day, date) else parse_day(day)
+        conn = sqlite3.connect(self.DB_PATH, timeout=30)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            partitions = conn.execute("SELECT key, path FROM partitions WHERE end_day < ?",
+                                      (day.isoformat(),)).fetchall()
+            if partitions:
+                keys = [(key,) for key, _ in partitions]
+                conn.executemany("DELETE FROM partitions WHERE key = ?", keys)
+                conn.executemany("DELETE FROM partition_files WHERE partition_key = ?", keys)
+                conn.executemany("INSERT OR REPLACE INTO dropped_partitions (key, path) VALUES (?, ?)", partitions)
+                self._bump_generation(conn)
+            conn.commit()
+
+            # 当前线程的查询连接可能还 ATTACH 着分区，先断开再删除文件
+            query_conn = getattr(self._query_local, "conn", None)
+            if query_conn is not None:
+                for key, _ in partitions:
+                    try:
+                        query_conn.execute(f"DETACH DATABASE p_{key}")
+                    except sqlite3.OperationalError:
+                        pass
+            reclaimed = self._delete_dropped_files(conn)
+        finally:
+            conn.close()
+        if partitions:
+            print(f"🗑️ 已删除 {len(partitions)} 个早于 {day} 的数据分区，释放 {reclaimed / 1024 / 1024:.1f} MB")
+        return {"partitions": len(partitions), "bytes": reclaimed}
+
+    def _delete_dropped_files(self, conn, key: Optional[str] = None) -> int:
+        """
+        删除已删除分区的文件（key 为None时为所有待删除的分区），成功后删除 dropped_partitions 中的记录
+        每个分区在主数据库写事务中确认记录还在再删除文件：同名分区已被重新创建时不会删除新文件
+        :return: 删除的文件大小
+        """
+        if key is None:
+            keys = [row[0] for row in conn.execute("SELECT key FROM dropped_partitions").fetchall()]
+        else:
+            keys = [key]
+        reclaimed = 0
+        for key in keys:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT path FROM dropped_partitions WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    continue
+                size = 0
+                try:
+                    for file_path in (row[0], row[0] + "-wal", row[0] + "-shm"):
+                        if os.path.exists(file_path):
+                            file_size = os.path.getsize(file_path)
+                            os.remove(file_path)
+                            size += file_size
+                except OSError as e:
+                    # 其他连接还打开着文件（Windows 上为 PermissionError），保留记录，下次重试
+                    print(f"⚠️ 数据分区文件正在使用，稍后重试删除：{row[0]}，错误：{str(e)}")
+                    continue
+                conn.execute("DELETE FROM dropped_partitions WHERE key = ?", (key,))
+                reclaimed += size
+            finally:
+                conn.commit()
+        return reclaimed
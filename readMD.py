@@ -4,8 +4,7 @@ import warnings
 # 屏蔽sip弃用警告（可选）
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# 必须导入的依赖
-import mistune
+# 必须导入的依赖（mistune 在渲染时才导入）
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTextBrowser, 
                              QVBoxLayout, QWidget)
 from PyQt6.QtCore import Qt, QUrl
@@ -50,6 +49,7 @@ class MDViewer(QMainWindow):
             return
         
         # 3. MD转HTML（mistune更稳定，原生支持表格/图片）
+        import mistune
         renderer = mistune.create_markdown(
             plugins=['table', 'strikethrough', 'url']  # 启用常用插件
         )
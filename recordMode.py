@@ -0,0 +1,130 @@
+import os
+import re
+import csv
+import gzip
+import json
+import threading
+from typing import Iterator, Optional, Sequence, Tuple
+
+from dataSQL import CONFIG_PATH, to_sortable_time
+
+# 入库方式：all 保存所有测试行；fail_only 只保存FAIL行，每个文件在 unit_summaries 中另有一行汇总（测试项数/fail数）
+RECORD_MODES = ("all", "fail_only")
+
+# PASS 归档文件的列（与 test_records 一致，不含 test_result）
+PASS_ARCHIVE_COLUMNS = ('slot_id', 'sn', 'test_time', 'test_item', 'test_value', 'test_usl', 'test_lsl',
+                        'file_path', 'file_md5', 'session_id')
+_DAY_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def load_record_mode(config_path: Optional[str] = CONFIG_PATH) -> str:
+    """从config.json读取 record_mode（缺省或无效时为 all）"""
+    mode = "all"
+    if config_path and os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                mode = json.load(f).get("record_mode", "all")
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 读取入库方式失败，保存所有测试数据：{e}")
+    if mode not in RECORD_MODES:
+        print(f"⚠️ 未知的入库方式：{mode}（可选 {'/'.join(RECORD_MODES)}），保存所有测试数据")
+        mode = "all"
+    return mode
+
+
+def open_pass_archive(config_path: Optional[str] = CONFIG_PATH):
+    """按config.json的 pass_archive_dir 打开 PASS 数据归档（未配置时返回None，fail_only 方式下 PASS 行直接丢弃）"""
+    archive_dir = ""
+    if config_path and os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                archive_dir = json.load(f).get("pass_archive_dir", "")
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 读取PASS归档目录失败，不归档PASS数据：{e}")
+    if not archive_dir:
+        return None
+    return PassArchive(os.path.expanduser(archive_dir))
+
+
+class PassArchive(object):
+    """
+    fail_only 入库方式下 PASS 测试行的压缩归档（不写数据库）
+    按测试日期每天一个 gzip 压缩的 CSV 文件（pass_YYYY-MM-DD.csv.gz，测试时间无法解析时为 pass_unknown.csv.gz），
+    每个文件的 PASS 行追加为一个 gzip 成员，gzip.open 读取时自动连接所有成员
+    """
+    def __init__(self, root_dir: str, compresslevel: int = 6):
+        self.root_dir = root_dir
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def path_of(self, day: str) -> str:
+        """某一天（YYYY-MM-DD，或 unknown）的归档文件路径"""
+        return os.path.join(self.root_dir, f"pass_{day}.csv.gz")
+
+    @staticmethod
+    def day_of(test_time) -> str:
+        """测试时间所在的日期（YYYY-MM-DD），无法解析（如“未知时间”）时为 unknown，与 Parquet 归档一致"""
+        day = to_sortable_time(test_time)[:10]
+        return day if _DAY_RE.fullmatch(day) else "unknown"
+
+    def write_rows(self, rows: Sequence[tuple], session_id: int) -> Optional[Tuple[str, int, int]]:
+        """
+        追加一个文件的 PASS 行
+        :param rows: 行元组（字段顺序与 test_records 插入顺序一致）
+        :return: (归档文件路径, 追加前的文件大小, 追加后的文件大小)，入库事务回滚时传给 discard 撤销本次追加；
+                 没有行时返回None
+        """
+        if not rows:
+            return None
+        day = self.day_of(rows[0][2])
+        with self._lock:
+            path = self.path_of(day)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            try:
+                with gzip.open(path, 'at', encoding='utf-8', newline='', compresslevel=self.compresslevel) as f:
+                    writer = csv.writer(f)
+                    if size == 0:
+                        writer.writerow(PASS_ARCHIVE_COLUMNS)
+                    writer.writerows(row[:7] + row[8:10] + (session_id,) for row in rows)
+            except OSError:
+                self._truncate(path, size)  # 写了一半的 gzip 成员会让整个文件无法读取
+                raise
+            return path, size, os.path.getsize(path)
+
+    def discard(self, path: str, size: int, end: int) -> bool:
+        """
+        撤销 write_rows 的追加（把归档文件截断到追加前的大小）
+        只撤销文件的最后一次追加：调用方在回滚入库事务之前调用（仍持有数据库写锁，其他入库不会在这之间追加）；
+        文件大小已不是追加后的大小（之后又有追加）时不截断，保留这次的行（重新入库后重复，不会丢失其他文件的行）
+        :return: 是否已撤销
+        """
+        with self._lock:
+            current = os.path.getsize(path) if os.path.exists(path) else None
+            if current != end:
+                print(f"⚠️ PASS归档在本次追加之后又有写入，不撤销本次追加（重新入库后会有重复行）：{path}")
+                return False
+            self._truncate(path, size)
+            return True
+
+    @staticmethod
+    def _truncate(path: str, size: int):
+        if not os.path.exists(path):
+            return
+        if size == 0:
+            os.remove(path)
+        else:
+            os.truncate(path, size)
+
+    def iter_rows(self, day: str) -> Iterator[dict]:
+        """按行读取某一天的归档（字段名为 PASS_ARCHIVE_COLUMNS，值均为字符串）"""
+        path = self.path_of(day)
+        if not os.path.exists(path):
+            return
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f)
+
+    def size(self) -> int:
+        """归档文件总大小（字节）"""
+        return sum(os.path.getsize(os.path.join(self.root_dir, name)) for name in os.listdir(self.root_dir)
+                   if name.endswith(".csv.gz"))
@@ -0,0 +1,214 @@
+"""
+records.csv 的纯 Python 解析引擎（csv 模块逐行读取，不导入 pandas）
+一次读取只保留入库需要的列，边读边提取SN、测试时间、通道号候选值，读完后按列推断类型并生成每行的入库字段
+
+字段值与 pandas 解析（TestData.parse_file + dataframe_tuples）的结果一致：
+- 列的类型按 pandas read_csv 的规则推断：全为整数且无空值 -> int，全为数字 -> float（空值为 nan），否则为字符串
+- 空值按 pandas 默认的 na_values 判断（''、'NA'、'N/A'、'null' 等）
+- 超出表头列数的行忽略多出的字段（与 read_csv 指定 usecols 时一致），不足的行补空值，空行跳过
+"""
+import io
+import os
+import re
+import csv
+import json
+import importlib.util
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from archiveMembers import read_member, split_member_path
+
+# 解析引擎：pandas 为 pd.read_csv 的 C 引擎，pyarrow 为 pyarrow.csv（未安装 pyarrow 时用 C 引擎），
+# python 为本模块
+PARSER_ENGINES = ("pandas", "pyarrow", "python")
+
+# records.csv 中入库需要的列（与 handleDF 校验的必要列一致）
+REQUIRED_COLUMNS = ('attributeName', 'attributeValue', "testName", "subTestName", "subSubTestName", "upperLimit",
+                    "measurementValue", "lowerLimit", "measurementUnits", 'startTime', "stopTime", 'status')
+
+# pandas read_csv 默认当作空值的字符串
+NA_VALUES = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                       '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+
+# pandas 能解析为数字的字符串（只接受ASCII数字，不接受下划线/十六进制）
+_FLOAT_RE = re.compile(r'\s*[+-]?(?:(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?|inf|infinity)\s*',
+                       re.IGNORECASE)
+_INT_RE = re.compile(r'\s*[+-]?[0-9]+\s*')
+
+NAN = float('nan')
+
+
+def load_parser_engine(config_path: Optional[str] = None) -> str:
+    """从config.json读取 parser_engine（缺省或无效时为 pandas）"""
+    engine = "pandas"
+    if config_path and os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                engine = json.load(f).get("parser_engine", "pandas")
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 读取解析引擎失败，使用 pandas 解析：{e}")
+    if engine not in PARSER_ENGINES:
+        print(f"⚠️ 未知的解析引擎：{engine}（可选 {'/'.join(PARSER_ENGINES)}），使用 pandas 解析")
+        engine = "pandas"
+    elif engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+        print("⚠️ 未安装 pyarrow，使用 pandas 的 C 引擎解析（pip install pyarrow）")
+        engine = "pandas"
+    return engine
+
+
+def _is_na(value) -> bool:
+    return value is None or value != value  # None 或 nan
+
+
+def _infer_column(values: List[Optional[str]]) -> list:
+    """
+    按 pandas 的类型推断转换一列（空值为None）
+    :return: 转换后的列表：int 列 / float 列（空值为nan）/ 字符串列（空值为None）
+    """
+    has_na = False
+    all_int = True
+    for value in values:
+        if value is None:
+            has_na = True
+        elif not _FLOAT_RE.fullmatch(value):
+            return values
+        elif all_int and not _INT_RE.fullmatch(value):
+            all_int = False
+    if all_int and not has_na:
+        return [int(value) for value in values]
+    return [NAN if value is None else float(value) for value in values]
+
+
+def _to_float(value: Optional[str], row_no: int) -> float:
+    """dtype=float 的列（measurementValue）：非数字时与 pandas 一样解析失败"""
+    if value is None:
+        return NAN
+    if not _FLOAT_RE.fullmatch(value):
+        raise ValueError(f"第 {row_no} 行 measurementValue 不是数字：{value!r}")
+    return float(value)
+
+
+def _text(value) -> str:
+    """dataframe_tuples 中空值替换为空字符串后再 str()：空值为空字符串"""
+    return "" if _is_na(value) else str(value)
+
+
+class ParsedRecords(object):
+    """
+    python 解析引擎的解析结果（替代 pandas 解析得到的 DataFrame，empty 属性含义相同）
+    sn / start_time / 通道号为整个文件的值，rows 为每行的 (测试项, 测试值, 上限, 下限, PASS/FAIL)
+    """
+    __slots__ = ('sn', 'start_time', 'rows', '_slot_values')
+
+    def __init__(self, sn="未知SN", start_time=None, rows=None, slot_values=None):
+        self.sn = sn
+        self.start_time = start_time  # 第一个非空的 startTime（原始字符串），没有时为None
+        self.rows: List[Tuple] = rows or []
+        self._slot_values: Dict = slot_values or {}  # subSubTestName -> 第一次出现时的 measurementValue
+
+    @property
+    def empty(self) -> bool:
+        return not self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def slot_id(self, slot_id_test_name: str):
+        """通道号：subSubTestName 为 slot_id_test_name 的第一行的测试值（与 handleDF 一致）"""
+        return self._slot_values.get(slot_id_test_name, "未知通道号")
+
+
+def parse_records_csv(file_path, data: Optional[bytes] = None) -> ParsedRecords:
+    """
+    解析 records.csv（失败时返回空结果，与 TestData.parse_file 一致）
+    :param file_path: 文件路径，压缩包成员为 "压缩包路径!/成员路径"
+    :param data: 已读取的文件内容，为None时按路径读取
+    """
+    # 压缩包成员路径保持原样（不转为 Path，Windows 上 Path 会把 "!/" 改为 "!\"）
+    try:
+        return _parse(file_path, data)
+    except Exception as e:
+        print(f"❌ 解析失败 {Path(file_path).name}：{str(e)}")
+        return ParsedRecords()
+
+
+def _open_text(file_path, data: Optional[bytes]):
+    # utf-8-sig：与 pandas 一样去掉文件开头的BOM
+    if data is None and split_member_path(file_path) is not None:
+        data = read_member(file_path)
+    if data is None:
+        return open(file_path, 'r', newline='', encoding='utf-8-sig')
+    return io.TextIOWrapper(io.BytesIO(data), newline='', encoding='utf-8-sig')
+
+
+def _parse(file_path, data: Optional[bytes] = None) -> ParsedRecords:
+    with _open_text(file_path, data) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return ParsedRecords()
+        missing_cols = [col for col in REQUIRED_COLUMNS if col not in header]
+        if missing_cols:
+            raise ValueError(f"缺失必要列：{missing_cols} → 需包含{list(REQUIRED_COLUMNS)}")
+        width = len(header)
+        indexes = [header.index(col) for col in ('attributeName', 'attributeValue', 'testName', 'subTestName',
+                                                 'subSubTestName', 'upperLimit', 'measurementValue',
+                                                 'lowerLimit', 'startTime', 'status')]
+
+        sn = None
+        start_time = None
+        columns = tuple([] for _ in indexes)
+        for row in reader:
+            if not row:
+                continue  # 空行
+            if len(row) < width:
+                row = row + [''] * (width - len(row))
+            values = [None if row[i] in NA_VALUES else row[i] for i in indexes]
+            for column, value in zip(columns, values):
+                column.append(value)
+            # SN：第一行 attributeName 为 PrimaryIdentity 的 attributeValue
+            if sn is None and values[0] == 'PrimaryIdentity':
+                sn = NAN if values[1] is None else values[1]
+            if start_time is None and values[8] is not None:
+                start_time = values[8]
+
+    (attribute_names, attribute_values, test_names, sub_test_names, sub_sub_test_names,
+     upper_limits, measurement_values, lower_limits, _, statuses) = columns
+    if not attribute_names:
+        return ParsedRecords()
+    # 推断类型的列（testName/attributeValue/status 在 pandas 解析时指定为字符串，不推断）
+    attribute_names = _infer_column(attribute_names)
+    sub_test_names = _infer_column(sub_test_names)
+    sub_sub_test_names = _infer_column(sub_sub_test_names)
+    upper_limits = _infer_column(upper_limits)
+    lower_limits = _infer_column(lower_limits)
+    measurement_values = [_to_float(value, row_no) for row_no, value in enumerate(measurement_values, 2)]
+
+    # 通道号候选值：每个 subSubTestName 第一次出现时的测试值（数字列不会等于配置的名称）
+    slot_values = {}
+    if sub_sub_test_names and isinstance(sub_sub_test_names[0], (str, type(None))):
+        for name, value in zip(sub_sub_test_names, measurement_values):
+            if name is not None and name not in slot_values:
+                slot_values[name] = value
+
+    rows = []
+    for attribute_name, attribute_value, test_name, sub_test_name, sub_sub_test_name, usl, value, lsl, status in zip(
+            attribute_names, attribute_values, test_names, sub_test_names, sub_sub_test_names,
+            upper_limits, measurement_values, lower_limits, statuses):
+        # 测试项：attributeName，为空时用 testName_subTestName_subSubTestName（testName 为空时为“未命名测试”）
+        attribute_name = _text(attribute_name)
+        if attribute_name != "":
+            test_item = attribute_name.strip()
+        else:
+            parts = (test_name if test_name is not None else '未命名测试', sub_test_name, sub_sub_test_name)
+            test_item = "_".join(part for part in (_text(p).strip() for p in parts) if part) or "未知测试名"
+        # 测试值：attributeValue，为空时用 measurementValue
+        test_value = _text(attribute_value).strip() or _text(value).strip()
+        rows.append((
+            test_item,
+            test_value,
+            '未知上限' if _is_na(usl) else usl,
+            '未知下限' if _is_na(lsl) else lsl,
+            'FAIL' if status is not None and status.upper() in ('FAIL', 'ERROR') else 'PASS',
+        ))
+    return ParsedRecords("未知SN" if sn is None else sn, start_time, rows, slot_values)
@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+from dataSQL import to_sortable_time
+from parquetArchive import ARCHIVE_COLUMNS
+from itemStats import to_float
+
+# 默认保留策略：config.json 中的 retention 可覆盖
+# raw_days 为原始测试数据（test_records）保留天数（按入库时间 create_time 计算），0 表示永久保留；
+# 删除前会先汇总到 daily_rollups（按天、测试项、会话），汇总数据永久保留
+# 每个fail产品的签名明细 unit_signatures 按测试时间同样只保留 raw_days 天（分组显示和fail明细的时间范围一致，
+# fail_signatures 中的累计次数保留）；以下表按文件/去重值记录，数据量远小于原始数据，永久保留：
+# - unit_summaries：每个文件一行，fail_only 入库方式下统计产品数/良率，也用于判断文件是否已入库
+# - ingest_manifest：入库清单，原始数据清理后重新扫描日志目录时，过期文件不会被重新入库
+# - search_terms：去重后的SN/测试项/文件路径（子串搜索的候选值，匹配到已清理的值时查询结果为空）
+DEFAULT_RETENTION = {
+    "raw_days": 0,
+    "interval_minutes": 60,  # 两次清理之间的间隔
+    "batch_size": 2000,  # 每个事务删除的行数（事务越小，入库等待写锁的时间越短）
+    "batch_pause": 0.05,  # 每批之间让出写锁的秒数
+    "vacuum_pages": 1000,  # 每次 incremental_vacuum 回收的页数
+    "archive_chunk": 200000,  # 配置了 archive_dir 时，每个 Parquet 归档文件的行数（过小会产生大量小文件）
+}
+
+
+# 汇总增量合并到 daily_rollups
+ROLLUP_UPSERT_SQL = '''
+    INSERT INTO daily_rollups (day, test_item, session_id, n, n_fail, n_value, value_sum, value_sum_sq,
+                               value_min, value_max)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(day, test_item, session_id) DO UPDATE SET
+        n = n + excluded.n,
+        n_fail = n_fail + excluded.n_fail,
+        n_value = n_value + excluded.n_value,
+        value_sum = value_sum + excluded.value_sum,
+        value_sum_sq = value_sum_sq + excluded.value_sum_sq,
+        value_min = MIN(COALESCE(value_min, excluded.value_min), COALESCE(excluded.value_min, value_min)),
+        value_max = MAX(COALESCE(value_max, excluded.value_max), COALESCE(excluded.value_max, value_max))
+'''
+
+
+def load_retention(config_path: Optional[str] = None) -> dict:
+    """从config.json读取 retention（缺省项使用 DEFAULT_RETENTION）"""
+    retention = dict(DEFAULT_RETENTION)
+    if config_path and os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                retention.update(json.load(f).get("retention", {}))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 读取数据保留策略失败，使用默认策略：{e}")
+    return retention
+
+
+def _rollup_rows(rows) -> list:
+    """
+    把一批待删除的行汇总为 daily_rollups 的增量
+    :param rows: [(test_time, test_item, session_id, test_value, test_result), ...]
+    :return: [(day, test_item, session_id, n, n_fail, n_value, value_sum, value_sum_sq, value_min, value_max), ...]
+    """
+    groups = {}
+    for test_time, test_item, session_id, test_value, test_result in rows:
+        key = (to_sortable_time(test_time)[:10], test_item, session_id)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = [0, 0, 0, 0.0, 0.0, None, None]
+        group[0] += 1
+        if test_result == 'FAIL':
+            group[1] += 1
+        value = to_float(test_value)
+        if value is not None:
+            group[2] += 1
+            group[3] += value
+            group[4] += value * value
+            group[5] = value if group[5] is None else min(group[5], value)
+            group[6] = value if group[6] is None else max(group[6], value)
+    return [key + tuple(group) for key, group in groups.items()]
+
+
+class RetentionPruner(object):
+    """
+    后台清理过期的原始测试数据
+    - 分区存储时按测试日期删除整个过期分区文件
+    - 单文件存储按 id 顺序小批量删除（入库时间越早 id 越小，不需要额外的 create_time 索引），每批一个短事务
+    - 删除前汇总到 daily_rollups，长期趋势不受原始数据清理影响
+    - 数据库配置了 Parquet 归档（test_data.archive）时，删除前先写入归档，归档成功的行才会删除；
+      每归档一块立即删除，归档后、删除前的行查询时只从数据库返回（TestData.stored_id_ranges）
+    - 数据库为 auto_vacuum=INCREMENTAL 时，删除后分批 incremental_vacuum，真正缩小文件
+    """
+    def __init__(self, test_data, raw_days: float = 0, interval_minutes: float = 60, batch_size: int = 2000,
+                 batch_pause: float = 0.05, vacuum_pages: int = 1000, archive_chunk: int = 200000):
+        self.test_data = test_data
+        self.raw_days = raw_days
+        self.interval = interval_minutes * 60
+        self.batch_size = int(batch_size)
+        self.batch_pause = batch_pause
+        self.vacuum_pages = int(vacuum_pages)
+        self.archive_chunk = int(archive_chunk)
+        self.listeners: List[Callable[[dict], None]] = []
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_listener(self, callback: Callable[[dict], None]):
+        """注册清理结果回调（每次清理完成后调用，参数为 run_once 的返回值），回调在清理线程中执行"""
+        self.listeners.append(callback)
+
+    def start(self):
+        """启动后台清理线程（raw_days 为0时不启动）"""
+        if self.raw_days <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="RetentionPruner", daemon=True)
+        self._thread.start()
+        print(f"🧹 已启动数据清理：原始数据保留 {self.raw_days} 天，每 {self.interval / 60:g} 分钟检查一次")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                report = self.run_once()
+            except sqlite3.Error as db_err:
+                print(f"❌ 数据清理失败：{str(db_err)}")
+            else:
+                for callback in self.listeners:
+                    try:
+                        callback(report)
+                    except Exception as e:
+                        print(f"❌ 数据清理回调执行失败：{str(e)}")
+            self._stop_event.wait(self.interval)
+
+    def run_once(self) -> dict:
+        """
+        执行一次清理
+        :return: {"rows": 删除的行数, "rollups": 写入/更新的汇总行数, "bytes": 回收的字节数, "seconds": 耗时}
+        """
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.test_data.DB_PATH, timeout=30)
+        try:
+            # 入库时间 create_time 是 UTC（CURRENT_TIMESTAMP），测试时间和分区日期是测试机的本地时间：
+            # 按入库时间清理时用 UTC 的截止时间，按测试时间/分区日期清理时用本地时间的截止时间
+            utc_cutoff, local_cutoff = conn.execute("SELECT datetime('now', ?), datetime('now', 'localtime', ?)",
+                                                    (f"-{self.raw_days} days",) * 2).fetchone()
+            if hasattr(self.test_data, "drop_partitions_before"):
+                # 分区存储：按测试日期整体删除过期分区
+                cutoff, basis = local_cutoff, "测试"
+                deleted, rollups, reclaimed = self._prune_partitions(conn, cutoff[:10])
+            else:
+                cutoff, basis = utc_cutoff, "入库"
+                deleted, rollups = self._prune_archived(conn, cutoff)
+                reclaimed = self._vacuum(conn) if deleted else 0
+            self._prune_unit_signatures(conn, local_cutoff)
+        finally:
+            conn.close()
+        report = {"rows": deleted, "rollups": rollups, "bytes": reclaimed,
+                  "seconds": time.perf_counter() - start, "cutoff": cutoff}
+        if deleted:
+            print(f"🧹 数据清理完成：删除 {deleted} 行（{basis}早于 {cutoff}），汇总 {rollups} 行，"
+                  f"回收 {reclaimed / 1024 / 1024:.1f} MB，耗时 {report['seconds']:.1f}s")
+        return report
+
+    def _prune_partitions(self, conn, cutoff_day):
+        """分区存储：过期分区（最后一天早于 cutoff_day，本地日期）汇总（和归档）后直接删除文件"""
+        deleted = rollups = 0
+        archive = self.test_data.archive
+        partitions = conn.execute("SELECT key, path FROM partitions WHERE end_day < ?", (cutoff_day,)).fetchall()
+        for key, path in partitions:
+            if self._stop_event.is_set():
+                return deleted, rollups, 0
+            part_conn = sqlite3.connect(path)
+            try:
+                cursor = part_conn.execute(f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM test_records ORDER BY id")
+                chunk_no = 0
+                while True:
+                    rows = cursor.fetchmany(self.archive_chunk)
+                    if not rows:
+                        break
+                    if archive is not None:
+                        # 文件名按分区和块序号固定，删除分区前中断时重新归档会覆盖同名文件
+                        archive.write_rows(rows, name=f"p{key}-{chunk_no}")
+                        chunk_no += 1
+                    rollup = _rollup_rows([(row[3], row[4], row[12], row[5], row[8]) for row in rows])
+                    conn.executemany(ROLLUP_UPSERT_SQL, rollup)
+                    conn.commit()
+                    deleted += len(rows)
+                    rollups += len(rollup)
+            finally:
+                part_conn.close()
+        reclaimed = self.test_data.drop_partitions_before(cutoff_day)["bytes"] if partitions else 0
+        return deleted, rollups, reclaimed
+
+    def _prune_archived(self, conn, cutoff):
+        """单文件存储：没有归档时直接删除；配置了 Parquet 归档时每归档一块就删除这一块（只删除已经归档的行）"""
+        if self.test_data.archive is None:
+            return self._prune(conn, cutoff)
+        deleted = rollups = 0
+        while not self._stop_event.is_set():
+            archived_id, more = self._archive_expired(conn, cutoff)
+            chunk_deleted, chunk_rollups = self._prune(conn, cutoff, archived_id)
+            deleted += chunk_deleted
+            rollups += chunk_rollups
+            if not more:
+                break
+        return deleted, rollups
+
+    def _archive_expired(self, conn, cutoff):
+        """
+        把下一块过期的行按 id 顺序写入 Parquet 归档（已归档到的 id 记录在 db_meta.archived_id，不会重复归档）
+        :return: (已归档的最大 id, 是否还有未归档的过期行)
+        """
+        conn.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('archived_id', 0)")
+        conn.commit()
+        archived_id = conn.execute("SELECT value FROM db_meta WHERE key = 'archived_id'").fetchone()[0]
+        rows = conn.execute(f'''
+            SELECT {', '.join(ARCHIVE_COLUMNS)} FROM (
+                SELECT * FROM test_records WHERE id > ? ORDER BY id LIMIT ?
+            ) WHERE create_time < ?
+        ''', (archived_id, self.archive_chunk, cutoff)).fetchall()
+        if not rows:
+            return archived_id, False
+        self.test_data.archive.write_rows(rows, name=f"ids{rows[0][0]}-{rows[-1][0]}")
+        archived_id = rows[-1][0]
+        conn.execute("UPDATE db_meta SET value = ? WHERE key = 'archived_id'", (archived_id,))
+        conn.commit()
+        return archived_id, len(rows) == self.archive_chunk
+
+    def _prune(self, conn, cutoff, max_id: Optional[int] = None):
+        deleted = rollups = 0
+        id_condition = "" if max_id is None else f"AND id <= {int(max_id)}"
+        while not self._stop_event.is_set():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 只看 id 最小的一批行：没有过期数据时也只读取一批，不会全表扫描
+                rows = conn.execute(f'''
+                    SELECT id, test_time, test_item, session_id, test_value, test_result FROM (
+                        SELECT * FROM test_records ORDER BY id LIMIT ?
+                    ) WHERE create_time < ? {id_condition}
+                ''', (self.batch_size, cutoff)).fetchall()
+                if not rows:
+                    conn.rollback()
+                    break
+                rollup = _rollup_rows([row[1:] for row in rows])
+                conn.executemany(ROLLUP_UPSERT_SQL, rollup)
+                # 本批都在 id 最小的若干行之内，按 id 区间删除即可
+                conn.execute("DELETE FROM test_records WHERE id BETWEEN ? AND ? AND create_time < ?",
+                             (rows[0][0], rows[-1][0], cutoff))
+                # 与删除在同一事务中更新 pruned_id：之前的行查询时从归档返回
+                conn.execute("UPDATE db_meta SET value = MAX(value, ?) WHERE key = 'pruned_id'", (rows[-1][0],))
+                conn.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'generation'")
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            deleted += len(rows)
+            rollups += len(rollup)
+            # 让出写锁，入库不会被长时间阻塞
+            time.sleep(self.batch_pause)
+        return deleted, rollups
+
+    def _prune_unit_signatures(self, conn, cutoff) -> int:
+        """
+        按测试时间分批删除过期的产品签名明细（fail_signatures 中的累计次数保留）
+        :param cutoff: 本地时间的截止时间（测试时间是测试机的本地时间）
+        """
+        deleted = 0
+        while not self._stop_event.is_set():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute('''
+                    DELETE FROM unit_signatures WHERE id IN (
+                        SELECT id FROM unit_signatures WHERE test_time < ? ORDER BY test_time LIMIT ?)
+                ''', (cutoff, self.batch_size))
+                if cursor.rowcount > 0:
+                    conn.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'generation'")
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            deleted += cursor.rowcount
+            if cursor.rowcount < self.batch_size:
+                break
+            time.sleep(self.batch_pause)
+        return deleted
+
+    def _vacuum(self, conn) -> int:
+        """分批 incremental_vacuum，返回回收的字节数（非 INCREMENTAL 的旧数据库只复用空闲页，不缩小文件）"""
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print("ℹ️ 数据库不是 auto_vacuum=INCREMENTAL（旧数据库需要执行一次 VACUUM 转换），空闲页留待复用")
+            return 0
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        while not self._stop_event.is_set() and conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+            conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})").fetchall()
+            time.sleep(self.batch_pause)
+        # WAL 模式下检查点之后文件才会真正变小
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return (page_count - conn.execute("PRAGMA page_count").fetchone()[0]) * page_size
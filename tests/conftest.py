@@ -0,0 +1,45 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RECORDS_HEADER = ("attributeName,attributeValue,testName,subTestName,subSubTestName,upperLimit,measurementValue,"
+                  "lowerLimit,measurementUnits,startTime,stopTime,status\n")
+
+
+def write_records(path, sn, start, values, slot_id=1, fail_items=()):
+    """
+    写一个 records.csv：第一行为 SN，第二行为通道号，之后每个测试项一行（上限2、下限0）
+    :param start: 测试开始时间（datetime）
+    :param values: {测试项: 测试值}
+    :param fail_items: 结果为 FAIL 的测试项
+    """
+    start_str = start.strftime("%Y-%m-%d %H:%M:%S.%f")
+    stop_str = (start + timedelta(seconds=30)).strftime("%Y-%m-%d %H:%M:%S.%f")
+    lines = [RECORDS_HEADER,
+             f"PrimaryIdentity,{sn},,,,,,,,{start_str},{stop_str},\n",
+             f",,Station,Info,ID,,{slot_id},,,{start_str},{stop_str},PASS\n"]
+    for item, value in values.items():
+        status = "FAIL" if item in fail_items else "PASS"
+        lines.append(f",,Connectivity,ShortTest,{item},2,{value},0,V,{start_str},{stop_str},{status}\n")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    return path
+
+
+@pytest.fixture
+def unit_files(tmp_path):
+    """3 天、每天 8 个产品的 records.csv（每个产品 5 个测试项，每 3 个产品中有 1 个 ITEM_1 FAIL）"""
+    paths = []
+    base = datetime(2025, 6, 8, 9, 5, 7)
+    for n in range(24):
+        start = base + timedelta(days=n // 8, minutes=n * 7)
+        values = {f"ITEM_{i}": f"{(n * 5 + i) % 17 / 10:.2f}" for i in range(5)}
+        fail_items = ("ITEM_1",) if n % 3 == 0 else ()
+        path = os.path.join(tmp_path, "logs", f"SN{n:03d}", "system", "records.csv")
+        paths.append(write_records(path, f"SN{n:03d}", start, values, slot_id=n % 4, fail_items=fail_items))
+    return paths
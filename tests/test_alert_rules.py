@@ -0,0 +1,114 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from alertRules import AlertEngine, ItemSnFailRule, SlotFailRule, SnConsecutiveFailRule, load_rules
+
+T0 = datetime(2025, 6, 18, 8, 0, 0)
+
+
+def unit(slot_id, sn, minutes, fail_items=()):
+    """一个records.csv入库提交的行元组（与 test_records 插入顺序一致）"""
+    test_time = (T0 + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S')
+    rows = [(slot_id, sn, test_time, "PASS_ITEM", 1.0, 2.0, 0.0, "PASS", f"/{sn}/records.csv", "md5")]
+    rows += [(slot_id, sn, test_time, item, 3.0, 2.0, 0.0, "FAIL", f"/{sn}/records.csv", "md5")
+             for item in fail_items]
+    return rows
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "alerts.log")
+
+
+def read_log(log_path):
+    with open(log_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_slot_fail_triggers_within_window(log_path):
+    engine = AlertEngine([SlotFailRule(count=3, window_minutes=10)], log_path=log_path)
+    assert engine.on_unit_committed(unit(1, "SN1", 0, ["A"])) == []
+    assert engine.on_unit_committed(unit(1, "SN2", 2)) == []  # PASS 不计数
+    assert engine.on_unit_committed(unit(2, "SN3", 3, ["A"])) == []  # 其他通道
+    assert engine.on_unit_committed(unit(1, "SN4", 5, ["A"])) == []
+    alerts = engine.on_unit_committed(unit(1, "SN5", 9, ["A"]))
+    assert [(a.rule, a.key) for a in alerts] == [("slot_fail", "1")]
+    assert "SN5" in alerts[0].message
+    # 触发后重新计数：紧接着的两次 fail 不再告警
+    assert engine.on_unit_committed(unit(1, "SN6", 10, ["A"])) == []
+    assert engine.on_unit_committed(unit(1, "SN7", 11, ["A"])) == []
+    assert len(engine.on_unit_committed(unit(1, "SN8", 12, ["A"]))) == 1
+
+
+def test_slot_fail_window_expires():
+    rule = SlotFailRule(count=3, window_minutes=10)
+    event = lambda minutes: T0 + timedelta(minutes=minutes)
+    assert rule.evaluate(1, "SN1", event(0), True, {"A"}) == []
+    assert rule.evaluate(1, "SN2", event(6), True, {"A"}) == []
+    # 最早的 fail 已在窗口外
+    assert rule.evaluate(1, "SN3", event(11), True, {"A"}) == []
+    # 环形缓冲只保留最近 3 次：6/11/15 在窗口内
+    assert len(rule.evaluate(1, "SN4", event(15), True, {"A"})) == 1
+    # 批量导入时不按时间顺序提交
+    rule = SlotFailRule(count=2, window_minutes=10)
+    assert rule.evaluate(1, "SN1", event(30), True, {"A"}) == []
+    assert len(rule.evaluate(1, "SN2", event(25), True, {"A"})) == 1
+
+
+def test_item_sn_fail_counts_distinct_sns():
+    rule = ItemSnFailRule(count=3, window_minutes=60)
+    event = lambda minutes: T0 + timedelta(minutes=minutes)
+    assert rule.evaluate(1, "SN1", event(0), True, {"A"}) == []
+    assert rule.evaluate(1, "SN1", event(1), True, {"A"}) == []  # 同一SN只算一次
+    assert rule.evaluate(1, "SN2", event(2), True, {"A", "B"}) == []
+    alerts = rule.evaluate(2, "SN3", event(3), True, {"A", "B"})
+    assert [(a.rule, a.key) for a in alerts] == [("item_sn_fail", "A")]
+    # B 只在 2 个SN上 fail；A 触发后重新计数
+    assert [a.key for a in rule.evaluate(2, "SN4", event(4), True, {"A", "B"})] == ["B"]
+
+
+def test_item_sn_fail_window_expires():
+    rule = ItemSnFailRule(count=2, window_minutes=60)
+    event = lambda minutes: T0 + timedelta(minutes=minutes)
+    assert rule.evaluate(1, "SN1", event(0), True, {"A"}) == []
+    assert rule.evaluate(1, "SN2", event(61), True, {"A"}) == []
+    assert len(rule.evaluate(1, "SN3", event(90), True, {"A"})) == 1
+
+
+def test_sn_consecutive_fail_resets_on_pass():
+    rule = SnConsecutiveFailRule(count=2)
+    assert rule.evaluate(1, "SN1", T0, True, {"A"}) == []
+    assert rule.evaluate(1, "SN1", T0, False, set()) == []  # PASS 中断连续 fail
+    assert rule.evaluate(1, "SN1", T0, True, {"A"}) == []
+    assert rule.evaluate(1, "SN2", T0, True, {"A"}) == []  # 其他SN不影响
+    alerts = rule.evaluate(2, "SN1", T0, True, {"B"})
+    assert [(a.rule, a.key) for a in alerts] == [("sn_consecutive_fail", "SN1")]
+    # 触发后重新计数
+    assert rule.evaluate(1, "SN1", T0, True, {"A"}) == []
+    assert len(rule.evaluate(1, "SN1", T0, True, {"A"})) == 1
+
+
+def test_engine_writes_alerts_log_and_notifies_listeners(log_path):
+    engine = AlertEngine(load_rules(), log_path=log_path)  # 默认规则
+    received = []
+    engine.add_listener(received.append)
+    engine.add_listener(lambda alert: 1 / 0)  # 回调失败不影响其他回调和入库
+    for n in range(5):
+        engine.on_unit_committed(unit(n % 2, f"SN{n}", n, ["ITEM_1"]))
+    engine.on_unit_committed(unit(0, "SN0", 6, ["ITEM_1"]))
+    assert engine.on_unit_committed([]) == []
+
+    rules = [alert.rule for alert in received]
+    assert rules == ["slot_fail", "item_sn_fail", "sn_consecutive_fail"]
+    assert list(engine.recent_alerts) == received
+    log = read_log(log_path)
+    assert [entry["rule"] for entry in log] == rules
+    assert log[1] == {**log[1], "key": "ITEM_1", "event_time": "2025-06-18 08:04:00"}
+
+    # 新的监控会话：清空滑动窗口，告警日志保留
+    engine.reset()
+    assert list(engine.recent_alerts) == []
+    assert engine.on_unit_committed(unit(0, "SN0", 7, ["ITEM_1"])) == []
+    assert len(read_log(log_path)) == 3
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataSQL
+from capability import CapabilityEngine
+from conftest import write_records
+from monitoringCSV import ingest_files
+
+ITEMS = ("ITEM_0", "ITEM_1", "ITEM_2")
+
+
+@pytest.fixture
+def test_data(tmp_path):
+    # 2 天，每天 3 个小时（子组），每小时 4 个产品
+    rng = np.random.default_rng(7)
+    paths = []
+    for n in range(24):
+        start = datetime(2025, 6, 18, 9) + timedelta(days=n // 12, hours=n % 12 // 4, minutes=n % 4 * 5)
+        values = {item: f"{rng.normal(1.0 + i * 0.2, 0.1 + 0.05 * (n % 3)):.4f}" for i, item in enumerate(ITEMS)}
+        paths.append(write_records(os.path.join(tmp_path, "logs", f"SN{n}", "records.csv"), f"SN{n}", start, values))
+    test_data = dataSQL.TestData(str(tmp_path / "test_data.db"))
+    ingest_files(test_data, paths)
+    conn = sqlite3.connect(test_data.DB_PATH)
+    # ITEM_1 只有上限，ITEM_2 只有下限
+    conn.execute("UPDATE test_records SET test_lsl = '未知下限' WHERE test_item LIKE '%ITEM_1'")
+    conn.execute("UPDATE test_records SET test_usl = '未知上限' WHERE test_item LIKE '%ITEM_2'")
+    conn.commit()
+    conn.close()
+    return test_data
+
+
+def reference(test_data, window):
+    """NumPy/pandas 逐组直接计算的参考值"""
+    conn = sqlite3.connect(test_data.DB_PATH)
+    df = pd.read_sql_query("SELECT test_item, test_time, test_value, test_usl, test_lsl FROM test_records", conn)
+    conn.close()
+    df["value"] = pd.to_numeric(df["test_value"], errors="coerce")
+    df = df[np.isfinite(df["value"])]
+    day = pd.to_datetime(df["test_time"].str.slice(0, 10))
+    if window == "week":
+        day = day - pd.to_timedelta(day.dt.weekday, unit="D")
+    df["window"] = day.dt.strftime("%Y-%m-%d")
+    df["hour"] = df["test_time"].str.slice(11, 13)
+    rows = []
+    for (item, window_name), group in df.groupby(["test_item", "window"]):
+        values = group["value"].to_numpy()
+        std_overall = values.std(ddof=1)
+        subgroups = [g.to_numpy() for _, g in group.groupby("hour")["value"]]
+        within_m2 = sum(((g - g.mean()) ** 2).sum() for g in subgroups)
+        std_within = np.sqrt(within_m2 / sum(len(g) - 1 for g in subgroups))
+        usl = pd.to_numeric(group["test_usl"].iloc[-1], errors="coerce")
+        lsl = pd.to_numeric(group["test_lsl"].iloc[-1], errors="coerce")
+        mean = values.mean()
+        cpk = [x for x in ((usl - mean) / (3 * std_within), (mean - lsl) / (3 * std_within)) if np.isfinite(x)]
+        ppk = [x for x in ((usl - mean) / (3 * std_overall), (mean - lsl) / (3 * std_overall)) if np.isfinite(x)]
+        rows.append({"test_item": item, "window": window_name, "n": len(values), "mean": mean,
+                     "std_within": std_within, "std_overall": std_overall, "usl": usl, "lsl": lsl,
+                     "cp": (usl - lsl) / (6 * std_within), "cpk": min(cpk) if cpk else np.nan,
+                     "pp": (usl - lsl) / (6 * std_overall), "ppk": min(ppk) if ppk else np.nan})
+    return pd.DataFrame(rows).sort_values(["test_item", "window"], ignore_index=True)
+
+
+@pytest.mark.parametrize("window", ["day", "week"])
+@pytest.mark.parametrize("chunk_size", [200000, 7])  # 7：分块 bincount 后按 Chan 公式合并
+def test_matches_reference(test_data, window, chunk_size):
+    result = CapabilityEngine(test_data, chunk_size=chunk_size).compute(window=window)
+    expected = reference(test_data, window)
+    assert set(expected["test_item"]) >= {f"Connectivity_ShortTest_{item}" for item in ITEMS}
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-9)
+
+
+def test_one_sided_limits(test_data):
+    result = CapabilityEngine(test_data).compute(window="week").set_index("test_item")
+    upper_only = result.loc["Connectivity_ShortTest_ITEM_1"]
+    lower_only = result.loc["Connectivity_ShortTest_ITEM_2"]
+    assert np.isnan(upper_only["cp"]) and np.isnan(upper_only["pp"])
+    assert upper_only["cpk"] == pytest.approx((2 - upper_only["mean"]) / (3 * upper_only["std_within"]))
+    assert upper_only["ppk"] == pytest.approx((2 - upper_only["mean"]) / (3 * upper_only["std_overall"]))
+    assert np.isnan(lower_only["cp"])
+    assert lower_only["ppk"] == pytest.approx(lower_only["mean"] / (3 * lower_only["std_overall"]))
+
+
+def test_cache_is_invalidated_by_generation(test_data, tmp_path, monkeypatch):
+    engine = CapabilityEngine(test_data)
+    first = engine.compute()
+    computed = []
+    compute = engine._compute
+    monkeypatch.setattr(engine, "_compute", lambda *args: computed.append(args) or compute(*args))
+
+    # 数据没有变化：返回缓存（副本，调用方改动不影响缓存）
+    cached = engine.compute()
+    cached.loc[0, "n"] = -1
+    pd.testing.assert_frame_equal(engine.compute(), first)
+    assert computed == []
+
+    # 新入库后版本号递增，重新计算
+    generation = test_data.get_generation()
+    path = write_records(os.path.join(tmp_path, "logs", "SN_new", "records.csv"), "SN_new",
+                         datetime(2025, 6, 18, 9, 30), {item: "1.5" for item in ITEMS})
+    ingest_files(test_data, [path])
+    assert test_data.get_generation() > generation
+    result = engine.compute().set_index(["test_item", "window"])
+    assert len(computed) == 1
+    assert result.loc[("Connectivity_ShortTest_ITEM_0", "2025-06-18"), "n"] == 13
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from downsample import MinMaxBucketer, lttb
+
+
+def brute_force(x, y, x_min, span, n_buckets):
+    """每个桶的 (最小值, 最大值)"""
+    buckets = np.clip(((x - x_min) / span * n_buckets).astype(np.int64), 0, n_buckets - 1)
+    return {b: (y[buckets == b].min(), y[buckets == b].max()) for b in np.unique(buckets)}
+
+
+def bucket_extremes(bucketer):
+    filled = np.flatnonzero(~np.isnan(bucketer.min_x))
+    return {b: (bucketer.min_y[b], bucketer.max_y[b]) for b in filled}
+
+
+@pytest.mark.parametrize("n_out", [3, 10, 500])
+def test_lttb_keeps_endpoints_and_size(n_out):
+    rng = np.random.default_rng(1)
+    x = np.sort(rng.uniform(0, 1000, 5000))
+    y = rng.normal(size=5000)
+    out_x, out_y = lttb(x, y, n_out)
+    assert len(out_x) == len(out_y) == n_out
+    assert (out_x[0], out_y[0]) == (x[0], y[0])
+    assert (out_x[-1], out_y[-1]) == (x[-1], y[-1])
+    # 选出的是原始点，横坐标保持升序
+    assert np.all(np.diff(out_x) > 0)
+    assert np.all(y[np.searchsorted(x, out_x)] == out_y)
+
+
+def test_lttb_keeps_spikes_and_small_inputs():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[437] = 50.0
+    out_x, out_y = lttb(x, y, 20)
+    assert 437.0 in out_x and out_y.max() == 50.0
+    # 点数不超过 n_out（或 n_out < 3）时原样返回
+    assert len(lttb(x[:5], y[:5], 10)[0]) == 5
+    assert len(lttb(x, y, 2)[0]) == 1000
+
+
+def test_min_max_bucketer_keeps_extremes_per_bucket():
+    rng = np.random.default_rng(2)
+    x = rng.uniform(0, 100, 20000)
+    y = rng.normal(size=20000)
+    bucketer = MinMaxBucketer(0, 100, 64)
+    for start in range(0, len(x), 3000):  # 分块加入
+        bucketer.add(x[start:start + 3000], y[start:start + 3000])
+    assert bucketer.count == len(x)
+    assert bucket_extremes(bucketer) == brute_force(x, y, 0, 100, 64)
+
+    out_x, out_y = bucketer.result()
+    assert len(out_x) == 2 * 64
+    assert np.all(np.diff(out_x) >= 0)
+    # 输出的都是原始点，包含全局最小值和最大值
+    assert set(zip(out_x, out_y)) <= set(zip(x, y))
+    assert out_y.min() == y.min() and out_y.max() == y.max()
+
+
+def test_min_max_bucketer_extend_matches_final_range():
+    rng = np.random.default_rng(3)
+    x = rng.uniform(0, 1000, 20000)
+    y = rng.normal(size=20000)
+    # 数据大致按时间入库：每块的范围逐步扩大，也有早于第一块的数据
+    x[:2000] = rng.uniform(400, 410, 2000)
+    bucketer = None
+    for start in range(0, len(x), 2000):
+        chunk_x, chunk_y = x[start:start + 2000], y[start:start + 2000]
+        if bucketer is None:
+            bucketer = MinMaxBucketer(chunk_x.min(), chunk_x.max(), 64)
+        bucketer.extend(chunk_x.min(), chunk_x.max())
+        bucketer.add(chunk_x, chunk_y)
+    assert bucketer.x_min <= x.min() and bucketer.x_min + bucketer.span >= x.max()
+    assert bucketer.span < 2 * (x.max() - x.min())  # 桶宽最多是按最终范围分桶的 2 倍
+    assert bucket_extremes(bucketer) == brute_force(x, y, bucketer.x_min, bucketer.span, 64)
+    assert bucketer.count == len(x)
+
+
+def test_trend_worker_reads_item_once_on_first_load(tmp_path, unit_files, monkeypatch):
+    pytest.importorskip("PyQt6")
+    import dataSQL
+    from monitoringCSV import ingest_files
+    from trendChart import TrendWorker
+
+    test_data = dataSQL.TestData(str(tmp_path / "test_data.db"))
+    ingest_files(test_data, unit_files)
+    scans = []
+    iter_item_values = test_data.iter_item_values
+    monkeypatch.setattr(test_data, "iter_item_values",
+                        lambda *args, **kwargs: scans.append(kwargs.get("id_ranges")) or iter_item_values(*args, **kwargs))
+
+    results = []
+    worker = TrendWorker(test_data, "Connectivity_ShortTest_ITEM_0", 1, n_points=10, chunk_size=5)
+    worker.result_signal.connect(results.append)
+    worker.run()
+    assert scans == [None]
+    first = results[-1]
+    assert first["count"] == 24 and len(first["zone_map"]) == 5
+    assert first["limits"] == (2.0, 0.0)
+
+    # 之后按分页索引读取（还原/缩放），与第一次读取的结果一致
+    worker = TrendWorker(test_data, "Connectivity_ShortTest_ITEM_0", 2, zone_map=first["zone_map"],
+                         limits=first["limits"], n_points=10, chunk_size=5)
+    worker.result_signal.connect(results.append)
+    worker.run()
+    assert scans[1] is not None
+    assert results[-1]["count"] == first["count"] and results[-1]["x_range"] == first["x_range"]
+    assert 0 < len(first["x"]) <= 10
@@ -0,0 +1,88 @@
+import csv
+import os
+import threading
+
+import pytest
+
+import dataSQL
+from exportData import EXPORT_COLUMNS, ExportCancelled, export_fail_data
+from monitoringCSV import ingest_files
+
+FILTERS = [{}, {"sn_filter": "SN00"}, {"test_item_exclude_str": "Connectivity_ShortTest_ITEM_1"},
+           {"start_time_str": "2025-06-09 00:00:00", "end_time_str": "2025-06-09 23:59:59"}]
+
+
+@pytest.fixture
+def test_data(tmp_path, unit_files):
+    test_data = dataSQL.TestData(str(tmp_path / "test_data.db"))
+    ingest_files(test_data, unit_files)
+    return test_data
+
+
+def expected_rows(test_data, filters):
+    """get_fail_data 的结果，转为与导出文件相同的文本"""
+    df = test_data.get_fail_data(**filters)
+    return sorted(tuple("" if value is None else str(value) for value in row)
+                  for row in df[list(EXPORT_COLUMNS)].itertuples(index=False))
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = tuple(next(reader))
+        return header, sorted(tuple(row) for row in reader)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_csv_rows_match_get_fail_data(test_data, tmp_path, filters):
+    path = str(tmp_path / "fail.csv")
+    progress = []
+    result = export_fail_data(test_data, path, filters=filters, chunk_size=3,
+                              progress=lambda done, total: progress.append((done, total)))
+    header, rows = read_csv(path)
+    assert header == EXPORT_COLUMNS
+    assert rows == expected_rows(test_data, filters)
+    assert result["rows"] == len(rows)
+    assert progress[0] == (0, len(rows)) and progress[-1] == (len(rows), len(rows))
+    assert not os.path.exists(path + ".part")
+
+
+def test_parquet_schema_and_rows(test_data, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    pa = pytest.importorskip("pyarrow")
+    path = str(tmp_path / "fail.parquet")
+    export_fail_data(test_data, path, chunk_size=3)
+    table = pq.read_table(path)
+    assert table.schema.names == list(EXPORT_COLUMNS)
+    assert all(field.type == pa.string() for field in table.schema)
+    assert pq.ParquetFile(path).metadata.num_row_groups == 3  # 每页一个行组（8 行，每页 3 行）
+    rows = sorted(tuple("" if value is None else value for value in row.values())
+                  for row in table.to_pylist())
+    assert rows == expected_rows(test_data, {})
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_cancel_removes_part_file(test_data, tmp_path, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"fail.{fmt}")
+    with open(path, "w") as f:
+        f.write("previous export")
+    cancel_event = threading.Event()
+
+    def progress(done, total):
+        if done:
+            assert os.path.exists(path + ".part")
+            cancel_event.set()  # 第一页写入后取消
+
+    with pytest.raises(ExportCancelled):
+        export_fail_data(test_data, path, chunk_size=3, progress=progress, cancel_event=cancel_event)
+    assert not os.path.exists(path + ".part")
+    # 取消时不覆盖已有的文件
+    with open(path) as f:
+        assert f.read() == "previous export"
+
+
+def test_unknown_format(test_data, tmp_path):
+    with pytest.raises(ValueError):
+        export_fail_data(test_data, str(tmp_path / "fail.xlsx"))
@@ -0,0 +1,94 @@
+import sqlite3
+
+import pytest
+
+import dataSQL
+from dataSQL import calculate_file_md5
+from monitoringCSV import ingest_files
+from partitionedData import PartitionedTestData
+
+ROWS_PER_UNIT = 7  # 每个 records.csv 的 SN、通道号和 5 个测试项
+
+
+def open_db(tmp_path, storage_mode):
+    db_path = str(tmp_path / "test_data.db")
+    return dataSQL.TestData(db_path) if storage_mode == "single" else PartitionedTestData(db_path, partition=storage_mode)
+
+
+def unit_counts(test_data):
+    """(测试数据行数, 产品汇总数, 入库清单数)"""
+    df = test_data.query_test_data()
+    conn = sqlite3.connect(test_data.DB_PATH)
+    try:
+        summaries = conn.execute("SELECT COUNT(*) FROM unit_summaries").fetchone()[0]
+        manifest = conn.execute("SELECT COUNT(*) FROM ingest_manifest").fetchone()[0]
+    finally:
+        conn.close()
+    return len(df), summaries, manifest
+
+
+@pytest.mark.parametrize("storage_mode", ["single", "day"])
+def test_reingest_is_idempotent(tmp_path, unit_files, storage_mode):
+    test_data = open_db(tmp_path, storage_mode)
+    assert ingest_files(test_data, unit_files)["processed"] == len(unit_files)
+    counts = unit_counts(test_data)
+    assert counts == (len(unit_files) * ROWS_PER_UNIT, len(unit_files), len(unit_files))
+
+    # 再次批量导入、单个文件入库、绕过预检查直接提交都不会重复入库
+    assert ingest_files(test_data, unit_files)["processed"] == 0
+    df, file_path = test_data.parse_file(unit_files[0])
+    assert test_data.insert_test_data(df, file_path) is False
+    units = [test_data.dataframe_tuples(df, fp, calculate_file_md5(fp), as_text=True)
+             for df, fp in map(test_data.parse_file, unit_files[:5])]
+    assert test_data._commit_units(units) == 0
+    assert unit_counts(test_data) == counts
+
+
+def test_new_session_allows_reingest(tmp_path, unit_files):
+    test_data = open_db(tmp_path, "day")
+    ingest_files(test_data, unit_files)
+    test_data.start_new_session()
+    assert ingest_files(test_data, unit_files)["processed"] == len(unit_files)
+    assert len(test_data.query_test_data()) == len(unit_files) * ROWS_PER_UNIT
+
+
+def test_reconcile_rows_without_main_commit(tmp_path, unit_files):
+    """崩溃时只有分区提交：重新打开时撤销分区中的数据，文件可以重新导入"""
+    test_data = open_db(tmp_path, "day")
+    ingest_files(test_data, unit_files)
+    conn = sqlite3.connect(test_data.DB_PATH)
+    session_id, file_md5 = conn.execute(
+        "SELECT session_id, file_md5 FROM ingest_manifest WHERE file_path = ?", (unit_files[3],)).fetchone()
+    for table in ("ingest_manifest", "unit_summaries", "partition_files"):
+        conn.execute(f"DELETE FROM {table} WHERE session_id = ? AND file_md5 = ?", (session_id, file_md5))
+    conn.execute("DELETE FROM unit_signatures WHERE file_path = ?", (unit_files[3],))
+    conn.commit()
+    conn.close()
+
+    test_data = open_db(tmp_path, "day")
+    assert len(test_data.query_test_data()) == (len(unit_files) - 1) * ROWS_PER_UNIT
+    assert ingest_files(test_data, unit_files)["processed"] == 1
+    assert unit_counts(test_data) == (len(unit_files) * ROWS_PER_UNIT, len(unit_files), len(unit_files))
+
+
+def test_reconcile_main_commit_without_rows(tmp_path, unit_files):
+    """崩溃时只有主数据库提交：重新打开时撤销主数据库中的记录，文件不会一直被清单挡住"""
+    test_data = open_db(tmp_path, "day")
+    ingest_files(test_data, unit_files)
+    conn = sqlite3.connect(test_data.DB_PATH)
+    session_id, file_md5, key = conn.execute(
+        "SELECT session_id, file_md5, partition_key FROM ingest_manifest WHERE file_path = ?", (unit_files[0],)).fetchone()
+    path = conn.execute("SELECT path FROM partitions WHERE key = ?", (key,)).fetchone()[0]
+    conn.close()
+    part_conn = sqlite3.connect(path)
+    for table in ("test_records", "ingest_manifest"):
+        part_conn.execute(f"DELETE FROM {table} WHERE session_id = ? AND file_md5 = ?", (session_id, file_md5))
+    part_conn.commit()
+    part_conn.close()
+
+    test_data = open_db(tmp_path, "day")
+    assert unit_counts(test_data) == ((len(unit_files) - 1) * ROWS_PER_UNIT, len(unit_files) - 1, len(unit_files) - 1)
+    assert ingest_files(test_data, unit_files)["processed"] == 1
+    assert unit_counts(test_data) == (len(unit_files) * ROWS_PER_UNIT, len(unit_files), len(unit_files))
+    groups = test_data.get_fail_signature_groups()
+    assert groups["unit_count"].sum() == sum(1 for n in range(len(unit_files)) if n % 3 == 0)
@@ -0,0 +1,25 @@
+import dataSQL
+from monitoringCSV import ingest_files
+
+ITEM = "Connectivity_ShortTest_ITEM_0"
+
+
+def item_counts(test_data):
+    return {row["test_item"]: row["count"] for row in test_data.item_stats.get_summary()}
+
+
+def test_session_reset_from_other_process_is_not_overwritten(tmp_path, unit_files):
+    db_path = str(tmp_path / "test_data.db")
+    ingesting = dataSQL.TestData(db_path)
+    ui = dataSQL.TestData(db_path)  # 界面进程：只读，不加载统计
+    assert ui.item_stats._session is None
+
+    ingest_files(ingesting, unit_files[:12])
+    assert item_counts(ui)[ITEM] == 12
+
+    ui.start_new_session()
+    ingest_files(ingesting, unit_files[12:])
+    # 入库进程在新会话的第一次更新前重新加载（已清空），旧会话的统计不会写回数据库
+    assert item_counts(ingesting)[ITEM] == 12
+    assert item_counts(ui)[ITEM] == 12
+    assert item_counts(dataSQL.TestData(db_path))[ITEM] == 12
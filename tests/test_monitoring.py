@@ -0,0 +1,84 @@
+import io
+import os
+import subprocess
+import sys
+import time
+import zipfile
+
+import pytest
+
+import dataSQL
+import monitoringCSV
+from monitoringCSV import BasicFileHandler
+
+
+@pytest.fixture
+def handler(tmp_path, monkeypatch):
+    monkeypatch.setattr(monitoringCSV, "ARCHIVE_SETTLE_SECONDS", 0.2)
+    monitor_dir = tmp_path / "monitor"
+    monitor_dir.mkdir()
+    handler = BasicFileHandler(lambda: None, lambda: None)
+    observer = handler.start(monitor_dir, dataSQL.TestData(str(tmp_path / "test_data.db")))
+    yield handler
+    observer.stop()
+    observer.join()
+
+
+def test_watchdog_is_imported_when_monitoring_starts(handler):
+    # 只做批量导入时不导入 watchdog
+    code = "import sys, monitoringCSV; print(any(m.startswith('watchdog') for m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(monitoringCSV.__file__))).stdout
+    assert output.split()[-1] == "False"
+    assert handler.observer.is_alive()
+
+
+def zip_bytes(unit_files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for n, path in enumerate(unit_files):
+            archive.write(path, f"unit{n}/system/records.csv")
+    return buffer.getvalue()
+
+
+def wait_processed(test_data, paths, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not test_data.get_unprocessed_files(paths):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_archive_written_in_place_is_ingested_when_complete(handler, unit_files):
+    data = zip_bytes(unit_files[:3])
+    path = handler.MONITOR_DIR / "units.zip"
+    members = [f"{path}!/unit{n}/system/records.csv" for n in range(3)]
+    with open(path, "wb") as f:
+        # 先写一半并停顿：读取失败后稍后重试，写完后的修改事件触发入库
+        f.write(data[:len(data) // 2])
+        f.flush()
+        time.sleep(1.0)
+        f.write(data[len(data) // 2:])
+    assert wait_processed(handler.TestData, members)
+    assert not handler._pending_archives
+
+
+def test_dot_prefixed_tar_members_are_ingested(tmp_path, unit_files):
+    # tar -C dir . 打包：成员名以 ./ 开头
+    import tarfile
+    from monitoringCSV import find_records_files, ingest_files
+
+    archive_path = tmp_path / "backfill" / "units.tar.gz"
+    archive_path.parent.mkdir()
+    with tarfile.open(archive_path, "w:gz") as archive:
+        for n, path in enumerate(unit_files[:2]):
+            archive.add(path, f"./unit{n}/system/records.csv")
+    test_data = dataSQL.TestData(str(tmp_path / "test_data.db"))
+    files = find_records_files(archive_path.parent)
+    assert sorted(files) == [f"{archive_path}!/unit{n}/system/records.csv" for n in range(2)]
+    assert ingest_files(test_data, files) == {"unprocessed": 2, "processed": 2}
+    assert len(test_data.query_test_data()) == 2 * 7
+    # 单个成员按路径读取（read_member）
+    df, file_path = test_data.parse_file(files[0])
+    assert not df.empty and file_path == files[0]
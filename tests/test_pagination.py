@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+import dataSQL
+from monitoringCSV import ingest_files
+from partitionedData import PartitionedTestData
+
+
+@pytest.fixture(params=["single", "day"])
+def test_data(request, tmp_path, unit_files):
+    db_path = str(tmp_path / "test_data.db")
+    if request.param == "single":
+        test_data = dataSQL.TestData(db_path)
+    else:
+        test_data = PartitionedTestData(db_path, partition=request.param)
+    ingest_files(test_data, unit_files)
+    return test_data
+
+
+def all_pages(fetch):
+    rows, cursor = [], None
+    while True:
+        page, cursor = fetch(cursor)
+        rows.extend(page)
+        if cursor is None:
+            return rows
+
+
+def test_test_data_pages_are_complete_and_ordered(test_data):
+    expected = test_data.query_test_data()
+    rows = all_pages(lambda cursor: test_data.query_test_data_page(page_size=5, cursor=cursor))
+    ids = [row[0] for row in rows]
+    assert len(ids) == len(set(ids)) == len(expected)
+    assert [row[2] for row in rows] == sorted(row[2] for row in rows)
+
+
+def test_fail_pages_are_complete_and_ordered(test_data):
+    expected = test_data.get_fail_data()
+    rows = all_pages(lambda cursor: test_data.get_fail_data_page(page_size=3, cursor=cursor))
+    time_index = dataSQL.FAIL_PAGE_COLUMNS.index('test_time')
+    assert len({row[0] for row in rows}) == len(rows) == len(expected) == 8
+    assert [row[time_index] for row in rows] == sorted((row[time_index] for row in rows), reverse=True)
+    assert test_data.count_fail_data() == len(rows)
+
+
+def test_time_filter_accepts_unpadded_input(test_data):
+    # 2025-6-9 这一天：按字符串比较时未补0的筛选时间也要得到同样的结果
+    padded = test_data.query_test_data(start_time="2025-06-09 00:00:00", end_time="2025-06-09 23:59:59")
+    unpadded = test_data.query_test_data(start_time="2025-6-9 00:00:00", end_time="2025-6-9 23:59:59")
+    assert len(padded) == len(unpadded) == 8 * 7
+
+
+def test_old_test_time_is_migrated(tmp_path, unit_files):
+    db_path = str(tmp_path / "test_data.db")
+    test_data = dataSQL.TestData(db_path)
+    ingest_files(test_data, unit_files)
+    conn = sqlite3.connect(db_path)
+    # 模拟升级前的数据库：C 格式时间（月/日不补0）
+    conn.execute("UPDATE test_records SET test_time = replace(replace(test_time, '-06-', '-6-'), '-6-0', '-6-')")
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    assert conn.execute("SELECT COUNT(*) FROM test_records WHERE test_time LIKE '2025-6-%'").fetchone()[0] > 0
+    conn.close()
+
+    test_data = dataSQL.TestData(db_path)
+    conn = sqlite3.connect(db_path)
+    times = [row[0] for row in conn.execute("SELECT DISTINCT test_time FROM test_records")]
+    conn.close()
+    assert all(time.startswith("2025-06-") for time in times)
+    rows = all_pages(lambda cursor: test_data.query_test_data_page(page_size=7, cursor=cursor))
+    assert len(rows) == len(unit_files) * 7
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from parquetArchive import ParquetArchive
+
+ITEMS = ["ITEM_0", "Connectivity/ShortTest", "C:\\temp:item", "测试项 1"]
+
+
+def make_rows(n, start_id=1):
+    """n 行，测试项轮流取 ITEMS，测试时间分布在 2025-06-18/19 两天"""
+    return [(start_id + i, str(i % 4), f"SN{i // 4:03d}", f"2025-06-{18 + i % 2} 08:{i // 60 % 60:02d}:{i % 60:02d}",
+             ITEMS[i % len(ITEMS)], f"{i / 10:.1f}", "2", "0", "PASS", f"/logs/{i // 4}/records.csv", f"md5_{i // 4}",
+             "2025-07-01 00:00:00", 1) for i in range(n)]
+
+
+def parquet_files(root):
+    return [os.path.join(dir_path, name) for dir_path, _, names in os.walk(root) for name in names]
+
+
+def test_one_file_per_day_per_batch(tmp_path):
+    archive = ParquetArchive(str(tmp_path / "archive"))
+    assert archive.write_rows(make_rows(400), name="ids1-400") == 400
+    files = parquet_files(archive.root_dir)
+    assert sorted(os.path.basename(os.path.dirname(path)) for path in files) == ["day=2025-06-18", "day=2025-06-19"]
+
+    assert len(archive.query()) == 400
+    for item in ITEMS:
+        df = archive.query(test_item=item)
+        assert len(df) == 100 and set(df["test_item"]) == {item}
+    assert len(archive.query(start_time="2025-06-19 00:00:00", end_time="2025-06-19 23:59:59")) == 200
+    assert len(archive.query(test_item=ITEMS[:2], end_time="2025-06-18 23:59:59")) == 100
+
+
+def test_rewriting_same_batch_does_not_duplicate(tmp_path):
+    archive = ParquetArchive(str(tmp_path / "archive"))
+    archive.write_rows(make_rows(100), name="ids1-100")
+    archive.write_rows(make_rows(100), name="ids1-100")
+    assert len(archive.query()) == 100
+
+
+def test_rows_sorted_by_test_item_within_file(tmp_path):
+    import pyarrow.parquet as pq
+    archive = ParquetArchive(str(tmp_path / "archive"), row_group_size=25)
+    archive.write_rows(make_rows(400), name="ids1-400")
+    for path in parquet_files(archive.root_dir):
+        metadata = pq.ParquetFile(path).metadata
+        column = metadata.schema.names.index("test_item")
+        ranges = [(metadata.row_group(i).column(column).statistics.min,
+                   metadata.row_group(i).column(column).statistics.max) for i in range(metadata.num_row_groups)]
+        # 每个行组只包含一个测试项（行组统计可以跳过其他测试项）
+        assert metadata.num_row_groups == 8 and all(low == high for low, high in ranges)
+
+
+def test_legacy_layout_is_converted(tmp_path):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pandas as pd
+    from parquetArchive import ARCHIVE_COLUMNS
+
+    # 旧的归档目录：day=.../test_item=...
+    root = str(tmp_path / "archive")
+    df = pd.DataFrame(make_rows(40), columns=list(ARCHIVE_COLUMNS))
+    df["test_time"] = pd.to_datetime(df["test_time"]).astype("datetime64[s]")
+    df["day"] = df["test_time"].dt.strftime("%Y-%m-%d")
+    legacy = ds.partitioning(pa.schema([("day", pa.string()), ("test_item", pa.string())]), flavor="hive")
+    ds.write_dataset(pa.Table.from_pandas(df, preserve_index=False), root, format="parquet", partitioning=legacy)
+    assert len(parquet_files(root)) == 4  # 每个测试项只出现在其中一天
+
+    archive = ParquetArchive(root)
+    assert len(parquet_files(root)) == 2
+    assert len(archive.query()) == 40
+    assert len(archive.query(test_item=ITEMS[1])) == 10
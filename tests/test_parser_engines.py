@@ -0,0 +1,70 @@
+import importlib.util
+import sqlite3
+
+import pytest
+
+import dataSQL
+from monitoringCSV import ingest_files
+from conftest import RECORDS_HEADER
+
+ENGINES = ["pandas", "pyarrow", "python"]
+
+# 解析差异容易出现的写法：整数/非数字上下限、空白、不同的时间格式、多余/缺少的列、空行、BOM
+EDGE_CASES = {
+    "basic": ("PrimaryIdentity,SN1,,,,,,,,2025-06-18 16:36:40.449000,2025-06-18 16:37:40.449000,\n"
+              ",,Station,Info,ID,,3,,,2025-06-18 16:36:40.449000,,PASS\n"
+              ",,T,S,I1,2,0.91,0,V,,,FAIL\n"
+              ",,T,S,I2,2, 1.5 ,0,V,,,error\n"),
+    "int_limits": "PrimaryIdentity,SN2,a,b,c,5,1,0,,2025-6-18 16:24:34,,\n,,T,S,ID,7,2,1,V,,,\n",
+    "text_limits": (",,T,S,ID,abc,4,N/A,V,Jun 18 2025 4:24:34.3390 PM,,PASS\n"
+                    "foo, bar ,,,x,1,,2,,,,Fail\n , ,  ,S,,1,NA,2,,,,\n"),
+    "bad_rows": ("PrimaryIdentity,SN3,,,,,,,,2025-06-18T16:36:40,,\n\n"
+                 ",,T,S,I1,2,1,0,V,,,PASS,extra\n,,T,S,I2,2,1\n,,T,1,2,3,4,5,6,7,8,9\n"),
+    "no_sn": ",,T,S,I1,2,1,0,V,,,PASS\n",
+    "text_value": ",,T,S,I1,2,abc,0,V,,,PASS\n",
+    "big_float": ",,T,S,I,1e400,1e-5,-0,,,,\n,,T,S,I,0.1,123456789012345678,.5,,,,\n",
+    "empty_slot": ",,T,S,ID,,,,,,,\n,,T,S,ID,,5,,,,,\n",
+}
+
+STORED_COLUMNS = "slot_id, sn, test_time, test_item, test_value, test_usl, test_lsl, test_result, file_path"
+
+
+@pytest.fixture
+def record_files(tmp_path, unit_files):
+    paths = list(unit_files)
+    for name, body in EDGE_CASES.items():
+        path = tmp_path / "edge" / name / "records.csv"
+        path.parent.mkdir(parents=True)
+        path.write_text(RECORDS_HEADER + body, encoding="utf-8")
+        paths.append(path)
+    bom = tmp_path / "edge" / "bom" / "records.csv"
+    bom.parent.mkdir(parents=True)
+    bom.write_text("﻿" + RECORDS_HEADER + "1,2,,3,4,5,6,7,,,,\n", encoding="utf-8")
+    return paths + [bom]
+
+
+def stored_rows(tmp_path, engine, record_files, batch):
+    if engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+        pytest.skip("pyarrow 未安装")
+    test_data = dataSQL.TestData(str(tmp_path / f"{engine}_{batch}.db"))
+    test_data.parser_engine = engine
+    if batch:
+        ingest_files(test_data, record_files, max_workers=2)
+    else:
+        for path in record_files:
+            df, file_path = test_data.parse_file(path)
+            if not df.empty:
+                test_data.insert_test_data(df, file_path)
+    conn = sqlite3.connect(test_data.DB_PATH)
+    try:
+        return sorted(conn.execute(f"SELECT {STORED_COLUMNS} FROM test_records").fetchall())
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("batch", [False, True], ids=["single", "batch"])
+@pytest.mark.parametrize("engine", ENGINES[1:])
+def test_engines_store_same_rows(tmp_path, record_files, engine, batch):
+    expected = stored_rows(tmp_path, "pandas", record_files, batch)
+    assert len(expected) > 24 * 7
+    assert stored_rows(tmp_path, engine, record_files, batch) == expected
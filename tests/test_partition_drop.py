@@ -0,0 +1,69 @@
+import os
+import sqlite3
+
+import pytest
+
+from dataSQL import calculate_file_md5
+from monitoringCSV import ingest_files
+from partitionedData import PartitionedTestData
+
+ROWS_PER_UNIT = 7
+
+
+@pytest.fixture
+def test_data(tmp_path, unit_files):
+    test_data = PartitionedTestData(str(tmp_path / "test_data.db"), partition="day")
+    ingest_files(test_data, unit_files[:16])  # 2025-06-08/09 两天
+    return test_data
+
+
+def dropped_keys(test_data):
+    conn = sqlite3.connect(test_data.DB_PATH)
+    try:
+        return [row[0] for row in conn.execute("SELECT key FROM dropped_partitions")]
+    finally:
+        conn.close()
+
+
+def test_files_in_use_are_deleted_later(test_data, monkeypatch):
+    path = test_data.list_partitions()["path"][0]
+    real_remove = os.remove
+
+    def remove(file_path):
+        if file_path == path:
+            raise PermissionError(13, "file is in use", file_path)
+        real_remove(file_path)
+
+    monkeypatch.setattr(os, "remove", remove)
+    assert test_data.drop_partitions_before("2025-06-09")["partitions"] == 1
+    # 目录记录已删除（查询不再读取），文件待删除
+    assert len(test_data.query_test_data()) == 8 * ROWS_PER_UNIT
+    assert dropped_keys(test_data) == ["20250608"] and os.path.exists(path)
+
+    monkeypatch.undo()
+    PartitionedTestData(test_data.DB_PATH, partition="day")  # 启动时重试
+    assert dropped_keys(test_data) == [] and not os.path.exists(path)
+
+
+def test_insert_into_dropped_partition_is_rejected(test_data, unit_files, tmp_path):
+    # 入库连接已经 ATTACH 了分区，提交前分区被清理删除
+    new_file = unit_files[0].replace("SN000", "SN900")
+    os.makedirs(os.path.dirname(new_file))
+    with open(unit_files[0], encoding="utf-8") as src, open(new_file, "w", encoding="utf-8") as dst:
+        dst.write(src.read().replace("SN000", "SN900"))
+    df, file_path = test_data.parse_file(new_file)
+    data_tuples = test_data.dataframe_tuples(df, file_path, calculate_file_md5(file_path), as_text=True)
+    conn = sqlite3.connect(test_data.DB_PATH)
+    try:
+        test_data._prepare_insert(conn, test_data._stored_rows(data_tuples))
+        test_data.drop_partitions_before("2025-06-09")
+        with pytest.raises(sqlite3.OperationalError):
+            test_data._insert_unit(conn, data_tuples, test_data.get_current_session(conn))
+        assert conn.execute("SELECT COUNT(*) FROM ingest_manifest WHERE file_path = ?", (file_path,)).fetchone()[0] == 0
+    finally:
+        conn.close()
+
+    # 之后入库时重新创建空的分区，已删除的数据不会重新出现
+    assert test_data.insert_test_data(df, file_path) is True
+    df = test_data.query_test_data(end_time="2025-06-08 23:59:59")
+    assert list(df["sn"].unique()) == ["SN900"]
@@ -0,0 +1,48 @@
+import os
+import sqlite3
+
+import pytest
+
+import dataSQL
+from monitoringCSV import ingest_files
+from partitionedData import PartitionedTestData
+
+
+def schema(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master").fetchall(), key=str)
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("partition", [None, "day"])
+def test_read_only_handle_does_no_ddl(tmp_path, partition):
+    db_path = str(tmp_path / "test_data.db")
+    if partition is None:
+        dataSQL.TestData(db_path, read_only=True)
+    else:
+        PartitionedTestData(db_path, partition=partition, read_only=True)
+        assert not os.path.exists(str(tmp_path / "test_data_partitions"))
+    # 入库进程还没有建表时，界面进程的只读实例不建表
+    assert schema(db_path) == []
+
+
+@pytest.mark.parametrize("partition", [None, "day"])
+def test_read_only_handle_reads_writer_data(tmp_path, unit_files, partition):
+    db_path = str(tmp_path / "test_data.db")
+    if partition is None:
+        writer = dataSQL.TestData(db_path)
+        reader = dataSQL.TestData(db_path, read_only=True)
+    else:
+        writer = PartitionedTestData(db_path, partition=partition)
+        reader = PartitionedTestData(db_path, partition=partition, read_only=True)
+    before = schema(db_path)
+    ingest_files(writer, unit_files)
+
+    assert len(reader.query_test_data()) == 24 * 7
+    assert len(reader.get_fail_data()) == len(writer.get_fail_data()) > 0
+    reader.close()
+    # 只读实例不改表结构
+    assert schema(db_path) == before
+    writer.close()
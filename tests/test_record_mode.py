@@ -0,0 +1,141 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import dataSQL
+from monitoringCSV import ingest_files
+from recordMode import PassArchive
+
+
+def open_db(tmp_path, name, record_mode, pass_archive_dir=None):
+    test_data = dataSQL.TestData(str(tmp_path / f"{name}.db"))
+    test_data.record_mode = record_mode
+    if pass_archive_dir is not None:
+        test_data.pass_archive = PassArchive(str(pass_archive_dir))
+    return test_data
+
+
+def archived_rows(pass_archive, days):
+    return [row for day in days for row in pass_archive.iter_rows(day)]
+
+
+def test_fail_only_matches_all_mode(tmp_path, unit_files):
+    all_data = open_db(tmp_path, "all", "all")
+    fail_only = open_db(tmp_path, "fail_only", "fail_only", tmp_path / "pass")
+    ingest_files(all_data, unit_files)
+    ingest_files(fail_only, unit_files)
+
+    expected, actual = all_data.get_fail_data(), fail_only.get_fail_data()
+    assert len(expected) == sum(1 for n in range(len(unit_files)) if n % 3 == 0)
+    pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True))
+    pages = [[row[1:] for row in test_data.get_fail_data_page(page_size=5)[0]] for test_data in (all_data, fail_only)]
+    assert pages[0] == pages[1]  # 除 id 外相同
+
+    # 数据库中只有FAIL行，其余行全部在PASS归档中
+    stored = len(fail_only.query_test_data())
+    days = ["2025-06-08", "2025-06-09", "2025-06-10"]
+    assert stored == len(expected)
+    assert stored + len(archived_rows(fail_only.pass_archive, days)) == len(all_data.query_test_data())
+
+
+def test_pass_archive_failure_rolls_back(tmp_path, unit_files, monkeypatch):
+    """PASS归档失败时整个文件不入库（清单中也没有），之后重新导入时PASS行不会丢失"""
+    fail_only = open_db(tmp_path, "fail_only", "fail_only", tmp_path / "pass")
+
+    def broken_write(rows, session_id):
+        raise OSError("disk full")
+    monkeypatch.setattr(fail_only.pass_archive, "write_rows", broken_write)
+    assert ingest_files(fail_only, unit_files[:4])["processed"] == 0
+    conn = sqlite3.connect(fail_only.DB_PATH)
+    assert conn.execute("SELECT COUNT(*) FROM ingest_manifest").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM unit_summaries").fetchone()[0] == 0
+    conn.close()
+
+    monkeypatch.undo()
+    assert ingest_files(fail_only, unit_files[:4])["processed"] == 4
+    assert len(archived_rows(fail_only.pass_archive, ["2025-06-08"])) == 4 * 7 - 2  # SN000/SN003 各有1个FAIL行
+
+
+ROW = ("1", "SN1", "2025-6-8 9:5:7", "ITEM_0", "0.1", "2", "0", "PASS", "a/records.csv", "md5")
+
+
+def test_discard_restores_archive(tmp_path):
+    pass_archive = PassArchive(str(tmp_path / "pass"))
+    first = pass_archive.write_rows([ROW], 1)
+    size = pass_archive.size()
+    second = pass_archive.write_rows([ROW, ROW], 1)
+    assert pass_archive.discard(*second)
+    assert pass_archive.size() == size
+    assert len(list(pass_archive.iter_rows("2025-06-08"))) == 1
+    assert pass_archive.discard(*first)
+    assert pass_archive.size() == 0
+
+
+def test_discard_only_undoes_the_last_append(tmp_path):
+    pass_archive = PassArchive(str(tmp_path / "pass"))
+    first = pass_archive.write_rows([ROW], 1)
+    pass_archive.write_rows([ROW[:1] + ("SN2",) + ROW[2:]], 1)
+    # 之后又有其他文件追加：不截断，其他文件的行保留
+    assert not pass_archive.discard(*first)
+    assert [row["sn"] for row in pass_archive.iter_rows("2025-06-08")] == ["SN1", "SN2"]
+
+
+def test_archive_is_discarded_before_rollback(tmp_path, unit_files, monkeypatch):
+    """提交失败时在回滚（释放写锁）之前撤销PASS归档，其他入库不会在这之间追加"""
+    fail_only = open_db(tmp_path, "fail_only", "fail_only", tmp_path / "pass")
+    ingest_files(fail_only, unit_files[:1])
+    size = fail_only.pass_archive.size()
+    real_connect = sqlite3.connect
+    write_rows, discard = fail_only.pass_archive.write_rows, fail_only.pass_archive.discard
+    archived, locked = [], []
+
+    class FailingCommitConnection(object):
+        """PASS行归档之后提交失败（如磁盘错误）的连接"""
+        def __init__(self, *args, **kwargs):
+            self._conn = real_connect(*args, **kwargs)
+
+        def __getattr__(self, name):
+            return getattr(self._conn, name)
+
+        def commit(self):
+            if archived:
+                raise sqlite3.OperationalError("disk I/O error")
+            self._conn.commit()
+
+    def check_discard(*token):
+        conn = real_connect(fail_only.DB_PATH, timeout=0)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.rollback()
+            locked.append(False)
+        except sqlite3.OperationalError:
+            locked.append(True)  # 写锁仍被入库事务持有
+        finally:
+            conn.close()
+        return discard(*token)
+
+    monkeypatch.setattr(sqlite3, "connect", FailingCommitConnection)
+    monkeypatch.setattr(fail_only.pass_archive, "write_rows", lambda *args: archived.append(1) or write_rows(*args))
+    monkeypatch.setattr(fail_only.pass_archive, "discard", check_discard)
+    assert ingest_files(fail_only, unit_files[1:2])["processed"] == 0
+    assert locked == [True]
+    assert fail_only.pass_archive.size() == size
+
+
+def test_unknown_test_time_goes_to_unknown_bucket(tmp_path):
+    pass_archive = PassArchive(str(tmp_path / "pass"))
+    path, _, _ = pass_archive.write_rows([ROW[:2] + ("未知时间",) + ROW[3:]], 1)
+    assert path == pass_archive.path_of("unknown") and path.endswith("pass_unknown.csv.gz")
+    assert [row["test_time"] for row in pass_archive.iter_rows("unknown")] == ["未知时间"]
+    assert PassArchive.day_of("2025-6-8 9:05:07") == "2025-06-08"
+
+
+@pytest.mark.parametrize("record_mode", ["all", "fail_only"])
+def test_unit_summaries_cover_every_file(tmp_path, unit_files, record_mode):
+    test_data = open_db(tmp_path, record_mode, record_mode)
+    ingest_files(test_data, unit_files)
+    conn = sqlite3.connect(test_data.DB_PATH)
+    results = dict(conn.execute("SELECT test_result, COUNT(*) FROM unit_summaries GROUP BY test_result").fetchall())
+    conn.close()
+    assert results == {"FAIL": 8, "PASS": 16}
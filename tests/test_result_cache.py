@@ -0,0 +1,65 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import dataSQL
+from conftest import write_records
+from monitoringCSV import ingest_files
+from retention import RetentionPruner
+
+FAIL_ROWS = 8  # conftest.unit_files 中 ITEM_1 FAIL 的产品数
+
+
+@pytest.fixture
+def test_data(tmp_path, unit_files):
+    test_data = dataSQL.TestData(str(tmp_path / "test_data.db"))
+    ingest_files(test_data, unit_files)
+    return test_data
+
+
+def assert_invalidated(test_data, change, expected_rows):
+    """change 递增数据版本号后，缓存的 get_fail_data 结果失效，重新查询"""
+    assert len(test_data.get_fail_data()) == FAIL_ROWS
+    assert len(test_data.get_fail_data()) == FAIL_ROWS
+    stats = test_data.cache_stats()
+    assert stats["hits"] >= 1
+
+    change()
+    assert test_data.get_generation() > stats["generation"]
+    assert len(test_data.get_fail_data()) == expected_rows
+    assert test_data.cache_stats()["misses"] == stats["misses"] + 1
+
+
+def test_commit_invalidates_cache(test_data, tmp_path):
+    path = write_records(os.path.join(tmp_path, "logs", "SN_new", "records.csv"), "SN_new",
+                         datetime(2025, 6, 10, 12), {"ITEM_0": "1.0", "ITEM_1": "3.0"}, fail_items=("ITEM_1",))
+    assert_invalidated(test_data, lambda: ingest_files(test_data, [path]), FAIL_ROWS + 1)
+
+
+def test_new_session_invalidates_cache(test_data):
+    assert_invalidated(test_data, test_data.start_new_session, 0)
+
+
+def test_prune_invalidates_cache(test_data):
+    conn = sqlite3.connect(test_data.DB_PATH)
+    conn.execute("UPDATE test_records SET create_time = '2025-06-10 00:00:00'")
+    conn.commit()
+    conn.close()
+    pruner = RetentionPruner(test_data, raw_days=30, batch_pause=0)
+    assert_invalidated(test_data, pruner.run_once, 0)
+
+
+def test_cached_result_is_not_shared(test_data):
+    first = test_data.get_fail_data()
+    second = test_data.get_fail_data()
+    assert test_data.cache_stats()["hits"] == 1
+    # 返回深拷贝：调用方原地修改不影响缓存和其他调用方
+    for column in first.columns:
+        assert not np.shares_memory(first[column].to_numpy(), second[column].to_numpy())
+    first.loc[first.index[0], "sn"] = "changed"
+    first.drop(columns=["test_item"], inplace=True)
+    third = test_data.get_fail_data()
+    assert "changed" not in set(third["sn"]) and "test_item" in third.columns
@@ -0,0 +1,128 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import dataSQL
+from monitoringCSV import ingest_files
+from parquetArchive import ParquetArchive
+from partitionedData import PartitionedTestData
+from retention import RetentionPruner
+
+ROWS = 24 * 7
+
+
+@pytest.fixture(params=["single", "day"])
+def test_data(request, tmp_path, unit_files):
+    db_path = str(tmp_path / "test_data.db")
+    if request.param == "single":
+        test_data = dataSQL.TestData(db_path)
+    else:
+        test_data = PartitionedTestData(db_path, partition=request.param)
+    ingest_files(test_data, unit_files)
+    # 入库时间改到很早以前：单文件存储按入库时间清理
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE test_records SET create_time = '2025-06-10 00:00:00'")
+    conn.commit()
+    conn.close()
+    test_data.archive = ParquetArchive(str(tmp_path / "archive"))
+    return test_data
+
+
+def assert_rows_once(test_data):
+    df = test_data.query_test_data()
+    # 每个产品的 SN 唯一，(SN, 测试项) 相同即为重复返回的行
+    assert len(df) == len(df.drop_duplicates(["sn", "test_item"])) == ROWS
+
+
+def count(test_data, table):
+    conn = sqlite3.connect(test_data.DB_PATH)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_archived_rows_are_returned_once(test_data, monkeypatch):
+    pruner = RetentionPruner(test_data, raw_days=30, batch_pause=0, archive_chunk=50)
+    # 已归档、还没有从数据库删除：只从数据库返回
+    conn = sqlite3.connect(test_data.DB_PATH)
+    try:
+        if isinstance(test_data, PartitionedTestData):
+            monkeypatch.setattr(test_data, "drop_partitions_before", lambda cutoff_day: {"bytes": 0})
+            pruner._prune_partitions(conn, "2025-07-01")
+            monkeypatch.undo()
+        else:
+            pruner._archive_expired(conn, "2025-07-01 00:00:00")
+    finally:
+        conn.close()
+    assert len(test_data.archive.query()) > 0
+    assert_rows_once(test_data)
+
+    report = pruner.run_once()
+    assert report["rows"] == ROWS
+    assert_rows_once(test_data)
+
+
+def test_single_mode_prunes_each_archived_chunk(tmp_path, unit_files):
+    test_data = dataSQL.TestData(str(tmp_path / "test_data.db"))
+    ingest_files(test_data, unit_files)
+    test_data.archive = ParquetArchive(str(tmp_path / "archive"))
+    pruner = RetentionPruner(test_data, raw_days=30, batch_pause=0, archive_chunk=50)
+    conn = sqlite3.connect(test_data.DB_PATH)
+    try:
+        conn.execute("UPDATE test_records SET create_time = '2025-06-10 00:00:00'")
+        conn.commit()
+        deleted, _ = pruner._prune_archived(conn, "2025-07-01 00:00:00")
+        pruned_id = conn.execute("SELECT value FROM db_meta WHERE key = 'pruned_id'").fetchone()[0]
+        archived_id = conn.execute("SELECT value FROM db_meta WHERE key = 'archived_id'").fetchone()[0]
+    finally:
+        conn.close()
+    assert deleted == ROWS and pruned_id == archived_id == ROWS
+    assert count(test_data, "test_records") == 0
+    assert_rows_once(test_data)
+
+
+def test_expired_unit_signatures_are_pruned(test_data):
+    assert count(test_data, "unit_signatures") == 8
+    RetentionPruner(test_data, raw_days=30, batch_pause=0).run_once()
+    assert count(test_data, "unit_signatures") == 0
+    # 累计次数和每个文件的汇总保留
+    assert count(test_data, "fail_signatures") > 0
+    assert count(test_data, "unit_summaries") == 24
+
+
+@pytest.fixture
+def local_utc_plus_14(monkeypatch):
+    """测试机本地时间比 UTC 快 14 小时"""
+    if not hasattr(time, "tzset"):
+        pytest.skip("time.tzset 只在 Unix 上可用")
+    monkeypatch.setenv("TZ", "UTC-14")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_test_time_cutoff_is_local_time(tmp_path, local_utc_plus_14):
+    test_data = PartitionedTestData(str(tmp_path / "test_data.db"), partition="day")
+    now = datetime.now()  # 本地时间
+    times = {"expired": now - timedelta(days=30, hours=1), "kept": now - timedelta(days=30) + timedelta(hours=1)}
+    conn = sqlite3.connect(test_data.DB_PATH)
+    conn.executemany("INSERT INTO unit_signatures (signature, slot_id, sn, test_time, file_path) VALUES (?, ?, ?, ?, ?)",
+                     [("sig", "1", sn, t.strftime("%Y-%m-%d %H:%M:%S"), f"/{sn}") for sn, t in times.items()])
+    conn.commit()
+    conn.close()
+
+    report = RetentionPruner(test_data, raw_days=30, batch_pause=0).run_once()
+    # UTC 的截止时间比本地时间早 14 小时，会把刚过期 1 小时的明细留下
+    cutoff = datetime.strptime(report["cutoff"], "%Y-%m-%d %H:%M:%S")
+    assert abs(cutoff - (now - timedelta(days=30))) < timedelta(minutes=1)
+    conn = sqlite3.connect(test_data.DB_PATH)
+    try:
+        assert [row[0] for row in conn.execute("SELECT sn FROM unit_signatures")] == ["kept"]
+    finally:
+        conn.close()
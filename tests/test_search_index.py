@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+import dataSQL
+from monitoringCSV import ingest_files
+
+KEYWORDS = [
+    ("sn", "SN00"), ("sn", "sn01"), ("sn", "N02"), ("sn", "1"), ("sn", "zzz"),
+    ("test_item", "ITEM_1"), ("test_item", "item_"), ("test_item", "_1"), ("test_item", "Short"),
+    ("test_item", "%"), ("file_path", "records"), ("file_path", "SN015/sys"), ("file_path", "/"),
+]
+FILTER_ARGS = {"sn": "sn_filter", "test_item": "test_item_filter", "file_path": "file_path_filter"}
+
+
+@pytest.fixture
+def test_data(tmp_path, unit_files):
+    test_data = dataSQL.TestData(str(tmp_path / "test_data.db"))
+    ingest_files(test_data, unit_files)
+    return test_data
+
+
+def like_terms(test_data, kind, keyword):
+    """原来的 LIKE '%x%' 直接在测试数据上匹配（% 和 _ 按字面匹配）"""
+    escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    conn = sqlite3.connect(test_data.DB_PATH)
+    try:
+        return {row[0] for row in conn.execute(
+            f"SELECT DISTINCT {kind} FROM test_records WHERE {kind} LIKE ? ESCAPE '\\'", (f"%{escaped}%",))}
+    finally:
+        conn.close()
+
+
+def like_fail_rows(test_data, kind, keyword):
+    conn = sqlite3.connect(test_data.DB_PATH)
+    try:
+        rows = conn.execute(f"SELECT sn, test_item, {kind} FROM test_records WHERE test_result = 'FAIL'").fetchall()
+    finally:
+        conn.close()
+    return sorted((sn, item) for sn, item, value in rows if keyword.lower() in value.lower())
+
+
+def fail_rows(test_data, kind, keyword):
+    df = test_data.get_fail_data(**{FILTER_ARGS[kind]: keyword})
+    return sorted(zip(df["sn"], df["test_item"]))
+
+
+def assert_parity(test_data):
+    for kind, keyword in KEYWORDS:
+        assert set(test_data.search_terms(kind, keyword)) == like_terms(test_data, kind, keyword), (kind, keyword)
+        assert fail_rows(test_data, kind, keyword) == like_fail_rows(test_data, kind, keyword), (kind, keyword)
+
+
+def test_trigram_search_matches_like(test_data):
+    if not test_data.fts_enabled:
+        pytest.skip("当前SQLite不支持FTS5 trigram")
+    # 至少3个字符的关键字走 trigram 索引，更短的（"1"/"_1"/"%"/"/"）走 search_terms 上的 LIKE
+    assert "search_terms_fts" in test_data._substring_subquery("sn", "SN00")[0]
+    assert "search_terms_fts" not in test_data._substring_subquery("sn", "_1")[0]
+    assert_parity(test_data)
+
+
+def test_like_fallback_matches_like(test_data):
+    test_data.fts_enabled = False  # 不支持 FTS5 trigram 的 SQLite
+    assert_parity(test_data)
+
+
+def test_existing_database_is_backfilled(test_data):
+    # 升级前的数据库：没有搜索索引
+    conn = sqlite3.connect(test_data.DB_PATH)
+    for name in ("search_terms_ai", "search_terms_ad"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute("DROP TABLE IF EXISTS search_terms_fts")
+    conn.execute("DROP TABLE search_terms")
+    conn.commit()
+    conn.close()
+
+    test_data = dataSQL.TestData(test_data.DB_PATH)
+    assert set(test_data.search_terms("sn", "SN")) == like_terms(test_data, "sn", "SN")
+    assert_parity(test_data)
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+from timestampNormalizer import TimestampNormalizer
+
+CASES = [
+    # A 格式
+    ("Jun 18 2025 4:24:34.3390 PM", "2025-6-18 16:24:34"),
+    ("Jun 18 2025 4:24:34.3390 下午", "2025-6-18 16:24:34"),
+    ("Jun 18 2025 12:05:00.1000 AM", "2025-6-18 00:05:00"),
+    ("Jun 18 2025 12:05:00.1000 PM", "2025-6-18 12:05:00"),
+    # B 格式
+    ("6月 18 2025 4:24:34.3390 上午", "2025-6-18 04:24:34"),
+    ("6月 18 2025 4:24:34.3390 PM", "2025-6-18 16:24:34"),
+    ("12月 1 2025 12:00:00.0 上午", "2025-12-1 00:00:00"),
+    # C 格式
+    ("2025-06-18 16:36:40.449000", "2025-6-18 16:36:40"),
+    ("2025-06-08 08:00:00", "2025-6-8 08:00:00"),
+    # 兜底格式和 ISO 8601
+    ("2025-6-18 16:36:40", "2025-6-18 16:36:40"),
+    ("2025-06-18T16:36:40", "2025-6-18 16:36:40"),
+    # 无法解析：返回原始字符串
+    ("not a time", "not a time"),
+]
+
+
+@pytest.mark.parametrize("time_str, expected", CASES)
+def test_normalize(time_str, expected):
+    assert TimestampNormalizer().normalize(time_str) == expected
+
+
+@pytest.mark.parametrize("time_str, expected", CASES)
+def test_normalize_series(time_str, expected):
+    series = pd.Series([time_str, None, time_str], index=[5, 6, 7])
+    result = TimestampNormalizer().normalize_series(series)
+    assert list(result.index) == [5, 6, 7]
+    assert result[5] == result[7] == expected
+    assert pd.isna(result[6])  # 空值保持不变
+
+
+def test_datetime_input():
+    normalizer = TimestampNormalizer()
+    assert normalizer.normalize(pd.Timestamp("2025-06-18 16:36:40.5")) == "2025-6-18 16:36:40"
+    series = pd.Series(pd.to_datetime(["2025-06-18 16:36:40", None]))
+    assert list(normalizer.normalize_series(series).fillna("NaT")) == ["2025-6-18 16:36:40", "NaT"]
+
+
+def spy_detect(monkeypatch):
+    calls = []
+    detect = TimestampNormalizer.detect_format
+
+    def spy(time_str, hint=None):
+        calls.append(hint)
+        return detect(time_str, hint)
+
+    monkeypatch.setattr(TimestampNormalizer, "detect_format", staticmethod(spy))
+    return calls
+
+
+def test_station_format_is_cached(monkeypatch):
+    normalizer = TimestampNormalizer()
+    calls = spy_detect(monkeypatch)
+    normalizer.normalize("Jun 18 2025 4:24:34.3390 PM", station="3")
+    assert normalizer.station_format("3") == "A"
+    assert normalizer.station_format("4") is None
+
+    # 同一站点的下一个时间先按缓存的格式检测（单个值和整列）
+    normalizer.normalize("Jun 19 2025 1:00:00.0 AM", station="3")
+    normalizer.normalize_series(pd.Series(["Jun 20 2025 1:00:00.0 AM"]), station="3")
+    assert calls == [None, "A", "A"]
+
+    # 同一个时间字符串不再检测
+    assert normalizer.normalize("Jun 19 2025 1:00:00.0 AM", station="3") == "2025-6-19 01:00:00"
+    assert len(calls) == 3
+
+
+def test_mixed_series_falls_back_per_value(monkeypatch):
+    normalizer = TimestampNormalizer()
+    calls = []
+    normalize = normalizer.normalize
+    monkeypatch.setattr(normalizer, "normalize", lambda value, station=None: calls.append(value) or
+                        normalize(value, station))
+    series = pd.Series(["2025-06-18 16:36:40.449000",
+                        "Jun 18 2025 4:24:34.3390 PM",
+                        "2025-06-18 16:36:40.449000",
+                        "6月 18 2025 4:24:34.3390 上午",
+                        "garbage"])
+    result = normalizer.normalize_series(series, station="1")
+    assert list(result) == ["2025-6-18 16:36:40", "2025-6-18 16:24:34", "2025-6-18 16:36:40",
+                            "2025-6-18 04:24:34", "garbage"]
+    # 第一个值为 C 格式：整列按 C 格式转换，只有其他格式的值逐个转换
+    assert calls == ["Jun 18 2025 4:24:34.3390 PM", "6月 18 2025 4:24:34.3390 上午", "garbage"]
@@ -0,0 +1,239 @@
+"""
+测试时间格式统一：把 A/B/C 三种时间格式转换为 C 格式（2025-6-18 16:24:34，月/日不补0，无毫秒）
+A 格式: Jun 18 2025 4:24:34.3390 PM（英文月份+12小时制+毫秒，也支持 上午/下午）
+B 格式: 6月 18 2025 4:24:34.3390 上午（中文月份+12小时制+毫秒，也支持 AM/PM）
+C 格式: 2025-06-18 16:36:40.449000（标准格式+毫秒）
+以及兜底的 YYYY-M-D HH:MM:SS 和 ISO 8601（如 2025-06-18T16:36:40）
+
+- 正则只编译一次；同一个站点（通道号）的文件格式相同，检测到的格式按站点缓存，下次先按该格式解析
+- 单个时间的转换结果按字符串缓存（同一个时间反复转换时不再解析）
+- normalize_series 对整列时间按检测到的格式用 pd.to_datetime(format=...) 向量化转换
+"""
+import re
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from lazyImport import lazy_import
+
+# 只有 normalize_series 需要 pandas/numpy
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+
+_C_RE = re.compile(r'^\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}(\.\d+)?$')
+_ENGLISH_MONTH_RE = re.compile(r'Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec')
+_FRACTION_RE = re.compile(r'\.\d+\s*')  # 毫秒部分（.后面的数字+可选空格）
+_CHINESE_MONTH_RE = re.compile(r'(?<=\d)月')  # 6月 -> 6
+_CHINESE_AMPM = (('上午', 'AM'), ('下午', 'PM'))
+_MISSING = object()
+
+# 格式名 -> pd.to_datetime / strptime 使用的格式（预处理后的字符串）
+FORMATS = {
+    'C': '%Y-%m-%d %H:%M:%S',
+    'A': '%b %d %Y %I:%M:%S %p',
+    'B': '%m %d %Y %I:%M:%S %p',
+    'fallback': '%Y-%m-%d %H:%M:%S',
+}
+
+
+def format_c(dt: datetime) -> str:
+    """datetime -> C 格式（不用 %-m：Windows 的 strftime 不支持）"""
+    return f"{dt.year}-{dt.month}-{dt.day} {dt:%H:%M:%S}"
+
+
+_HMS_TABLE = None  # 一天内的秒数 -> 'HH:MM:SS'
+
+
+def format_c_array(values):
+    """
+    datetime64[s] 数组 -> C 格式字符串数组（object，NaT 为None）
+    日期部分只格式化不同的日期，时间部分查表
+    """
+    global _HMS_TABLE
+    if _HMS_TABLE is None:
+        _HMS_TABLE = np.array([f"{h:02d}:{m:02d}:{s:02d}" for h in range(24) for m in range(60) for s in range(60)])
+    nat = np.isnat(values)
+    values = np.where(nat, np.datetime64(0, 's'), values)
+    days = values.astype('datetime64[D]')
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    dates = np.array([f"{d.year}-{d.month}-{d.day} " for d in unique_days.astype(object)])
+    seconds = (values - days).astype(np.int64)
+    result = np.char.add(dates[inverse], _HMS_TABLE[seconds]).astype(object)
+    result[nat] = None
+    return result
+
+
+def _replace_ampm(time_str: str) -> str:
+    for chinese, english in _CHINESE_AMPM:
+        time_str = time_str.replace(chinese, english)
+    return time_str
+
+
+def _prepare_a(time_str: str) -> str:
+    return _replace_ampm(_FRACTION_RE.sub(' ', time_str)).strip()
+
+
+def _prepare_b(time_str: str) -> str:
+    return _replace_ampm(_FRACTION_RE.sub(' ', _CHINESE_MONTH_RE.sub('', time_str))).strip()
+
+
+def _prepare_c(time_str: str) -> str:
+    return time_str.split('.')[0]
+
+
+# 预处理后的常见写法直接按正则分组构造 datetime（比 strptime 快），其他写法仍交给 strptime
+_FAST_C_RE = re.compile(r'([0-9]{4})-([0-9]{2})-([0-9]{2})\s+([0-9]{2}):([0-9]{2}):([0-9]{2})')
+_FAST_12H_RE = re.compile(r'([A-Za-z]{3}|[0-9]{1,2}) ([0-9]{1,2}) ([0-9]{4}) ([0-9]{1,2}):([0-9]{2}):([0-9]{2}) ([AaPp][Mm])')
+_MONTH_NUMBERS = {name: i for i, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+
+
+def _parse(prepared: str, fmt: str) -> datetime:
+    """按格式解析预处理后的字符串（不合法时抛 ValueError，与 strptime 一致）"""
+    if fmt in ('C', 'fallback'):
+        match = _FAST_C_RE.fullmatch(prepared)
+        if match:
+            return datetime(*map(int, match.groups()))
+    else:
+        match = _FAST_12H_RE.fullmatch(prepared)
+        if match:
+            month, day, year, hour, minute, second, ampm = match.groups()
+            month = _MONTH_NUMBERS.get(month.lower()) if fmt == 'A' else int(month)
+            hour = int(hour)
+            if month is not None and 1 <= hour <= 12:
+                hour = hour % 12 + (12 if ampm.upper() == 'PM' else 0)
+                return datetime(int(year), month, int(day), hour, int(minute), int(second))
+    return datetime.strptime(prepared, FORMATS[fmt])
+
+
+# 格式名 -> (是否为该格式, 预处理)；按检测顺序排列
+_DETECTORS: Dict[str, Tuple[Callable[[str], bool], Callable[[str], str]]] = {
+    'C': (lambda s: _C_RE.match(s) is not None, _prepare_c),
+    'A': (lambda s: _ENGLISH_MONTH_RE.search(s) is not None, _prepare_a),
+    'B': (lambda s: '月' in s and any(ampm in s for ampm in ('上午', '下午', 'AM', 'PM')), _prepare_b),
+}
+
+
+class TimestampNormalizer(object):
+    """
+    时间格式统一（线程安全）
+    用法：
+        normalizer = TimestampNormalizer()
+        normalizer.normalize("Jun 18 2025 4:24:34.3390 PM", station="3")   # '2025-6-18 16:24:34'
+        normalizer.normalize_series(df['startTime'], station="3")
+    """
+    def __init__(self, cache_size: int = 65536):
+        self.cache_size = cache_size
+        self._station_formats: Dict[object, str] = {}  # 站点 -> 检测到的格式名
+        self._results: Dict[str, Optional[str]] = {}  # 时间字符串 -> 转换结果（None 表示解析失败）
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def detect_format(time_str: str, hint: Optional[str] = None) -> Optional[str]:
+        """
+        检测时间字符串的格式（A/B/C），不属于这三种时返回None
+        :param hint: 优先尝试的格式（站点缓存的格式）
+        """
+        if hint is not None and _DETECTORS[hint][0](time_str):
+            return hint
+        for name, (matches, _) in _DETECTORS.items():
+            if matches(time_str):
+                return name
+        return None
+
+    def station_format(self, station) -> Optional[str]:
+        """站点已缓存的格式名"""
+        if station is None:
+            return None
+        with self._lock:
+            return self._station_formats.get(station)
+
+    def _remember(self, station, fmt: Optional[str]):
+        if station is not None and fmt is not None:
+            with self._lock:
+                self._station_formats[station] = fmt
+
+    def normalize(self, time_input, station=None) -> str:
+        """
+        转换单个时间
+        :param time_input: 字符串/datetime（包括 pandas.Timestamp）
+        :param station: 站点（通道号），先按该站点缓存的格式检测
+        :return: C 格式时间字符串；无法解析时返回原始字符串
+        """
+        if isinstance(time_input, datetime):  # pandas.Timestamp 是 datetime 的子类
+            return format_c(time_input)
+        time_str = str(time_input).strip()
+        result = self._results.get(time_str, _MISSING)
+        if result is _MISSING:
+            hint = self.station_format(station)
+            fmt = self.detect_format(time_str, hint)
+            result = self._convert(time_str, fmt)
+            if result is not None and fmt != hint:
+                self._remember(station, fmt)
+            if len(self._results) >= self.cache_size:
+                self._results.clear()
+            self._results[time_str] = result
+        return str(time_input) if result is None else result
+
+    @staticmethod
+    def _convert(time_str: str, fmt: Optional[str]) -> Optional[str]:
+        """
+        按检测到的格式转换，不属于 A/B/C 时依次尝试兜底格式和 ISO 8601
+        :return: C 格式时间字符串；属于 A/B/C 但解析失败时返回None（调用方返回原始输入）
+        """
+        if fmt is not None:
+            try:
+                return format_c(_parse(_DETECTORS[fmt][1](time_str), fmt))
+            except ValueError as e:
+                print(f"时间格式转换错误: {e}")
+                return None
+        # 所有格式不匹配时，尝试直接解析为datetime（兜底）
+        try:
+            return format_c(_parse(time_str.split('.')[0], 'fallback'))
+        except ValueError:
+            pass
+        # ISO 8601（如 2025-06-18T16:36:40）
+        try:
+            return format_c(datetime.fromisoformat(time_str))
+        except ValueError:
+            print(f"格式不匹配，返回原始字符串：{time_str}")
+            return time_str
+
+    def normalize_series(self, series, station=None):
+        """
+        向量化转换一列时间（pd.Series，字符串或 datetime64）
+        相同的时间只转换一次；按站点缓存的格式（没有时按第一个非空值检测）整列 pd.to_datetime(format=...)，
+        解析失败的值再逐个转换
+        :return: C 格式字符串的 Series（空值保持不变）
+        """
+        codes, uniques = pd.factorize(series)  # 空值的 code 为 -1
+        if len(uniques) == 0:
+            return series.copy()
+        uniques = pd.Series(uniques)
+        if pd.api.types.is_datetime64_any_dtype(uniques):
+            converted = format_c_array(uniques.to_numpy(dtype='datetime64[s]'))
+        else:
+            hint = self.station_format(station)
+            fmt = self.detect_format(str(uniques.iloc[0]).strip(), hint)
+            if fmt is None:
+                converted = np.array([self.normalize(v, station) for v in uniques], dtype=object)
+            else:
+                if fmt != hint:
+                    self._remember(station, fmt)
+                text = uniques.astype(str).str.strip()
+                if fmt == 'C':
+                    text = text.str.split('.', n=1).str[0]
+                else:
+                    if fmt == 'B':
+                        text = text.str.replace(_CHINESE_MONTH_RE.pattern, '', regex=True)
+                    text = text.str.replace(_FRACTION_RE.pattern, ' ', regex=True)
+                    for chinese, english in _CHINESE_AMPM:
+                        text = text.str.replace(chinese, english, regex=False)
+                    text = text.str.strip()
+                parsed = pd.to_datetime(text, format=FORMATS[fmt], errors='coerce').to_numpy(dtype='datetime64[s]')
+                converted = format_c_array(parsed)
+                # 与检测到的格式不同（或不合法）的值逐个转换
+                for i in np.flatnonzero(np.isnat(parsed)):
+                    converted[i] = self.normalize(uniques.iloc[i], station)
+        result = pd.Series(converted.take(codes), index=series.index, dtype=object)
+        return result.where(codes != -1, series)
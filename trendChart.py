@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QWidget
+from PyQt6.QtCore import Qt, QThread, QPointF, QRectF, pyqtSignal
+from PyQt6.QtGui import QPainter, QPen, QColor, QPolygonF
+
+from downsample import lttb, MinMaxBucketer
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_value_chunk(rows):
+    """
+    把一页 (id, test_time, test_value, test_usl, test_lsl) 转为数组
+    :return: ids, x（时间戳秒）, y（测试值），只保留时间和测试值都有效的行
+    """
+    ids, times, values, _, _ = zip(*rows)
+    x = (pd.to_datetime(pd.Series(times, dtype=object), format='%Y-%m-%d %H:%M:%S', errors='coerce')
+         - pd.Timestamp(0)).dt.total_seconds().to_numpy(np.float64)
+    y = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    return np.array(ids, dtype=np.int64)[valid], x[valid], y[valid]
+
+
+class TrendWorker(QThread):
+    """
+    后台读取并降采样某个测试项的测试值
+    第一次读取时建立分页索引（每页的 id 区间和时间范围，与降采样在同一遍读取中完成），缩放时只读取与时间范围重叠的页
+    """
+    result_signal = pyqtSignal(object)
+
+    def __init__(self, test_data, test_item, request_id, zone_map=None, limits=(np.nan, np.nan), x_range=None,
+                 n_points=2000, chunk_size=50000):
+        super().__init__()
+        self.test_data = test_data
+        self.test_item = test_item
+        self.request_id = request_id
+        self.zone_map = zone_map  # [(起始id, 结束id, 最小时间, 最大时间), ...]
+        self.x_range = x_range
+        self.n_points = n_points
+        self.chunk_size = chunk_size
+        self.limits = limits  # (上限, 下限)，建立分页索引时更新
+
+    def run(self):
+        try:
+            if self.zone_map is None:
+                result = self._scan()
+            else:
+                result = self._fetch()
+        except Exception as e:
+            result = {"error": str(e)}
+        result["request_id"] = self.request_id
+        self.result_signal.emit(result)
+
+    def _scan(self):
+        """
+        第一次读取：一遍读取全部数据，同时建立分页索引和 min/max 分桶
+        事先不知道时间范围，分桶的范围随读到的数据扩大（MinMaxBucketer.extend）
+        """
+        zone_map = []
+        bucketer = None
+        for rows in self.test_data.iter_item_values(self.test_item, chunk_size=self.chunk_size):
+            _, x, y = parse_value_chunk(rows)
+            if len(x):
+                x_min, x_max = float(x.min()), float(x.max())
+                zone_map.append((rows[0][0], rows[-1][0], x_min, x_max))
+                if bucketer is None:
+                    bucketer = MinMaxBucketer(x_min, x_max, self.n_points * 2)
+                bucketer.extend(x_min, x_max)
+                bucketer.add(x, y)
+            # 上下限取最后一条记录
+            self.limits = (_to_float(rows[-1][3]), _to_float(rows[-1][4]))
+        self.zone_map = zone_map
+        if bucketer is None:
+            return self._result(None, None)
+        return self._result(bucketer, (min(zone[2] for zone in zone_map), max(zone[3] for zone in zone_map)))
+
+    def _fetch(self):
+        if not self.zone_map:
+            return self._result(None, None)
+        if self.x_range is None:
+            x_min = min(zone[2] for zone in self.zone_map)
+            x_max = max(zone[3] for zone in self.zone_map)
+        else:
+            x_min, x_max = self.x_range
+
+        # 只读取时间范围有重叠的页，相邻页合并为一个 id 区间
+        id_ranges = []
+        for low, high, zone_min, zone_max in self.zone_map:
+            if zone_max < x_min or zone_min > x_max:
+                continue
+            if id_ranges and id_ranges[-1][1] + 1 >= low:
+                id_ranges[-1] = (id_ranges[-1][0], high)
+            else:
+                id_ranges.append((low, high))
+
+        bucketer = MinMaxBucketer(x_min, x_max, self.n_points * 2)
+        for rows in self.test_data.iter_item_values(self.test_item, chunk_size=self.chunk_size, id_ranges=id_ranges):
+            _, x, y = parse_value_chunk(rows)
+            in_range = (x >= x_min) & (x <= x_max)
+            bucketer.add(x[in_range], y[in_range])
+        return self._result(bucketer, (x_min, x_max))
+
+    def _result(self, bucketer, x_range):
+        if bucketer is None:
+            return {"x": np.array([]), "y": np.array([]), "count": 0, "zone_map": self.zone_map,
+                    "limits": self.limits, "x_range": None}
+        x, y = bucketer.result()
+        x, y = lttb(x, y, self.n_points)
+        return {"x": x, "y": y, "count": bucketer.count, "zone_map": self.zone_map,
+                "limits": self.limits, "x_range": x_range}
+
+
+class TrendChartWidget(QWidget):
+    """测试值趋势图：折线 + USL/LSL 虚线，鼠标左键拖动框选放大，双击/右键还原"""
+    zoom_requested = pyqtSignal(float, float)
+    reset_requested = pyqtSignal()
+
+    MARGIN_LEFT, MARGIN_RIGHT, MARGIN_TOP, MARGIN_BOTTOM = 70, 20, 20, 40
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(600, 300)
+        self.x = np.array([])
+        self.y = np.array([])
+        self.usl = np.nan
+        self.lsl = np.nan
+        self.x_range = (0.0, 1.0)
+        self.y_range = (0.0, 1.0)
+        self.drag_start = None
+        self.drag_end = None
+
+    def set_data(self, x, y, x_range, usl, lsl):
+        self.x, self.y = x, y
+        self.usl, self.lsl = usl, lsl
+        self.x_range = x_range if x_range else (0.0, 1.0)
+        y_values = [v for v in (usl, lsl) if np.isfinite(v)]
+        if len(y):
+            y_values += [float(y.min()), float(y.max())]
+        if y_values:
+            low, high = min(y_values), max(y_values)
+            pad = (high - low) * 0.05 or abs(high) * 0.05 or 1.0
+            self.y_range = (low - pad, high + pad)
+        self.update()
+
+    def _plot_rect(self) -> QRectF:
+        return QRectF(self.MARGIN_LEFT, self.MARGIN_TOP,
+                      max(self.width() - self.MARGIN_LEFT - self.MARGIN_RIGHT, 1),
+                      max(self.height() - self.MARGIN_TOP - self.MARGIN_BOTTOM, 1))
+
+    def _to_pixel_x(self, x, rect):
+        x0, x1 = self.x_range
+        return rect.left() + (x - x0) / max(x1 - x0, 1e-9) * rect.width()
+
+    def _to_pixel_y(self, y, rect):
+        y0, y1 = self.y_range
+        return rect.bottom() - (y - y0) / max(y1 - y0, 1e-12) * rect.height()
+
+    def _to_data_x(self, pixel_x, rect):
+        x0, x1 = self.x_range
+        return x0 + (pixel_x - rect.left()) / rect.width() * (x1 - x0)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.fillRect(self.rect(), QColor("#ffffff"))
+        rect = self._plot_rect()
+        painter.setPen(QPen(QColor("#999999")))
+        painter.drawRect(rect)
+
+        # 坐标刻度
+        for i in range(5):
+            value = self.y_range[0] + (self.y_range[1] - self.y_range[0]) * i / 4
+            pixel_y = self._to_pixel_y(value, rect)
+            painter.drawText(QRectF(0, pixel_y - 8, self.MARGIN_LEFT - 5, 16),
+                             Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, f"{value:.4g}")
+            value = self.x_range[0] + (self.x_range[1] - self.x_range[0]) * i / 4
+            pixel_x = self._to_pixel_x(value, rect)
+            label = pd.Timestamp(value, unit='s').strftime('%m-%d %H:%M') if len(self.x) else ""
+            painter.drawText(QRectF(pixel_x - 50, rect.bottom() + 5, 100, 16), Qt.AlignmentFlag.AlignHCenter, label)
+
+        # 上下限
+        for limit, name in ((self.usl, "USL"), (self.lsl, "LSL")):
+            if np.isfinite(limit):
+                pixel_y = self._to_pixel_y(limit, rect)
+                painter.setPen(QPen(QColor(Qt.GlobalColor.red), 1, Qt.PenStyle.DashLine))
+                painter.drawLine(QPointF(rect.left(), pixel_y), QPointF(rect.right(), pixel_y))
+                painter.drawText(QPointF(rect.right() - 35, pixel_y - 3), name)
+
+        # 测试值折线
+        if len(self.x):
+            painter.setPen(QPen(QColor("#1f77b4"), 1))
+            polygon = QPolygonF([QPointF(self._to_pixel_x(x, rect), self._to_pixel_y(y, rect))
+                                 for x, y in zip(self.x.tolist(), self.y.tolist())])
+            painter.drawPolyline(polygon)
+
+        # 框选区域
+        if self.drag_start is not None and self.drag_end is not None:
+            painter.fillRect(QRectF(QPointF(min(self.drag_start, self.drag_end), rect.top()),
+                                    QPointF(max(self.drag_start, self.drag_end), rect.bottom())),
+                             QColor(0, 120, 215, 50))
+        painter.end()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.RightButton:
+            self.reset_requested.emit()
+        elif event.button() == Qt.MouseButton.LeftButton:
+            self.drag_start = self.drag_end = event.position().x()
+
+    def mouseMoveEvent(self, event):
+        if self.drag_start is not None:
+            self.drag_end = event.position().x()
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if self.drag_start is None:
+            return
+        start, end = sorted((self.drag_start, event.position().x()))
+        self.drag_start = self.drag_end = None
+        self.update()
+        if end - start > 5:
+            rect = self._plot_rect()
+            self.zoom_requested.emit(self._to_data_x(start, rect), self._to_data_x(end, rect))
+
+    def mouseDoubleClickEvent(self, event):
+        self.reset_requested.emit()
+
+
+class TrendDialog(QDialog):
+    """单个测试项的测试值趋势窗口（数据在后台线程读取并降采样）"""
+    def __init__(self, test_data, test_item, parent=None, n_points=2000):
+        super().__init__(parent)
+        self.test_data = test_data
+        self.test_item = test_item
+        self.n_points = n_points
+        self.zone_map = None
+        self.limits = (np.nan, np.nan)
+        self.request_id = 0
+        self.workers = []
+        self.setWindowTitle(f"趋势图 - {test_item}")
+        self.resize(900, 500)
+
+        self.chart = TrendChartWidget(self)
+        self.label_info = QLabel("加载中...", self)
+        self.pushButton_reset = QPushButton("还原", self)
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(self.label_info, 1)
+        top_layout.addWidget(self.pushButton_reset)
+        layout = QVBoxLayout(self)
+        layout.addLayout(top_layout)
+        layout.addWidget(self.chart, 1)
+
+        self.chart.zoom_requested.connect(lambda x0, x1: self.load((x0, x1)))
+        self.chart.reset_requested.connect(self.load)
+        self.pushButton_reset.clicked.connect(lambda: self.load())
+        self.load()
+
+    def load(self, x_range=None):
+        """读取指定时间范围（None表示全部）的降采样数据"""
+        self.request_id += 1
+        self.label_info.setText("加载中...")
+        worker = TrendWorker(self.test_data, self.test_item, self.request_id, zone_map=self.zone_map,
+                             limits=self.limits, x_range=x_range, n_points=self.n_points)
+        worker.result_signal.connect(self.on_result)
+        worker.finished.connect(lambda w=worker: self.workers.remove(w))
+        self.workers.append(worker)
+        worker.start()
+
+    def on_result(self, result):
+        if result["request_id"] != self.request_id:
+            return  # 已经有更新的请求，丢弃旧结果
+        if "error" in result:
+            self.label_info.setText(f"读取失败：{result['error']}")
+            return
+        self.zone_map = result["zone_map"]
+        self.limits = result["limits"]
+        usl, lsl = self.limits
+        self.chart.set_data(result["x"], result["y"], result["x_range"], usl, lsl)
+        self.label_info.setText(f"{self.test_item}：范围内 {result['count']} 个点，显示 {len(result['x'])} 个点"
+                                f"（左键拖动放大，双击/右键还原）")
+
+    def closeEvent(self, event):
+        for worker in self.workers:
+            worker.wait()
+        super().closeEvent(event)